@@ -0,0 +1,231 @@
+"""Connects up to 10k reactors to an in-process loopback server and
+measures the cost of one selector iteration while a handful of the
+connections are active.
+
+Every reactor shares one selector and one
+:class:`haka_mqtt.scheduler.ClockScheduler`.  The
+:func:`select.select`-based selector from
+:mod:`haka_mqtt.frontends.poll` is only measured where its
+FD_SETSIZE limit allows.
+
+Each connection uses two file descriptors (client and server side) so
+the number of connections is capped by the process file descriptor
+limit::
+
+    python -m benchmarks.bench_epoll [max_connections]
+"""
+from __future__ import print_function
+
+import errno
+import random
+import socket
+import sys
+from timeit import default_timer
+
+from benchmarks.harness import buffer_packet
+from haka_mqtt.clock import MonotonicClock
+from haka_mqtt.dns_sync import SynchronousFutureDnsResolver
+from haka_mqtt.frontends.epoll import EpollSelector
+from haka_mqtt.frontends.poll import _PollClientSelector
+from haka_mqtt.reactor import ReactorProperties, Reactor, ReactorState
+from haka_mqtt.scheduler import ClockScheduler
+from haka_mqtt.socket_factory import SocketFactory
+from mqtt_codec.packet import MqttConnack, ConnackResult
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+_CONNACK = buffer_packet(MqttConnack(False, ConnackResult.accepted))
+
+# Number of reactors that publish a message in each measured iteration.
+_NUM_ACTIVE = 10
+
+
+class _NoResolver(object):
+    """Stands in for an asynchronous resolver whose pipe never becomes
+    readable."""
+    def __init__(self, sock):
+        self.__sock = sock
+
+    def read_fd(self):
+        return self.__sock
+
+    def poll(self):
+        pass
+
+
+class _ServerConnection(object):
+    """Server side of one connection; answers the connect packet with a
+    connack then discards everything it receives."""
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.connected = False
+
+    def read(self):
+        try:
+            buf = self.sock.recv(65536)
+        except socket.error as e:
+            if e.errno == errno.EWOULDBLOCK:
+                return 0
+            raise
+
+        if buf and not self.connected:
+            self.connected = True
+            self.sock.send(_CONNACK)
+        self.server.num_bytes_received += len(buf)
+        return len(buf)
+
+    def write(self):
+        pass
+
+    def want_write(self):
+        return False
+
+
+class _Server(object):
+    def __init__(self, selector, backlog):
+        self.selector = selector
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(backlog)
+        self.listener.setblocking(False)
+        self.connections = []
+        self.num_bytes_received = 0
+        selector.add_read(self.listener, self)
+
+    def endpoint(self):
+        return self.listener.getsockname()
+
+    def read(self):
+        while True:
+            try:
+                sock, addr = self.listener.accept()
+            except socket.error as e:
+                if e.errno in (errno.EWOULDBLOCK, errno.EAGAIN):
+                    break
+                raise
+            sock.setblocking(False)
+            conn = _ServerConnection(self, sock)
+            self.connections.append(conn)
+            self.selector.add_read(sock, conn)
+
+        return 1
+
+    def write(self):
+        pass
+
+    def want_write(self):
+        return False
+
+    def close(self):
+        self.selector.del_read(self.listener, self)
+        self.listener.close()
+        for conn in self.connections:
+            self.selector.del_read(conn.sock, conn)
+            conn.sock.close()
+
+
+def bench(selector_factory, num_connections):
+    """Returns a 2-tuple of (seconds to connect all reactors, seconds
+    per selector iteration with `_NUM_ACTIVE` publishing reactors)."""
+    selector = selector_factory()
+    scheduler = ClockScheduler(MonotonicClock())
+    server = _Server(selector, num_connections)
+
+    def poll(timeout):
+        selector.select(timeout)
+        scheduler.poll()
+
+    reactors = []
+    start = default_timer()
+    for i in range(0, num_connections):
+        p = ReactorProperties()
+        p.socket_factory = SocketFactory()
+        p.name_resolver = SynchronousFutureDnsResolver()
+        p.scheduler = scheduler
+        p.selector = selector
+        p.endpoint = server.endpoint()
+        p.client_id = 'bench-{}'.format(i)
+        reactor = Reactor(p, log=None)
+        reactor.start()
+        reactors.append(reactor)
+
+        if i % 100 == 0:
+            # Keep the listen backlog from overflowing.
+            poll(0)
+
+    num_started = 0
+    while num_started < num_connections:
+        poll(0.1)
+        num_started = sum(1 for r in reactors if r.state is ReactorState.started)
+    connect_duration = default_timer() - start
+
+    rng = random.Random(0)
+    num_iterations = 200
+    start = default_timer()
+    for i in range(0, num_iterations):
+        for reactor in rng.sample(reactors, _NUM_ACTIVE):
+            reactor.publish('topic', b'payload', 0)
+        poll(0)
+    iteration_duration = (default_timer() - start) / num_iterations
+
+    for reactor in reactors:
+        reactor.terminate()
+    server.close()
+
+    return connect_duration, iteration_duration
+
+
+def max_connections():
+    """Raises the soft file descriptor limit as far as permitted and
+    returns the number of connections it allows."""
+    if resource is None:
+        rv = 10000
+    else:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or hard > soft:
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+                soft = hard
+            except (ValueError, OSError):
+                pass
+        rv = (soft - 64) // 2
+
+    return rv
+
+
+def main():
+    limit = max_connections()
+    if len(sys.argv) > 1:
+        limit = min(limit, int(sys.argv[1]))
+
+    sizes = sorted(set(min(n, limit) for n in (100, 500, 1000, 10000)))
+    # select.select cannot watch file descriptors >= FD_SETSIZE (1024).
+    select_limit = 500
+
+    def select_factory():
+        a, b = socket.socketpair()
+        return _PollClientSelector(_NoResolver(a))
+
+    factories = [
+        ('select', select_factory, select_limit),
+        ('epoll-level', lambda: EpollSelector(), limit),
+        ('epoll-edge', lambda: EpollSelector(edge_triggered=True), limit),
+    ]
+
+    print('{:>12} {:>12} {:>12} {:>14}'.format('selector', 'connections', 'connect', 'iteration'))
+    for label, factory, factory_limit in factories:
+        for num_connections in sizes:
+            if num_connections <= factory_limit:
+                connect_duration, iteration_duration = bench(factory, num_connections)
+                print('{:>12} {:>12} {:>10.2f} s {:>11.2f} us'.format(
+                    label, num_connections, connect_duration, iteration_duration * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Measures the per-message cost of the reactor send and receive paths
+for disabled, filtered, and enabled logging."""
+from __future__ import print_function
+
+import logging
+
+from benchmarks.harness import buffer_packet, connected_reactor, time_per_call, print_row
+from mqtt_codec.packet import MqttPublish
+
+
+def bench_recv(log, num_messages):
+    reactor, sock = connected_reactor(log)
+    chunk = buffer_packet(MqttPublish(0, 'bench/topic', b'x' * 64, False, 0, False))
+
+    def recv_one():
+        sock.chunks.append(chunk)
+        reactor.read()
+
+    rv = time_per_call(recv_one, num_messages)
+    reactor.terminate()
+    return rv
+
+
+def bench_send(log, num_messages):
+    reactor, sock = connected_reactor(log)
+    payload = b'x' * 64
+
+    def send_one():
+        reactor.publish('bench/topic', payload, 0)
+        reactor.write()
+
+    rv = time_per_call(send_one, num_messages)
+    reactor.terminate()
+    return rv
+
+
+def main(num_messages=20000):
+    filtered_log = logging.getLogger('bench.filtered')
+    filtered_log.setLevel(logging.WARNING)
+    filtered_log.addHandler(logging.NullHandler())
+    filtered_log.propagate = False
+
+    enabled_log = logging.getLogger('bench.enabled')
+    enabled_log.setLevel(logging.DEBUG)
+    enabled_log.addHandler(logging.NullHandler())
+    enabled_log.propagate = False
+
+    cases = [
+        ('log=None', None),
+        ('log level WARNING', filtered_log),
+        ('log level DEBUG (NullHandler)', enabled_log),
+    ]
+
+    print('Receive path, per qos=0 publish:')
+    for label, log in cases:
+        print_row(label, bench_recv(log, num_messages))
+
+    print('Send path, per qos=0 publish:')
+    for label, log in cases:
+        print_row(label, bench_send(log, num_messages))
+
+
+if __name__ == '__main__':
+    main()
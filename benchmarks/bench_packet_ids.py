@@ -0,0 +1,52 @@
+"""Measures PacketIdGenerator acquire/release cost at 90%, 99%, and
+100% occupancy of the packet id space."""
+from __future__ import print_function
+
+import random
+
+from benchmarks.harness import time_per_call
+from haka_mqtt.exception import PacketIdReactorException
+from haka_mqtt.packet_ids import PacketIdGenerator
+
+
+def bench(occupancy, num_ops=20000):
+    rng = random.Random(0)
+    gen = PacketIdGenerator()
+    num_ids = PacketIdGenerator.id_stop() - 1
+    for i in range(0, int(num_ids * occupancy)):
+        gen.acquire()
+
+    acquired = list(gen)
+
+    def acquire_release():
+        # Release a random id then acquire; the acquire search begins
+        # after the most recently acquired id.
+        idx = rng.randrange(0, len(acquired))
+        gen.release(acquired[idx])
+        acquired[idx] = gen.acquire()
+
+    def acquire_fail():
+        try:
+            gen.acquire()
+        except PacketIdReactorException:
+            pass
+
+    if len(gen) < num_ids:
+        rv = time_per_call(acquire_release, num_ops)
+    else:
+        rv = time_per_call(acquire_fail, num_ops)
+
+    return rv
+
+
+def main():
+    for occupancy in (0.9, 0.99, 1.):
+        if occupancy < 1:
+            label = '{:.0f}% occupied, release+acquire'.format(occupancy * 100)
+        else:
+            label = '100% occupied, failed acquire'
+        print('{:<40} {:>8.2f} us'.format(label, bench(occupancy) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Measures scheduler operation costs with 1k, 10k, and 100k live
+deadlines.
+
+The "restart" column models a timer restarted by cancelling it and
+adding a replacement; "reset" restarts it with
+:meth:`haka_mqtt.scheduler.Deadline.reset` as the reactor does for every
+chunk of bytes received."""
+from __future__ import print_function
+
+import random
+
+from benchmarks.harness import time_per_call
+from haka_mqtt.clock import SettableClock
+from haka_mqtt.scheduler import DurationScheduler
+from haka_mqtt.timing_wheel import TimingWheelScheduler
+
+
+def noop():
+    pass
+
+
+def bench(scheduler_factory, num_deadlines, num_ops=20000):
+    rng = random.Random(0)
+    scheduler = scheduler_factory()
+    deadlines = [scheduler.add(rng.randint(1, 1000), noop) for i in range(0, num_deadlines)]
+
+    def add_cancel():
+        scheduler.add(rng.randint(1, 1000), noop).cancel()
+
+    def restart():
+        idx = rng.randrange(0, num_deadlines)
+        deadlines[idx].cancel()
+        deadlines[idx] = scheduler.add(rng.randint(1, 1000), noop)
+
+    def reset():
+        deadlines[rng.randrange(0, num_deadlines)].reset(rng.randint(1, 1000))
+
+    def remaining():
+        scheduler.remaining()
+
+    rv = [
+        time_per_call(add_cancel, num_ops),
+        time_per_call(restart, num_ops),
+        time_per_call(reset, num_ops),
+        time_per_call(remaining, num_ops),
+    ]
+    assert len(scheduler) == num_deadlines
+    return rv
+
+
+def main():
+    factories = [
+        ('heap', DurationScheduler),
+        ('wheel', lambda: TimingWheelScheduler(SettableClock(), resolution=1.)),
+    ]
+    print('{:>6} {:>10} {:>14} {:>14} {:>14} {:>14}'.format('', 'deadlines', 'add+cancel', 'restart', 'reset',
+                                                            'remaining'))
+    for label, factory in factories:
+        for num_deadlines in (1000, 10000, 100000):
+            times = bench(factory, num_deadlines)
+            print('{:>6} {:>10} {:>11.2f} us {:>11.2f} us {:>11.2f} us {:>11.2f} us'.format(
+                label, num_deadlines, *[t * 1e6 for t in times]))
+
+
+if __name__ == '__main__':
+    main()
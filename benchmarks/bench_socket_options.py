@@ -0,0 +1,181 @@
+"""Compares the socket option profiles of
+:mod:`haka_mqtt.socket_factory` over a loopback connection to an
+in-process server.
+
+Two workloads are measured for each profile:
+
+* latency: sequential QoS=1 publishes of a small payload, each waiting
+  for its puback;
+* throughput: QoS=0 publishes of a large payload until the server has
+  received every byte.
+
+Loopback has no propagation delay and little loss so differences are
+smaller than over a real network::
+
+    python -m benchmarks.bench_socket_options [num_publishes]
+"""
+from __future__ import print_function
+
+import socket
+import sys
+import threading
+from timeit import default_timer
+
+from benchmarks.harness import buffer_packet
+from haka_mqtt.frontends.poll import MqttPollClient, MqttPollClientProperties
+from haka_mqtt.reactor import ReactorState
+from haka_mqtt.socket_factory import socket_options_profiles
+from mqtt_codec.io import BytesReader, UnderflowDecodeError
+from mqtt_codec.packet import (
+    MqttConnack,
+    ConnackResult,
+    MqttControlPacketType,
+    MqttFixedHeader,
+    MqttPublish,
+    MqttPuback,
+)
+
+
+_CONNACK = buffer_packet(MqttConnack(False, ConnackResult.accepted))
+
+
+class _Server(object):
+    """Accepts one connection at a time on a thread; answers connect
+    with connack and QoS=1 publishes with pubacks."""
+    def __init__(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.lock = threading.Lock()
+        self.num_bytes_received = 0
+        self.thread = threading.Thread(target=self.__run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def endpoint(self):
+        return self.listener.getsockname()
+
+    def reset(self):
+        with self.lock:
+            self.num_bytes_received = 0
+
+    def received(self):
+        with self.lock:
+            return self.num_bytes_received
+
+    def __run(self):
+        while True:
+            try:
+                sock, addr = self.listener.accept()
+            except socket.error:
+                break
+            try:
+                self.__serve(sock)
+            except socket.error:
+                pass
+            finally:
+                sock.close()
+
+    def __serve(self, sock):
+        buf = bytearray()
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            with self.lock:
+                self.num_bytes_received += len(chunk)
+            buf.extend(chunk)
+
+            replies = []
+            while True:
+                try:
+                    num_header_bytes, header = MqttFixedHeader.decode(BytesReader(bytes(buf)))
+                except UnderflowDecodeError:
+                    break
+                packet_end = num_header_bytes + header.remaining_len
+                if len(buf) < packet_end:
+                    break
+
+                if header.packet_type is MqttControlPacketType.connect:
+                    replies.append(_CONNACK)
+                elif header.packet_type is MqttControlPacketType.publish:
+                    body = bytes(buf[num_header_bytes:packet_end])
+                    num_bytes, publish = MqttPublish.decode_body(header, BytesReader(body))
+                    if publish.qos == 1:
+                        replies.append(buffer_packet(MqttPuback(publish.packet_id)))
+                del buf[0:packet_end]
+
+            if replies:
+                sock.sendall(b''.join(replies))
+
+    def close(self):
+        self.listener.close()
+
+
+def connect(server, options):
+    properties = MqttPollClientProperties()
+    properties.host, properties.port = server.endpoint()
+    properties.client_id = 'bench'
+    properties.ssl = False
+    properties.socket_options = options
+    client = MqttPollClient(properties, log=None)
+    client.start()
+    while client.state is not ReactorState.started:
+        assert client.state is ReactorState.starting, client.state
+        client.poll(0.01)
+
+    return client
+
+
+def bench_latency(server, options, num_publishes):
+    """Returns mean seconds from publish to puback."""
+    client = connect(server, options)
+    payload = b'x' * 16
+    start = default_timer()
+    for i in range(0, num_publishes):
+        ticket = client.publish('bench', payload, 1)
+        assert client.wait_all([ticket], timeout=5.)
+    duration = default_timer() - start
+    client.terminate()
+
+    return duration / num_publishes
+
+
+def bench_throughput(server, options, num_publishes):
+    """Returns bytes per second received by the server."""
+    client = connect(server, options)
+    server.reset()
+    payload = b'x' * 65536
+    start = default_timer()
+    for i in range(0, num_publishes):
+        client.publish('bench', payload, 0)
+        client.poll(0)
+    num_bytes = num_publishes * len(payload)
+    while server.received() < num_bytes:
+        client.poll(0.001)
+    duration = default_timer() - start
+    client.terminate()
+
+    return server.received() / duration
+
+
+def main():
+    num_publishes = 2000
+    if len(sys.argv) > 1:
+        num_publishes = int(sys.argv[1])
+
+    server = _Server()
+    profiles = [('default', None)] + [(name, name) for name in socket_options_profiles()]
+
+    print('{:>16} {:>14} {:>16}'.format('profile', 'latency', 'throughput'))
+    for label, options in profiles:
+        latency = bench_latency(server, options, num_publishes)
+        throughput = bench_throughput(server, options, max(1, num_publishes // 4))
+        print('{:>16} {:>11.2f} us {:>11.1f} MB/s'.format(label, latency * 1e6, throughput / 1e6))
+
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
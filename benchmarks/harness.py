@@ -0,0 +1,120 @@
+"""Helpers shared by the benchmark scripts in this package.
+
+Benchmarks are run from the project root as modules, for example::
+
+    python -m benchmarks.bench_logging
+"""
+from __future__ import print_function
+
+import errno
+import socket
+from io import BytesIO
+from timeit import default_timer
+
+from haka_mqtt.dns_sync import SynchronousFutureDnsResolver
+from haka_mqtt.reactor import ReactorProperties, Reactor, ReactorState
+from haka_mqtt.scheduler import DurationScheduler
+from mqtt_codec.packet import MqttConnack, ConnackResult
+
+
+def buffer_packet(packet):
+    """Encodes `packet` and returns the resulting bytes.
+
+    Parameters
+    ----------
+    packet: mqtt_codec.packet.MqttPacketBody
+
+    Returns
+    -------
+    bytes
+    """
+    bio = BytesIO()
+    packet.encode(bio)
+    return bio.getvalue()
+
+
+class FakeSocket(object):
+    """A non-blocking socket stand-in that connects immediately,
+    accepts every byte it is asked to send, and returns queued chunks
+    from `recv`."""
+    def __init__(self):
+        self.chunks = []
+        self.num_bytes_sent = 0
+
+    def connect(self, sockaddr):
+        pass
+
+    def getsockopt(self, level, optname):
+        return 0
+
+    def send(self, buf):
+        self.num_bytes_sent += len(buf)
+        return len(buf)
+
+    def recv(self, bufsize):
+        if self.chunks:
+            return self.chunks.pop()
+        else:
+            raise socket.error(errno.EWOULDBLOCK, 'Resource temporarily unavailable')
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+
+def connected_reactor(log=None, reactor_class=Reactor):
+    """Creates a reactor attached to a :class:`FakeSocket` and drives it
+    through connect/connack.
+
+    Parameters
+    ----------
+    log: str or logging.Logger or None
+    reactor_class: type
+
+    Returns
+    -------
+    tuple of (Reactor, FakeSocket)
+    """
+    sock = FakeSocket()
+
+    p = ReactorProperties()
+    p.socket_factory = lambda getaddrinfo_params, sockaddr: sock
+    p.name_resolver = SynchronousFutureDnsResolver()
+    p.scheduler = DurationScheduler()
+    p.endpoint = ('127.0.0.1', 1883)
+    p.client_id = 'bench'
+
+    reactor = reactor_class(p, log=log)
+    reactor.start()
+    reactor.write()
+    sock.chunks.append(buffer_packet(MqttConnack(False, ConnackResult.accepted)))
+    reactor.read()
+    assert reactor.state is ReactorState.started, reactor.state
+
+    return reactor, sock
+
+
+def time_per_call(fn, num_calls):
+    """Calls `fn` `num_calls` times and returns the mean duration of
+    each call.
+
+    Parameters
+    ----------
+    fn: callable()
+    num_calls: int
+
+    Returns
+    -------
+    float
+        Seconds per call.
+    """
+    start = default_timer()
+    for i in range(0, num_calls):
+        fn()
+    return (default_timer() - start) / num_calls
+
+
+def print_row(label, seconds):
+    print('{:<40} {:>10.2f} us'.format(label, seconds * 1e6))
@@ -1,11 +1,103 @@
+import os
 from time import time
 
+try:
+    from time import monotonic as _monotonic
+except ImportError:
+    # Python 2 has no time.monotonic; read CLOCK_MONOTONIC directly.
+    try:
+        import ctypes
+        import ctypes.util
+
+        class _Timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+        _CLOCK_MONOTONIC = 1
+        _librt = ctypes.CDLL(ctypes.util.find_library('rt') or 'librt.so.1', use_errno=True)
+        _clock_gettime = _librt.clock_gettime
+        _clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+
+        def _monotonic():
+            t = _Timespec()
+            if _clock_gettime(_CLOCK_MONOTONIC, ctypes.pointer(t)) != 0:
+                e = ctypes.get_errno()
+                raise OSError(e, os.strerror(e))
+            return t.tv_sec + t.tv_nsec * 1e-9
+    except (ImportError, OSError, AttributeError):
+        _monotonic = None
+
 
 class SystemClock(object):
     def time(self):
         return time()
 
 
+class MonotonicClock(object):
+    """A clock that cannot go backwards and is not affected by changes
+    to the system wall-clock time (eg. NTP steps).  Instants are
+    seconds from an unspecified point and are only meaningful relative
+    to one another.
+
+    Where no monotonic time source is available the clock falls back
+    to :func:`time.time`.
+
+    .. versionadded:: 0.3.6
+    """
+    def time(self):
+        if _monotonic is None:
+            rv = time()
+        else:
+            rv = _monotonic()
+
+        return rv
+
+
+class CachedClock(object):
+    """Wraps a clock so that the time can be sampled once and re-used
+    by every caller until it is released.  Frontends sample the clock
+    once per poll iteration so that all deadline arithmetic in the
+    iteration uses the same instant without repeatedly reading the
+    underlying clock.
+
+    While no sample is held :meth:`time` reads the underlying clock.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    clock: object
+        Object with a `time` method.
+    """
+    def __init__(self, clock):
+        self.__clock = clock
+        self.__time = None
+
+    def sample(self):
+        """Reads the underlying clock and holds the result until the
+        next call to :meth:`sample` or :meth:`release`.
+
+        Returns
+        -------
+        float
+            The sampled instant.
+        """
+        self.__time = self.__clock.time()
+        return self.__time
+
+    def release(self):
+        """Discards any held sample so that :meth:`time` once more reads
+        the underlying clock."""
+        self.__time = None
+
+    def time(self):
+        if self.__time is None:
+            rv = self.__clock.time()
+        else:
+            rv = self.__time
+
+        return rv
+
+
 class SettableClock(object):
     def __init__(self):
         self.__time = 0
@@ -17,4 +109,4 @@ class SettableClock(object):
         self.__time = t
 
     def time(self):
-        return self.__time
\ No newline at end of file
+        return self.__time
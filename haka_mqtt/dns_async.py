@@ -1,11 +1,10 @@
-import errno
-import fcntl
-import os
 import socket
 import threading
 from Queue import Queue, Empty
 from time import sleep
 
+from haka_mqtt.wakeup import Wakeup
+
 
 class _Future(object):
     def __init__(self, call, *args, **kwargs):
@@ -22,9 +21,16 @@ class _Future(object):
 
     def _work(self):
         try:
-            self.__result = self.__callable(*self.__args, **self.__kwargs)
+            result = self.__callable(*self.__args, **self.__kwargs)
+            exception = None
         except Exception as e:
-            self.__exception = e
+            result = None
+            exception = e
+        self._set_outcome(result, exception)
+
+    def _set_outcome(self, result, exception):
+        self.__result = result
+        self.__exception = exception
         self.__done = True
 
     def _notify(self):
@@ -72,14 +78,14 @@ class _Future(object):
 _Poison = object()
 
 
-def _worker_task(work_queue, wd, done_queue):
+def _worker_task(work_queue, wakeup, done_queue):
     """Listens for tasks on work_queue, completes them, then places the
     completed tasks on the done_queue.
 
     Parameters
     ----------
     work_queue: Queue
-    wd: fileno
+    wakeup: haka_mqtt.wakeup.Wakeup
     done_queue: Queue of _Future
     """
 
@@ -87,18 +93,13 @@ def _worker_task(work_queue, wd, done_queue):
         future = work_queue.get()
         if future is _Poison:
             break
+        elif future.cancelled():
+            # Cancelled futures have already been notified.
+            pass
         else:
             future._work()
             done_queue.put(future)
-
-            while True:
-                num_bytes_written = os.write(wd, b'x')
-                if num_bytes_written == 1:
-                    break
-                elif num_bytes_written == 0:
-                    sleep(0.01)
-                else:
-                    raise NotImplementedError(num_bytes_written)
+            wakeup.wake()
 
 
 class AsyncFutureDnsResolver(object):
@@ -117,7 +118,7 @@ class AsyncFutureDnsResolver(object):
     >>>
     >>> def lookup_finished(future):
     ...   global lookup_result
-    ...   lookup_result = future.result()
+    ...   lookup_result = future.result(timeout=0)
     ...
     >>> future = resolver('localhost', 80)
     >>> future.add_done_callback(lookup_finished)
@@ -158,22 +159,24 @@ class AsyncFutureDnsResolver(object):
                                  |                                       |
                 resolver.poll()  |<-- completion queue<------------------+
                                  |
+
+    Concurrent lookups with identical parameters are coalesced into a
+    single query whose outcome is given to every waiting future.
+    Cancelling one waiting future does not affect the others; the query
+    itself is cancelled when every future waiting on it has been
+    cancelled.
     """
     def __init__(self, thread_pool_size=1):
         self.__closed = False
         self.__work_queue = Queue()
         self.__done_queue = Queue()
         self.__threads = []
-        self.__rd, self.__wd = os.pipe()
-
-        flags = fcntl.fcntl(self.__rd, fcntl.F_GETFL)
-        fcntl.fcntl(self.__rd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
-
-        flags = fcntl.fcntl(self.__wd, fcntl.F_GETFL)
-        fcntl.fcntl(self.__wd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        # getaddrinfo parameters -> (query future, list of waiting futures)
+        self.__in_flight = {}
+        self.__wakeup = Wakeup()
 
         for i in range(0, thread_pool_size):
-            t = threading.Thread(target=_worker_task, args=(self.__work_queue, self.__wd, self.__done_queue))
+            t = threading.Thread(target=_worker_task, args=(self.__work_queue, self.__wakeup, self.__done_queue))
             t.daemon = True
             self.__threads.append(t)
             t.start()
@@ -203,8 +206,7 @@ class AsyncFutureDnsResolver(object):
                 thread.join()
                 self.poll()
 
-            os.close(self.__wd)
-            os.close(self.__rd)
+            self.__wakeup.close()
 
     def __call__(self, host, port, family=0, socktype=0, proto=0, flags=0):
         """Queues an asynchronous DNS resolution task.
@@ -248,32 +250,62 @@ class AsyncFutureDnsResolver(object):
         assert not self.__closed, 'Async dns lookup after resolver closed.'
 
         getaddrinfo_params = (host, port, family, socktype, proto, flags)
+        in_flight = self.__in_flight.get(getaddrinfo_params)
+        if in_flight is None:
+            query = _Future(socket.getaddrinfo, *getaddrinfo_params)
+            in_flight = (query, [])
+            self.__in_flight[getaddrinfo_params] = in_flight
+            query.add_done_callback(lambda f: self.__on_query_done(getaddrinfo_params, f))
+            self.__work_queue.put(query)
+
+        query, waiters = in_flight
         future = _Future(socket.getaddrinfo, *getaddrinfo_params)
-        self.__work_queue.put(future)
+        waiters.append(future)
+        future.add_done_callback(lambda f: self.__on_waiter_done(getaddrinfo_params, f))
 
         return future
 
+    def __on_query_done(self, getaddrinfo_params, query):
+        query, waiters = self.__in_flight.pop(getaddrinfo_params)
+        if query.cancelled():
+            return
+
+        result = query.result(timeout=0)
+        exception = query.exception(timeout=0)
+        for future in waiters:
+            if not future.done():
+                future._set_outcome(result, exception)
+                future._notify()
+
+    def __on_waiter_done(self, getaddrinfo_params, future):
+        in_flight = self.__in_flight.get(getaddrinfo_params)
+        if future.cancelled() and in_flight is not None:
+            query, waiters = in_flight
+            if all(waiter.cancelled() for waiter in waiters):
+                query.cancel()
+
     def read_fd(self):
-        """int: fileno"""
-        return self.__rd
+        """int: fileno that becomes readable when lookups complete; an
+        eventfd where available and otherwise the read end of a
+        pipe."""
+        return self.__wakeup.fileno()
 
     def poll(self):
-        """Calls done callbacks of any newly completed futures."""
-        try:
-            rc = os.read(self.__rd, 1)
-        except OSError as e:
-            if e.errno is errno.EAGAIN:
-                # No data available in pipe.
-                pass
+        """Calls done callbacks of every newly completed future.
+
+        All pending wakeups are consumed and every future on the
+        completion queue is notified so that one readiness event
+        completes any number of lookups.
+        """
+        # Workers queue a future before waking the loop so draining
+        # first guarantees that every drained wakeup has its future on
+        # the queue; a future queued after the drain leaves a wakeup
+        # pending for the next call.
+        self.__wakeup.drain()
+        while True:
+            try:
+                future = self.__done_queue.get_nowait()
+            except Empty:
+                break
             else:
-                # Unknown error; crash!
-                raise
-        else:
-            if rc:
-                # A byte was read.
-                try:
-                    future = self.__done_queue.get_nowait()
-                except Empty:
-                    pass
-                else:
-                    future._notify()
+                future._notify()
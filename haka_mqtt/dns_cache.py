@@ -0,0 +1,152 @@
+import socket
+from collections import OrderedDict
+
+from haka_mqtt.clock import MonotonicClock
+from haka_mqtt.dns_sync import SynchronousFuture
+
+
+class _CacheEntry(object):
+    def __init__(self, expiry, result, exception):
+        self.expiry = expiry
+        self.result = result
+        self.exception = exception
+
+
+class CachingDnsResolver(object):
+    """Wraps a DNS resolver such as
+    :class:`haka_mqtt.dns_async.AsyncFutureDnsResolver` and caches the
+    outcome of its lookups.
+
+    Successful lookups are cached for `ttl` seconds and lookups that
+    fail with a `socket.gaierror` are cached for `negative_ttl` seconds.
+    Lookups that are cancelled or fail with any other exception are not
+    cached.  `getaddrinfo` does not report record TTLs so every entry
+    uses the configured values.
+
+    A cache hit returns a
+    :class:`haka_mqtt.dns_sync.SynchronousFuture` that is already done;
+    a miss returns the future of the wrapped resolver.  Concurrent
+    lookups of a name that is not yet cached are each passed to the
+    wrapped resolver.
+
+    >>> from haka_mqtt.dns_sync import SynchronousFutureDnsResolver
+    >>> resolver = CachingDnsResolver(SynchronousFutureDnsResolver())
+    >>> future = resolver('localhost', 1883)
+    >>> future = resolver('localhost', 1883)
+    >>> resolver.hits, resolver.misses
+    (1, 1)
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    resolver: callable
+        Called like :func:`socket.getaddrinfo` and returns a future.
+    ttl: float
+        0 <= ttl; seconds successful lookups are cached.
+    negative_ttl: float
+        0 <= negative_ttl; seconds failed lookups are cached.
+    max_entries: int
+        0 < max_entries; when full the least recently used entry is
+        evicted.
+    clock: object or None
+        Object with a `time` method; defaults to
+        :class:`haka_mqtt.clock.MonotonicClock`.
+    """
+    def __init__(self, resolver, ttl=60., negative_ttl=5., max_entries=256, clock=None):
+        assert callable(resolver)
+        assert 0 <= ttl
+        assert 0 <= negative_ttl
+        assert 0 < max_entries
+
+        self.__resolver = resolver
+        self.__ttl = ttl
+        self.__negative_ttl = negative_ttl
+        self.__max_entries = max_entries
+        if clock is None:
+            clock = MonotonicClock()
+        self.__clock = clock
+        self.__entries = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def hits(self):
+        """int: Number of lookups answered from the cache."""
+        return self.__hits
+
+    @property
+    def misses(self):
+        """int: Number of lookups passed to the wrapped resolver."""
+        return self.__misses
+
+    def __len__(self):
+        """Number of cache entries including expired entries that have
+        not yet been removed."""
+        return len(self.__entries)
+
+    def invalidate(self, host=None):
+        """Removes cache entries.
+
+        Parameters
+        ----------
+        host: str or None
+            Removes entries for this host; when None every entry is
+            removed.
+
+        Returns
+        -------
+        int
+            Number of entries removed.
+        """
+        if host is None:
+            keys = list(self.__entries)
+        else:
+            keys = [key for key in self.__entries if key[0] == host]
+
+        for key in keys:
+            del self.__entries[key]
+
+        return len(keys)
+
+    def __call__(self, host, port, family=0, socktype=0, proto=0, flags=0):
+        """Performs a lookup with the same parameters as
+        :meth:`haka_mqtt.dns_async.AsyncFutureDnsResolver.__call__`.
+
+        Returns
+        -------
+        Future
+        """
+        key = (host, port, family, socktype, proto, flags)
+        entry = self.__entries.pop(key, None)
+        if entry is not None and entry.expiry > self.__clock.time():
+            # Re-inserting moves the entry to the most recently used end.
+            self.__entries[key] = entry
+            self.__hits += 1
+            return SynchronousFuture(entry.result, entry.exception)
+
+        self.__misses += 1
+        future = self.__resolver(host, port, family, socktype, proto, flags)
+        future.add_done_callback(lambda f: self.__on_done(key, f))
+        return future
+
+    def __on_done(self, key, future):
+        if future.cancelled():
+            return
+
+        exception = future.exception(timeout=0)
+        if exception is None:
+            result = future.result(timeout=0)
+            if not result:
+                return
+            ttl = self.__ttl
+        elif isinstance(exception, socket.gaierror):
+            result = None
+            ttl = self.__negative_ttl
+        else:
+            return
+
+        self.__entries.pop(key, None)
+        self.__entries[key] = _CacheEntry(self.__clock.time() + ttl, result, exception)
+        while len(self.__entries) > self.__max_entries:
+            self.__entries.popitem(last=False)
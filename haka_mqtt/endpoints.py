@@ -0,0 +1,216 @@
+from enum import IntEnum, unique
+
+
+@unique
+class EndpointPolicy(IntEnum):
+    """How :meth:`EndpointList.select` chooses among endpoints that
+    are not cooling down.
+
+    * :py:const:`EndpointPolicy.sticky`: the first endpoint in list
+      order so that the primary is used whenever it is healthy.
+    * :py:const:`EndpointPolicy.round_robin`: the endpoint after the
+      one last selected.
+    * :py:const:`EndpointPolicy.lowest_latency`: endpoints without a
+      latency measurement first, in list order, then the endpoint with
+      the lowest measured latency divided by its health score.
+
+    .. versionadded:: 0.3.6
+    """
+    sticky = 0
+    round_robin = 1
+    lowest_latency = 2
+
+
+class EndpointStats(object):
+    """Connection statistics for one endpoint.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    endpoint: tuple
+        2-tuple of (host: `str`, port: `int`).
+    """
+    def __init__(self, endpoint):
+        self.__endpoint = endpoint
+        self.health = 1.
+        self.latency = None
+        self.num_successes = 0
+        self.num_failures = 0
+        self.consecutive_failures = 0
+        self.cool_down_end = None
+
+    @property
+    def endpoint(self):
+        """tuple: 2-tuple of (host: `str`, port: `int`)."""
+        return self.__endpoint
+
+    def cooling_down(self, instant):
+        """bool: True if the endpoint is cooling down at `instant`."""
+        return self.cool_down_end is not None and instant < self.cool_down_end
+
+    def __repr__(self):
+        return 'EndpointStats({!r}, health={:.3f}, latency={!r}, cool_down_end={!r})'.format(
+            self.endpoint, self.health, self.latency, self.cool_down_end)
+
+
+class EndpointList(object):
+    """An ordered list of broker endpoints that chooses which endpoint
+    a :class:`haka_mqtt.reactor.Reactor` connects to each time it
+    starts.
+
+    The reactor reports the outcome of every connection attempt.  A
+    successful attempt is one that receives an accepted connack; its
+    latency is the time from the start of the connection attempt to
+    the connack.  A failed attempt is any other end to a connection
+    attempt except a stop or terminate by the application.
+
+    Each endpoint has a health score in (0, 1] that moves towards 1 by
+    `health_alpha` on success and towards 0 on failure.  After a failure
+    an endpoint cools down for `cool_down` seconds, doubling with each
+    consecutive failure up to `max_cool_down`; endpoints cooling down
+    are selected only when every endpoint is cooling down, in which
+    case the endpoint whose cool-down ends first is selected.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    endpoints: iterable of tuple
+        2-tuples of (host: `str`, port: `int`) in order of preference.
+    policy: EndpointPolicy
+    cool_down: float
+        0 <= cool_down; seconds an endpoint is avoided after a failure.
+    max_cool_down: float
+        cool_down <= max_cool_down.
+    health_alpha: float
+        0 < health_alpha <= 1; weight given to the latest outcome in
+        the health score and latency averages.
+    """
+    def __init__(self, endpoints, policy=EndpointPolicy.sticky, cool_down=30., max_cool_down=300., health_alpha=0.25):
+        self.__stats = []
+        for endpoint in endpoints:
+            host, port = endpoint
+            assert isinstance(host, str)
+            assert isinstance(port, int)
+            assert 0 <= port <= 2**16-1
+            self.__stats.append(EndpointStats((host, port)))
+        assert self.__stats
+        assert policy in iter(EndpointPolicy)
+        assert 0 <= cool_down <= max_cool_down
+        assert 0 < health_alpha <= 1
+
+        self.__policy = policy
+        self.__cool_down = cool_down
+        self.__max_cool_down = max_cool_down
+        self.__alpha = health_alpha
+        self.__last_index = None
+
+    @property
+    def policy(self):
+        """EndpointPolicy: selection policy."""
+        return self.__policy
+
+    def __len__(self):
+        return len(self.__stats)
+
+    def __iter__(self):
+        """Iterates over :class:`EndpointStats` in list order."""
+        return iter(self.__stats)
+
+    def stats(self, endpoint):
+        """
+        Parameters
+        ----------
+        endpoint: tuple
+            2-tuple of (host: `str`, port: `int`).
+
+        Returns
+        -------
+        EndpointStats
+        """
+        for stats in self.__stats:
+            if stats.endpoint == endpoint:
+                return stats
+
+        raise KeyError(endpoint)
+
+    def select(self, instant):
+        """Chooses the endpoint to connect to.
+
+        Parameters
+        ----------
+        instant: float
+            Current scheduler instant.
+
+        Returns
+        -------
+        tuple
+            2-tuple of (host: `str`, port: `int`).
+        """
+        eligible = [i for i, stats in enumerate(self.__stats) if not stats.cooling_down(instant)]
+        if not eligible:
+            index = min(range(0, len(self.__stats)), key=lambda i: self.__stats[i].cool_down_end)
+        elif self.__policy is EndpointPolicy.sticky:
+            index = eligible[0]
+        elif self.__policy is EndpointPolicy.round_robin:
+            if self.__last_index is None:
+                index = eligible[0]
+            else:
+                later = [i for i in eligible if i > self.__last_index]
+                if later:
+                    index = later[0]
+                else:
+                    index = eligible[0]
+        elif self.__policy is EndpointPolicy.lowest_latency:
+            unmeasured = [i for i in eligible if self.__stats[i].latency is None]
+            if unmeasured:
+                index = unmeasured[0]
+            else:
+                index = min(eligible, key=lambda i: self.__stats[i].latency / self.__stats[i].health)
+        else:
+            raise NotImplementedError(self.__policy)
+
+        self.__last_index = index
+        return self.__stats[index].endpoint
+
+    def on_success(self, endpoint, latency):
+        """Records a successful connection to `endpoint`.
+
+        Parameters
+        ----------
+        endpoint: tuple
+            2-tuple of (host: `str`, port: `int`).
+        latency: float
+            Seconds from the start of the connection attempt to the
+            connack.
+        """
+        stats = self.stats(endpoint)
+        stats.num_successes += 1
+        stats.consecutive_failures = 0
+        stats.cool_down_end = None
+        stats.health += self.__alpha * (1. - stats.health)
+        if stats.latency is None:
+            stats.latency = float(latency)
+        else:
+            stats.latency += self.__alpha * (latency - stats.latency)
+
+    def on_failure(self, endpoint, instant):
+        """Records a failed connection to `endpoint` and starts its
+        cool-down.
+
+        Parameters
+        ----------
+        endpoint: tuple
+            2-tuple of (host: `str`, port: `int`).
+        instant: float
+            Current scheduler instant.
+        """
+        stats = self.stats(endpoint)
+        stats.num_failures += 1
+        stats.consecutive_failures += 1
+        # Kept above zero so that it can divide latencies.
+        stats.health = max(stats.health * (1. - self.__alpha), 1e-3)
+        exponent = min(stats.consecutive_failures - 1, 32)
+        cool_down = min(self.__cool_down * 2 ** exponent, self.__max_cool_down)
+        stats.cool_down_end = instant + cool_down
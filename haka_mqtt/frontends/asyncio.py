@@ -0,0 +1,639 @@
+"""Runs reactors on an :mod:`asyncio` event loop.
+
+The adapters in this module let a :class:`haka_mqtt.reactor.Reactor`
+share a thread with other asyncio code: socket readiness is watched with
+:meth:`asyncio.AbstractEventLoop.add_reader` and
+:meth:`asyncio.AbstractEventLoop.add_writer`, scheduler deadlines are
+run with :meth:`asyncio.AbstractEventLoop.call_at`, and host names are
+resolved with :meth:`asyncio.AbstractEventLoop.getaddrinfo`.
+
+:class:`MqttAsyncioClient` wires the adapters together.  Publish
+tickets may be awaited and inbound publishes are available through an
+asynchronous iterator::
+
+    client = MqttAsyncioClient(properties)
+    await client.connect()
+    await client.publish('topic', b'payload', 1)
+    async for publish in client.messages():
+        print(publish.payload)
+
+This module requires Python 3.
+"""
+from __future__ import absolute_import
+
+import asyncio
+import ssl
+from collections import deque
+
+from haka_mqtt.frontends.poll import generate_client_id
+from haka_mqtt.mqtt_request import MqttPublishStatus
+from haka_mqtt.reactor import ReactorProperties, Reactor
+from haka_mqtt.socket_factory import SslSocketFactory, SocketFactory
+
+
+class ConnectFailReactorException(Exception):
+    """Raised by the future returned by
+    :meth:`MqttAsyncioClient.connect` when the connection attempt fails.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    error: haka_mqtt.reactor.ReactorError
+        The error that made the attempt fail.
+    """
+    def __init__(self, error):
+        Exception.__init__(self, error)
+        self.error = error
+
+
+class PublishFailReactorException(Exception):
+    """Raised by an :class:`AwaitableTicket` when the reactor becomes
+    inactive before the ticket is done.  The wrapped ticket is not
+    discarded by the reactor and may still complete should the reactor
+    be restarted, but the awaitable will not.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    error: haka_mqtt.reactor.ReactorError or None
+        The error that stopped the reactor or None if it was stopped.
+    """
+    def __init__(self, error):
+        Exception.__init__(self, error)
+        self.error = error
+
+
+class AsyncioSelector(object):
+    """Watches reactor sockets with the reader and writer callbacks of
+    an asyncio event loop.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    loop: asyncio.AbstractEventLoop
+    """
+    def __init__(self, loop):
+        self.__loop = loop
+
+    def add_read(self, fd, reactor):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            File-like object.
+        reactor: haka_mqtt.reactor.Reactor
+        """
+        self.__loop.add_reader(fd, reactor.read)
+
+    def del_read(self, fd, reactor):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            File-like object.
+        reactor: haka_mqtt.reactor.Reactor
+        """
+        self.__loop.remove_reader(fd)
+
+    def add_write(self, fd, reactor):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            File-like object.
+        reactor: haka_mqtt.reactor.Reactor
+        """
+        self.__loop.add_writer(fd, reactor.write)
+
+    def del_write(self, fd, reactor):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            File-like object.
+        reactor: haka_mqtt.reactor.Reactor
+        """
+        self.__loop.remove_writer(fd)
+
+    def add_callback_read(self, fd, cb):
+        """Calls `cb` whenever `fd` is readable.
+
+        Parameters
+        ----------
+        fd: file descriptor
+            Integer or file-like object.
+        cb: callable()
+        """
+        self.__loop.add_reader(fd, cb)
+
+    def del_callback_read(self, fd):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            Integer or file-like object.
+        """
+        self.__loop.remove_reader(fd)
+
+
+class _AsyncioDeadline(object):
+    """Deadline with the interface of
+    :class:`haka_mqtt.scheduler.Deadline`."""
+    def __init__(self, scheduler, duration, cb):
+        self.__scheduler = scheduler
+        self.__cb = cb
+        self.__handle = None
+        self.reset(duration)
+
+    @property
+    def when(self):
+        return self.__handle.when()
+
+    def __on_timeout(self):
+        self.__handle = None
+        self.__scheduler._discard(self)
+        self.__cb()
+
+    def expired(self):
+        """bool: True if callback has already been called or the
+        deadline was cancelled; False otherwise."""
+        return self.__handle is None
+
+    def cancel(self):
+        """Stops a scheduled callback from being made; has no effect if
+        cancel is called after the callback has already been made."""
+        if self.__handle is not None:
+            self.__handle.cancel()
+            self.__handle = None
+            self.__scheduler._discard(self)
+
+    def reset(self, duration):
+        """Reschedules the callback to be made `duration` seconds from
+        now, re-arming the deadline if it has expired or been
+        cancelled.
+
+        Parameters
+        ----------
+        duration: float
+        """
+        if self.__handle is not None:
+            self.__handle.cancel()
+        self.__handle = self.__scheduler._call_at(duration, self.__on_timeout)
+        self.__scheduler._track(self)
+
+
+class AsyncioScheduler(object):
+    """Scheduler whose deadlines are run by the event loop with
+    :meth:`asyncio.AbstractEventLoop.call_at`.  It has the interface of
+    :class:`haka_mqtt.scheduler.ClockScheduler` and measures time with
+    :meth:`asyncio.AbstractEventLoop.time`.  Deadlines are called by the
+    loop so :meth:`poll` has nothing to do.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    loop: asyncio.AbstractEventLoop
+    """
+    def __init__(self, loop):
+        self.__loop = loop
+        self.__deadlines = set()
+
+    def _call_at(self, duration, cb):
+        return self.__loop.call_at(self.__loop.time() + duration, cb)
+
+    def _track(self, deadline):
+        self.__deadlines.add(deadline)
+
+    def _discard(self, deadline):
+        self.__deadlines.discard(deadline)
+
+    def instant(self):
+        """Returns the current loop time.
+
+        Returns
+        -------
+        float
+        """
+        return self.__loop.time()
+
+    def add(self, duration, cb):
+        """Schedules `cb` to be called once `duration` seconds have
+        elapsed.
+
+        Parameters
+        ----------
+        duration: float
+        cb: callable()
+
+        Returns
+        -------
+        Deadline
+        """
+        return _AsyncioDeadline(self, duration, cb)
+
+    def remaining(self):
+        """Duration remaining to next scheduled callback; costs O(n) in
+        the number of pending deadlines.
+
+        Returns
+        -------
+        float or None
+        """
+        if self.__deadlines:
+            rv = min(deadline.when for deadline in self.__deadlines) - self.instant()
+        else:
+            rv = None
+
+        return rv
+
+    def poll(self):
+        """Has no effect; deadlines are called by the event loop."""
+        pass
+
+    def __len__(self):
+        return len(self.__deadlines)
+
+
+class _AsyncioDnsFuture(object):
+    """Adapts the asyncio future returned by
+    :meth:`asyncio.AbstractEventLoop.getaddrinfo` to the interface of
+    the futures returned by
+    :class:`haka_mqtt.dns_async.AsyncFutureDnsResolver`."""
+    def __init__(self, future):
+        self.__future = future
+        self.__cancelled = False
+        self.__done = False
+        self.__result = None
+        self.__exception = None
+        self.__callbacks = []
+        future.add_done_callback(self.__on_done)
+
+    def __on_done(self, future):
+        if not self.__done:
+            self.__done = True
+            if future.cancelled():
+                self.__cancelled = True
+            elif future.exception() is None:
+                self.__result = future.result()
+            else:
+                self.__exception = future.exception()
+            self.__notify()
+
+    def __notify(self):
+        callbacks = self.__callbacks
+        self.__callbacks = []
+        for cb in callbacks:
+            cb(self)
+
+    def cancel(self):
+        if self.__done:
+            rv = False
+        else:
+            self.__cancelled = True
+            self.__done = True
+            self.__future.cancel()
+            self.__notify()
+            rv = True
+
+        return rv
+
+    def cancelled(self):
+        return self.__cancelled
+
+    def done(self):
+        return self.__done
+
+    def result(self, timeout=None):
+        return self.__result
+
+    def exception(self, timeout=None):
+        return self.__exception
+
+    def add_done_callback(self, fn):
+        if self.__done:
+            fn(self)
+        else:
+            self.__callbacks.append(fn)
+
+
+class AsyncioDnsResolver(object):
+    """Resolves host names with
+    :meth:`asyncio.AbstractEventLoop.getaddrinfo`.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    loop: asyncio.AbstractEventLoop
+    """
+    def __init__(self, loop):
+        self.__loop = loop
+
+    def __call__(self, host, port, family=0, socktype=0, proto=0, flags=0):
+        """
+        Parameters
+        ----------
+        host: str or None
+        port: str or int or None
+        family: int
+        socktype: int
+        proto: int
+        flags: int
+
+        Returns
+        -------
+        future
+            A future with the interface of those returned by
+            :class:`haka_mqtt.dns_async.AsyncFutureDnsResolver`; done
+            callbacks are called from the event loop.
+        """
+        coro = self.__loop.getaddrinfo(host, port, family=family, type=socktype, proto=proto, flags=flags)
+        return _AsyncioDnsFuture(self.__loop.create_task(coro))
+
+
+class AwaitableTicket(object):
+    """Wraps a publish ticket so that it can be awaited.  Awaiting
+    returns the ticket once it is done (sent for QoS=0, acknowledged for
+    QoS=1 and QoS=2) or raises :class:`PublishFailReactorException` if
+    the reactor becomes inactive first.  Other attributes are those of
+    the wrapped ticket.
+
+    .. versionadded:: 0.3.6
+
+    Attributes
+    ----------
+    ticket: haka_mqtt.mqtt_request.MqttPublishTicket
+    future: asyncio.Future
+    """
+    def __init__(self, ticket, future):
+        self.ticket = ticket
+        self.future = future
+
+    def __await__(self):
+        return self.future.__await__()
+
+    def __getattr__(self, name):
+        return getattr(self.ticket, name)
+
+    def __repr__(self):
+        return 'AwaitableTicket({!r})'.format(self.ticket)
+
+
+class _PublishIterator(object):
+    """Asynchronous iterator of inbound publish packets."""
+    def __init__(self, loop):
+        self.__loop = loop
+        self.__publishes = deque()
+        self.__waiters = deque()
+        self.__closed = False
+
+    def _put(self, publish):
+        while self.__waiters:
+            waiter = self.__waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(publish)
+                return
+        self.__publishes.append(publish)
+
+    def _close(self):
+        self.__closed = True
+        while self.__waiters:
+            waiter = self.__waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(StopAsyncIteration())
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        future = self.__loop.create_future()
+        if self.__publishes:
+            future.set_result(self.__publishes.popleft())
+        elif self.__closed:
+            future.set_exception(StopAsyncIteration())
+        else:
+            self.__waiters.append(future)
+
+        return future
+
+
+class MqttAsyncioClient(Reactor):
+    """A reactor driven by an asyncio event loop.  Subclasses that
+    override the connection, acknowledgement, or publish callbacks must
+    call the base implementation for tickets, :meth:`connect`,
+    :meth:`disconnect`, and :meth:`messages` to complete.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    properties: haka_mqtt.frontends.poll.MqttPollClientProperties
+        The `cache_time` property is ignored; the loop keeps time.
+    loop: asyncio.AbstractEventLoop or None
+        Defaults to the current event loop.
+    log: str or logging.Logger or None
+        As for :class:`haka_mqtt.reactor.Reactor`.
+    """
+    def __init__(self, properties, loop=None, log='haka'):
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self._loop = loop
+        self._scheduler = AsyncioScheduler(loop)
+        self._selector = AsyncioSelector(loop)
+
+        p = ReactorProperties()
+        if hasattr(properties.ssl, 'wrap_socket') and callable(properties.ssl.wrap_socket):
+            p.socket_factory = SslSocketFactory(properties.ssl, properties.socket_options)
+        elif properties.ssl:
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            p.socket_factory = SslSocketFactory(ssl_context, properties.socket_options)
+        else:
+            p.socket_factory = SocketFactory(properties.socket_options)
+
+        if properties.endpoints is None:
+            p.endpoint = (properties.host, properties.port)
+        p.keepalive_period = properties.keepalive_period
+        p.recv_idle_ping_period = properties.recv_idle_ping_period
+        p.recv_idle_abort_period = properties.recv_idle_abort_period
+        if properties.client_id is None:
+            p.client_id = generate_client_id()
+        else:
+            p.client_id = properties.client_id
+        p.scheduler = self._scheduler
+        p.name_resolver = AsyncioDnsResolver(loop)
+        p.selector = self._selector
+        p.address_family = properties.address_family
+        p.happy_eyeballs_delay = properties.happy_eyeballs_delay
+        p.name_resolution_timeout = properties.name_resolution_timeout
+        p.connect_timeout = properties.connect_timeout
+        p.endpoints = properties.endpoints
+
+        self.__connack_waiters = []
+        self.__disconnect_waiters = []
+        self.__sent_tickets = deque()
+        self.__acked_tickets = {}
+        self.__unnumbered_tickets = []
+        self.__iterators = []
+
+        Reactor.__init__(self, p, log=log)
+
+    def __waiter(self, waiters):
+        future = self._loop.create_future()
+        waiters.append(future)
+        return future
+
+    @staticmethod
+    def __wake(waiters, result=None, exception=None):
+        while waiters:
+            future = waiters.pop()
+            if not future.done():
+                if exception is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(exception)
+
+    def connect(self):
+        """Starts the reactor.
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to the :class:`mqtt_codec.packet.MqttConnack`
+            accepting the connection, fails with
+            :class:`ConnectFailReactorException` when the attempt
+            fails, or resolves to None if the reactor is stopped before
+            the connection is accepted.
+        """
+        future = self.__waiter(self.__connack_waiters)
+        self.start()
+        return future
+
+    def disconnect(self):
+        """Stops the reactor gracefully.
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to None once the reactor is inactive.
+        """
+        if self.is_active():
+            future = self.__waiter(self.__disconnect_waiters)
+            self.stop()
+        else:
+            future = self._loop.create_future()
+            future.set_result(None)
+
+        return future
+
+    def publish(self, topic, payload, qos, retain=False):
+        """As for :meth:`haka_mqtt.reactor.Reactor.publish`.
+
+        Returns
+        -------
+        AwaitableTicket
+        """
+        ticket = Reactor.publish(self, topic, payload, qos, retain)
+        rv = AwaitableTicket(ticket, self._loop.create_future())
+        if qos == 0:
+            self.__sent_tickets.append(rv)
+        elif ticket.packet_id is None:
+            # Packet id is assigned at launch under packet id
+            # backpressure.
+            self.__unnumbered_tickets.append(rv)
+        else:
+            self.__acked_tickets[ticket.packet_id] = rv
+
+        return rv
+
+    def messages(self):
+        """Returns an asynchronous iterator of the
+        :class:`mqtt_codec.packet.MqttPublish` packets received from
+        now on.  The iterator ends when the reactor becomes inactive.
+
+        Returns
+        -------
+        async iterator
+        """
+        rv = _PublishIterator(self._loop)
+        if self.is_active():
+            self.__iterators.append(rv)
+        else:
+            rv._close()
+
+        return rv
+
+    def write(self):
+        Reactor.write(self)
+
+        # QoS=0 publishes are sent in the order they are published.
+        sent = self.__sent_tickets
+        while sent and sent[0].ticket.status is MqttPublishStatus.done:
+            awaitable = sent.popleft()
+            if not awaitable.future.done():
+                awaitable.future.set_result(awaitable.ticket)
+
+    def __on_ack(self, packet_id):
+        if self.__unnumbered_tickets:
+            unnumbered = []
+            for awaitable in self.__unnumbered_tickets:
+                if awaitable.ticket.packet_id is None:
+                    unnumbered.append(awaitable)
+                else:
+                    self.__acked_tickets[awaitable.ticket.packet_id] = awaitable
+            self.__unnumbered_tickets = unnumbered
+
+        awaitable = self.__acked_tickets.pop(packet_id, None)
+        if awaitable is not None and not awaitable.future.done():
+            awaitable.future.set_result(awaitable.ticket)
+
+    def __fail_publishes(self):
+        awaitables = list(self.__sent_tickets)
+        awaitables.extend(self.__unnumbered_tickets)
+        awaitables.extend(self.__acked_tickets.values())
+        self.__sent_tickets.clear()
+        self.__unnumbered_tickets = []
+        self.__acked_tickets = {}
+
+        for awaitable in awaitables:
+            if awaitable.future.done():
+                pass
+            elif awaitable.ticket.status is MqttPublishStatus.done:
+                awaitable.future.set_result(awaitable.ticket)
+            else:
+                awaitable.future.set_exception(PublishFailReactorException(self.error))
+
+    def __on_inactive(self):
+        iterators = self.__iterators
+        self.__iterators = []
+        for iterator in iterators:
+            iterator._close()
+        self.__fail_publishes()
+        self.__wake(self.__disconnect_waiters)
+
+    def on_connack(self, reactor, connack):
+        self.__wake(self.__connack_waiters, result=connack)
+
+    def on_connect_fail(self, reactor):
+        if self.error is None:
+            # Stopped before the connection was accepted.
+            self.__wake(self.__connack_waiters)
+        else:
+            self.__wake(self.__connack_waiters, exception=ConnectFailReactorException(self.error))
+        self.__on_inactive()
+
+    def on_disconnect(self, reactor):
+        self.__on_inactive()
+
+    def on_puback(self, reactor, puback):
+        self.__on_ack(puback.packet_id)
+
+    def on_pubcomp(self, reactor, pubcomp):
+        self.__on_ack(pubcomp.packet_id)
+
+    def on_publish(self, reactor, publish):
+        for iterator in self.__iterators:
+            iterator._put(publish)
@@ -0,0 +1,279 @@
+"""A selector built on :func:`select.epoll` for processes that drive
+thousands of reactors from one thread.
+
+Unlike :func:`select.select` there is no limit on the number of
+registered file descriptors and the cost of each wait is proportional
+to the number of ready file descriptors rather than the number of
+registered ones.  File descriptors are registered with the kernel
+incrementally as reactors call :meth:`EpollSelector.add_read`,
+:meth:`EpollSelector.del_read`, :meth:`EpollSelector.add_write`, and
+:meth:`EpollSelector.del_write`.
+
+Many reactors may share one selector and one scheduler::
+
+    selector = EpollSelector()
+    scheduler = ClockScheduler(MonotonicClock())
+    # ... create reactors with properties.selector = selector and
+    # properties.scheduler = scheduler then start them ...
+    while True:
+        selector.select(scheduler.remaining())
+        scheduler.poll()
+
+Only available on platforms providing :func:`select.epoll` (Linux).
+"""
+
+import select
+from select import EPOLLIN, EPOLLOUT, EPOLLERR, EPOLLHUP
+
+EPOLLET = getattr(select, 'EPOLLET', 1 << 31)
+
+# Events that are delivered whether or not they are requested.
+_EPOLL_FAIL = EPOLLERR | EPOLLHUP
+
+
+def _fileno(fd):
+    """Returns the integer file descriptor of `fd`.
+
+    Parameters
+    ----------
+    fd: int or file-like object
+        Integer or object with a `fileno` method.
+
+    Returns
+    -------
+    int
+    """
+    if hasattr(fd, 'fileno'):
+        rv = fd.fileno()
+    else:
+        rv = fd
+
+    return rv
+
+
+class _EpollEntry(object):
+    def __init__(self, fileno):
+        self.fileno = fileno
+        self.mask = 0
+        self.reactor = None
+        self.on_read = None
+        self.on_write = None
+
+
+class EpollSelector(object):
+    """Implements the :class:`haka_mqtt.selector.Selector` interface
+    on top of :func:`select.epoll`.
+
+    In level-triggered mode (the default) a file descriptor is reported
+    by every wait for as long as it is ready.  In edge-triggered mode
+    it is reported once each time it becomes ready.  Reactors make
+    exactly one ``recv`` or ``send`` call each time they are called so
+    in edge-triggered mode the selector re-arms a file descriptor after
+    a read that returned data and after a write that left the reactor
+    wanting to write; the kernel then reports it again if it is still
+    ready.  Either way a quiet file descriptor costs nothing per wait.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    async_dns_resolver: haka_mqtt.dns_async.AsyncFutureDnsResolver or None
+        When not `None` the resolver's :meth:`read_fd` is registered and
+        its :meth:`poll` method is called whenever it is readable.
+    edge_triggered: bool
+        True to register reactor sockets edge-triggered; False to
+        register them level-triggered.
+    max_events: int
+        Maximum number of events returned by one wait; -1 lets the
+        interpreter choose.
+    """
+    def __init__(self, async_dns_resolver=None, edge_triggered=False, max_events=-1):
+        assert isinstance(edge_triggered, bool)
+
+        self.__epoll = select.epoll()
+        self.__edge_triggered = edge_triggered
+        self.__max_events = max_events
+        self.__entries = {}
+
+        if async_dns_resolver is not None:
+            self.add_callback_read(async_dns_resolver.read_fd(), async_dns_resolver.poll)
+
+    @property
+    def edge_triggered(self):
+        """bool: True if reactor sockets are registered edge-triggered;
+        False otherwise."""
+        return self.__edge_triggered
+
+    def fileno(self):
+        """int: file descriptor of the underlying epoll object."""
+        return self.__epoll.fileno()
+
+    def close(self):
+        """Closes the underlying epoll object."""
+        self.__epoll.close()
+        self.__entries.clear()
+
+    def closed(self):
+        """bool: True if the selector has been closed; False
+        otherwise."""
+        return self.__epoll.closed
+
+    def __len__(self):
+        """Number of registered file descriptors."""
+        return len(self.__entries)
+
+    def __flags(self, entry):
+        flags = entry.mask
+        if self.__edge_triggered and entry.reactor is not None:
+            flags |= EPOLLET
+
+        return flags
+
+    def __update(self, fd, mask_on, mask_off, reactor=None, on_read=None, on_write=None):
+        fileno = _fileno(fd)
+        entry = self.__entries.get(fileno)
+        if entry is None:
+            entry = _EpollEntry(fileno)
+            self.__entries[fileno] = entry
+            registered = False
+        else:
+            registered = True
+
+        if reactor is not None:
+            entry.reactor = reactor
+        if on_read is not None:
+            entry.on_read = on_read
+        if on_write is not None:
+            entry.on_write = on_write
+
+        entry.mask = (entry.mask | mask_on) & ~mask_off
+        if entry.mask == 0:
+            del self.__entries[fileno]
+            if registered:
+                self.__epoll.unregister(fileno)
+        elif registered:
+            self.__epoll.modify(fileno, self.__flags(entry))
+        else:
+            self.__epoll.register(fileno, self.__flags(entry))
+
+    def add_read(self, fd, reactor):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            File-like object.
+        reactor: haka_mqtt.reactor.Reactor
+        """
+        self.__update(fd, EPOLLIN, 0, reactor=reactor, on_read=reactor.read)
+
+    def del_read(self, fd, reactor):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            File-like object.
+        reactor: haka_mqtt.reactor.Reactor
+        """
+        self.__update(fd, 0, EPOLLIN)
+
+    def add_write(self, fd, reactor):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            File-like object.
+        reactor: haka_mqtt.reactor.Reactor
+        """
+        self.__update(fd, EPOLLOUT, 0, reactor=reactor, on_write=reactor.write)
+
+    def del_write(self, fd, reactor):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            File-like object.
+        reactor: haka_mqtt.reactor.Reactor
+        """
+        self.__update(fd, 0, EPOLLOUT)
+
+    def add_callback_read(self, fd, cb):
+        """Calls `cb` whenever `fd` is readable.  The registration is
+        always level-triggered.
+
+        Parameters
+        ----------
+        fd: file descriptor
+            Integer or file-like object.
+        cb: callable()
+        """
+        self.__update(fd, EPOLLIN, 0, on_read=cb)
+
+    def del_callback_read(self, fd):
+        """Stops calling the callback registered for `fd` with
+        :meth:`add_callback_read`.
+
+        Parameters
+        ----------
+        fd: file descriptor
+            Integer or file-like object.
+        """
+        self.__update(fd, 0, EPOLLIN)
+
+    def wait(self, select_timeout=None):
+        """Blocks until a file descriptor is ready or `select_timeout`
+        elapses.
+
+        Parameters
+        ----------
+        select_timeout: float or None
+            Maximum time to block in seconds; `None` blocks
+            indefinitely.
+
+        Returns
+        -------
+        list of (int, int)
+            Ready (fileno, event mask) pairs.
+        """
+        if select_timeout is None:
+            select_timeout = -1
+
+        return self.__epoll.poll(select_timeout, self.__max_events)
+
+    def dispatch(self, events):
+        """Calls the read and write handlers of ready file descriptors.
+
+        Parameters
+        ----------
+        events: list of (int, int)
+            (fileno, event mask) pairs as returned by :meth:`wait`.
+        """
+        entries = self.__entries
+        for fileno, event in events:
+            # A handler called earlier in this batch may have closed
+            # this file descriptor.
+            entry = entries.get(fileno)
+            if entry is None:
+                continue
+
+            num_bytes_read = 0
+            if entry.mask & EPOLLIN and event & (EPOLLIN | _EPOLL_FAIL):
+                num_bytes_read = entry.on_read()
+
+            if entry.mask & EPOLLOUT and event & (EPOLLOUT | _EPOLL_FAIL) and entries.get(fileno) is entry:
+                entry.on_write()
+
+            if self.__edge_triggered and entry.reactor is not None and entries.get(fileno) is entry:
+                if num_bytes_read or (entry.mask & EPOLLOUT and entry.reactor.want_write()):
+                    # Re-arming an edge-triggered registration makes
+                    # the kernel report it again if it is still ready.
+                    self.__epoll.modify(fileno, self.__flags(entry))
+
+    def select(self, select_timeout=None):
+        """Waits for up to `select_timeout` seconds then calls the
+        handlers of ready file descriptors.
+
+        Parameters
+        ----------
+        select_timeout: float or None
+        """
+        self.dispatch(self.wait(select_timeout))
@@ -0,0 +1,650 @@
+"""Simulates very large client populations with a pool of worker
+processes.
+
+Each worker process hosts many reactors on one
+:class:`haka_mqtt.frontends.hub.ReactorHub` so that the work of a fleet
+is spread over as many cores as there are workers.  The parent process
+hands out client configurations over one pipe to each worker and
+receives per-client events and per-worker metrics over a second pipe.
+Workers never block on the parent: reports are buffered and written as
+the pipe accepts them, driven by the worker hub's selector, so a slow
+parent delays reports but not the worker's reactors.
+
+Frames on the pipe start with a one byte frame type.  Configurations
+are pickled once when clients are added; everything streamed back to
+the parent is packed with :mod:`struct` so that 100k clients do not
+flood the parent with pickles:
+
+* ``ADD`` (parent to worker): pickled list of (index, FleetClientConfig).
+* ``STOP`` (parent to worker): no payload.
+* ``EVENTS`` (worker to parent): repeated (client index: uint32, event:
+  uint8, value: uint32).
+* ``METRICS`` (worker to parent): uint32 counters; see
+  :class:`FleetMetrics`.
+* ``DONE`` (worker to parent): no payload; the worker has stopped.
+"""
+
+import errno
+import fcntl
+import os
+import pickle
+import select
+import struct
+from collections import deque
+from multiprocessing import Pipe, Process
+
+from enum import IntEnum, unique
+
+from haka_mqtt.clock import MonotonicClock
+from haka_mqtt.frontends.hub import ReactorHub
+from haka_mqtt.reactor import Reactor, ReactorState
+
+
+@unique
+class FleetEvent(IntEnum):
+    """Per-client events streamed from workers to the parent.  The
+    value accompanying each event is described by each member."""
+    #: Connection accepted; value is milliseconds since the client
+    #: started connecting.
+    connack = 0
+    #: Connection attempt failed; value is zero.
+    connect_fail = 1
+    #: Established connection lost; value is zero.
+    disconnect = 2
+    #: QoS=1 or QoS=2 publish acknowledged; value is the round-trip
+    #: time in milliseconds.
+    ack = 3
+
+
+_ADD = 1
+_STOP = 2
+_EVENTS = 3
+_METRICS = 4
+_DONE = 5
+
+_EVENT_STRUCT = struct.Struct('!IBI')
+_METRICS_STRUCT = struct.Struct('!IIIIII')
+_MAX_VALUE = 2**32 - 1
+
+
+def _encode_events(events):
+    """
+    Parameters
+    ----------
+    events: iterable of (int, FleetEvent, int)
+
+    Returns
+    -------
+    bytes
+        An ``EVENTS`` frame.
+    """
+    buf = bytearray(struct.pack('!B', _EVENTS))
+    for index, event, value in events:
+        buf.extend(_EVENT_STRUCT.pack(index, event, min(value, _MAX_VALUE)))
+
+    return bytes(buf)
+
+
+def _decode_events(frame):
+    """
+    Parameters
+    ----------
+    frame: bytes
+        An ``EVENTS`` frame.
+
+    Returns
+    -------
+    list of (int, FleetEvent, int)
+    """
+    rv = []
+    size = _EVENT_STRUCT.size
+    for offset in range(1, len(frame), size):
+        index, event, value = _EVENT_STRUCT.unpack_from(frame, offset)
+        rv.append((index, FleetEvent(event), value))
+
+    return rv
+
+
+class FleetClientConfig(object):
+    """Describes one simulated client.
+
+    .. versionadded:: 0.3.6
+
+    Attributes
+    ----------
+    client_id: str
+    endpoint: tuple
+        2-tuple of (host: `str`, port: `int`).
+    keepalive_period: int
+        As for :class:`haka_mqtt.reactor.ReactorProperties`.
+    topics: list of mqtt_codec.packet.MqttTopic
+        Topics subscribed to after every connack.
+    publish_period: float or None
+        Seconds between publishes; `None` to never publish.
+    publish_topic: str or None
+        Topic to publish on; defaults to ``fleet/<client_id>``.
+    payload: bytes
+    qos: int
+        0 <= qos <= 2
+    reconnect_delay: float
+        Seconds to wait before reconnecting after a connection fails
+        or is lost.
+    """
+    def __init__(self, client_id, endpoint):
+        self.client_id = client_id
+        self.endpoint = endpoint
+        self.keepalive_period = 0
+        self.topics = []
+        self.publish_period = None
+        self.publish_topic = None
+        self.payload = b''
+        self.qos = 0
+        self.reconnect_delay = 10.
+
+
+class FleetMetrics(object):
+    """Counters reported by workers.
+
+    Attributes
+    ----------
+    num_clients: int
+        Number of clients hosted.
+    num_connected: int
+        Number of clients with an accepted connection.
+    num_published: int
+        Number of publish calls made.
+    num_acked: int
+        Number of QoS=1 and QoS=2 publishes acknowledged.
+    num_received: int
+        Number of publish packets received.
+    num_iterations: int
+        Number of event-loop iterations made by workers.
+    """
+    def __init__(self, num_clients=0, num_connected=0, num_published=0, num_acked=0, num_received=0,
+                 num_iterations=0):
+        self.num_clients = num_clients
+        self.num_connected = num_connected
+        self.num_published = num_published
+        self.num_acked = num_acked
+        self.num_received = num_received
+        self.num_iterations = num_iterations
+
+    def _values(self):
+        return (self.num_clients,
+                self.num_connected,
+                self.num_published,
+                self.num_acked,
+                self.num_received,
+                self.num_iterations)
+
+    def __add__(self, other):
+        return FleetMetrics(*[a + b for a, b in zip(self._values(), other._values())])
+
+    def __eq__(self, other):
+        return isinstance(other, FleetMetrics) and self._values() == other._values()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return ('FleetMetrics(num_clients={}, num_connected={}, num_published={}, num_acked={}, '
+                'num_received={}, num_iterations={})').format(*self._values())
+
+
+class _FleetReactor(Reactor):
+    def __init__(self, properties, index, config, worker):
+        Reactor.__init__(self, properties, log=None)
+        self.__index = index
+        self.__config = config
+        self.__worker = worker
+        self.__scheduler = properties.scheduler
+        self.__start_instant = None
+        self.__publish_deadline = None
+        self.__reconnect_deadline = None
+        self.__publish_instants = deque()
+        self.connected = False
+
+        if config.publish_topic is None:
+            self.__publish_topic = 'fleet/{}'.format(config.client_id)
+        else:
+            self.__publish_topic = config.publish_topic
+
+    def start(self):
+        self.__start_instant = self.__scheduler.instant()
+        Reactor.start(self)
+
+    def halt(self):
+        """Cancels deadlines and stops the reactor."""
+        for deadline in (self.__publish_deadline, self.__reconnect_deadline):
+            if deadline is not None:
+                deadline.cancel()
+        self.__publish_deadline = None
+        self.__reconnect_deadline = None
+        self.stop()
+
+    def __elapsed_ms(self, instant):
+        return int(round((self.__scheduler.instant() - instant) * 1000))
+
+    def __schedule_reconnect(self):
+        self.connected = False
+        if self.__publish_deadline is not None:
+            self.__publish_deadline.cancel()
+            self.__publish_deadline = None
+
+        if not self.__worker.stopping:
+            self.__reconnect_deadline = self.__scheduler.add(self.__config.reconnect_delay, self.__on_reconnect)
+
+    def __on_reconnect(self):
+        self.__reconnect_deadline = None
+        self.start()
+
+    def __on_publish_timeout(self):
+        if self.state is ReactorState.started:
+            self.publish(self.__publish_topic, self.__config.payload, self.__config.qos)
+            self.__worker.num_published += 1
+            if self.__config.qos > 0:
+                self.__publish_instants.append(self.__scheduler.instant())
+        self.__publish_deadline.reset(self.__config.publish_period)
+
+    def __on_ack(self):
+        self.__worker.num_acked += 1
+        if self.__publish_instants:
+            latency = self.__elapsed_ms(self.__publish_instants.popleft())
+        else:
+            latency = 0
+        self.__worker.event(self.__index, FleetEvent.ack, latency)
+
+    def on_connack(self, reactor, connack):
+        self.connected = True
+        self.__worker.event(self.__index, FleetEvent.connack, self.__elapsed_ms(self.__start_instant))
+        if self.__config.topics:
+            self.subscribe(self.__config.topics)
+        if self.__config.publish_period is not None and self.__publish_deadline is None:
+            self.__publish_deadline = self.__scheduler.add(self.__config.publish_period, self.__on_publish_timeout)
+
+    def on_connect_fail(self, reactor):
+        self.__worker.event(self.__index, FleetEvent.connect_fail, 0)
+        self.__schedule_reconnect()
+
+    def on_disconnect(self, reactor):
+        if self.connected:
+            self.__worker.event(self.__index, FleetEvent.disconnect, 0)
+        self.__schedule_reconnect()
+
+    def on_puback(self, reactor, puback):
+        self.__on_ack()
+
+    def on_pubcomp(self, reactor, pubcomp):
+        self.__on_ack()
+
+    def on_publish(self, reactor, publish):
+        self.__worker.num_received += 1
+
+
+class _FrameWriter(object):
+    """Queues frames for the parent and writes as much as the pipe
+    accepts whenever the selector reports it writable.
+
+    Frames carry the 4-byte big-endian length prefix of
+    :class:`multiprocessing.Connection` so that the parent reads them
+    with `recv_bytes`.
+
+    Parameters
+    ----------
+    conn: multiprocessing.Connection
+        Write end of a one-way pipe; made non-blocking.
+    selector: object
+        Selector with the `add_write` and `del_write` methods of
+        :class:`haka_mqtt.frontends.epoll.EpollSelector`.
+    """
+    def __init__(self, conn, selector):
+        self.__fd = conn.fileno()
+        self.__selector = selector
+        self.__buf = bytearray()
+        self.__registered = False
+        self.closed = False
+
+        flags = fcntl.fcntl(self.__fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.__fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def __len__(self):
+        """Number of bytes waiting to be written."""
+        return len(self.__buf)
+
+    def want_write(self):
+        return bool(self.__buf)
+
+    def send_bytes(self, frame):
+        if not self.closed:
+            self.__buf.extend(struct.pack('!i', len(frame)))
+            self.__buf.extend(frame)
+            self.write()
+
+    def write(self):
+        try:
+            while self.__buf:
+                num_bytes_written = os.write(self.__fd, self.__buf)
+                del self.__buf[0:num_bytes_written]
+        except (IOError, OSError) as e:
+            if e.errno == errno.EPIPE:
+                # Parent has gone away.
+                self.closed = True
+                self.__buf = bytearray()
+            elif e.errno != errno.EAGAIN:
+                raise
+
+        if self.__buf and not self.__registered:
+            self.__selector.add_write(self.__fd, self)
+            self.__registered = True
+        elif not self.__buf and self.__registered:
+            self.__selector.del_write(self.__fd, self)
+            self.__registered = False
+
+    def drain(self):
+        """Blocks until every queued frame is written or the parent
+        goes away."""
+        while self.__buf and not self.closed:
+            select.select([], [self.__fd], [])
+            self.write()
+
+        if self.__registered:
+            self.__selector.del_write(self.__fd, self)
+            self.__registered = False
+
+
+class _FleetWorker(object):
+    """Runs in a worker process; hosts reactors on one hub."""
+    def __init__(self, conn, report_conn, flush_period, stop_timeout):
+        self.__conn = conn
+        self.__report_conn = report_conn
+        self.__flush_period = flush_period
+        self.__stop_timeout = stop_timeout
+        self.__hub = ReactorHub()
+        self.__hub.add_callback_read(conn.fileno(), self.__on_command)
+        self.__writer = _FrameWriter(report_conn, self.__hub.selector)
+        self.__events = []
+        self.__reactors = []
+        self.stopping = False
+        self.num_published = 0
+        self.num_acked = 0
+        self.num_received = 0
+
+    def event(self, index, event, value):
+        self.__events.append((index, event, value))
+
+    def __add(self, clients):
+        for index, config in clients:
+            p = self.__hub.reactor_properties()
+            p.client_id = config.client_id
+            p.endpoint = config.endpoint
+            p.keepalive_period = config.keepalive_period
+            reactor = _FleetReactor(p, index, config, self)
+            self.__hub.add(reactor)
+            self.__reactors.append(reactor)
+            reactor.start()
+
+    def __stop(self):
+        self.stopping = True
+        for reactor in self.__reactors:
+            reactor.halt()
+
+    def __on_command(self):
+        try:
+            while self.__conn.poll():
+                frame = self.__conn.recv_bytes()
+                frame_type = struct.unpack_from('!B', frame)[0]
+                if frame_type == _ADD:
+                    self.__add(pickle.loads(frame[1:]))
+                elif frame_type == _STOP:
+                    self.__stop()
+                else:
+                    raise NotImplementedError(frame_type)
+        except EOFError:
+            # Parent has gone away.
+            self.__hub.del_callback_read(self.__conn.fileno())
+            self.__stop()
+
+    def __flush(self, final=False):
+        if self.__events:
+            self.__writer.send_bytes(_encode_events(self.__events))
+            self.__events = []
+
+        if len(self.__writer) and not final:
+            # Metrics are snapshots; skip this one rather than queue it
+            # behind reports the parent has not read yet.
+            return
+
+        num_connected = sum(1 for reactor in self.__reactors if reactor.connected)
+        metrics = _METRICS_STRUCT.pack(len(self.__reactors),
+                                       num_connected,
+                                       self.num_published & _MAX_VALUE,
+                                       self.num_acked & _MAX_VALUE,
+                                       self.num_received & _MAX_VALUE,
+                                       self.__hub.num_iterations & _MAX_VALUE)
+        self.__writer.send_bytes(struct.pack('!B', _METRICS) + metrics)
+
+    def run(self):
+        scheduler = self.__hub.scheduler
+        while not self.stopping:
+            self.__hub.poll(self.__flush_period)
+            self.__flush()
+
+        stop_instant = scheduler.instant() + self.__stop_timeout
+        while self.__hub.is_active() and scheduler.instant() < stop_instant:
+            self.__hub.poll(self.__flush_period)
+            self.__flush()
+
+        for reactor in self.__reactors:
+            reactor.terminate()
+        self.__flush(final=True)
+        self.__writer.send_bytes(struct.pack('!B', _DONE))
+        self.__writer.drain()
+
+        self.__hub.close()
+        self.__conn.close()
+        self.__report_conn.close()
+
+
+def _worker_main(conn, report_conn, flush_period, stop_timeout):
+    _FleetWorker(conn, report_conn, flush_period, stop_timeout).run()
+
+
+class _WorkerHandle(object):
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.report_conn = None
+        self.pending = []
+        self.metrics = FleetMetrics()
+        self.done = False
+
+
+class FleetRunner(object):
+    """Spawns `num_workers` processes and spreads simulated clients
+    across them.  Override :meth:`on_event` to receive per-client
+    events.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    num_workers: int
+        0 < num_workers
+    flush_period: float
+        Seconds between event and metrics reports from each worker.
+    stop_timeout: float
+        Seconds workers wait for clients to disconnect gracefully
+        before terminating them.
+    """
+    def __init__(self, num_workers, flush_period=0.25, stop_timeout=5.):
+        assert num_workers > 0
+
+        self.__flush_period = flush_period
+        self.__stop_timeout = stop_timeout
+        self.__workers = [_WorkerHandle(i) for i in range(0, num_workers)]
+        self.__configs = []
+        self.__started = False
+
+    def on_event(self, config, event, value):
+        """Called by :meth:`poll` for every event reported by a worker.
+
+        Parameters
+        ----------
+        config: FleetClientConfig
+        event: FleetEvent
+        value: int
+        """
+        pass
+
+    def __len__(self):
+        """Number of clients added."""
+        return len(self.__configs)
+
+    def add(self, config):
+        """Adds a client to the fleet; clients are assigned to workers in
+        turn.  Clients added after :meth:`start` are sent to their
+        worker immediately.
+
+        Parameters
+        ----------
+        config: FleetClientConfig
+
+        Returns
+        -------
+        int
+            Index of the worker hosting the client.
+        """
+        index = len(self.__configs)
+        self.__configs.append(config)
+        worker = self.__workers[index % len(self.__workers)]
+        worker.pending.append((index, config))
+        if self.__started:
+            self.__send_pending(worker)
+
+        return worker.index
+
+    def __send_pending(self, worker):
+        if worker.pending:
+            worker.conn.send_bytes(struct.pack('!B', _ADD) + pickle.dumps(worker.pending, 2))
+            worker.pending = []
+
+    def start(self):
+        """Spawns the worker processes and sends them their clients."""
+        assert not self.__started
+        self.__started = True
+        for worker in self.__workers:
+            # Commands and reports travel on separate one-way pipes so
+            # that the worker can make its report end non-blocking.
+            child_conn, worker.conn = Pipe(duplex=False)
+            worker.report_conn, child_report_conn = Pipe(duplex=False)
+            worker.process = Process(target=_worker_main,
+                                     args=(child_conn, child_report_conn, self.__flush_period, self.__stop_timeout),
+                                     name='haka-fleet-{}'.format(worker.index))
+            worker.process.daemon = True
+            worker.process.start()
+            child_conn.close()
+            child_report_conn.close()
+            self.__send_pending(worker)
+
+    def is_running(self):
+        """bool: True if any worker has not finished; False
+        otherwise."""
+        return self.__started and not all(worker.done for worker in self.__workers)
+
+    def metrics(self):
+        """Returns the sum of the most recent metrics reported by every
+        worker.
+
+        Returns
+        -------
+        FleetMetrics
+        """
+        rv = FleetMetrics()
+        for worker in self.__workers:
+            rv = rv + worker.metrics
+
+        return rv
+
+    def worker_metrics(self):
+        """
+        Returns
+        -------
+        list of FleetMetrics
+            Most recent metrics reported by each worker.
+        """
+        return [worker.metrics for worker in self.__workers]
+
+    def __on_frame(self, worker, frame):
+        frame_type = struct.unpack_from('!B', frame)[0]
+        if frame_type == _EVENTS:
+            for index, event, value in _decode_events(frame):
+                self.on_event(self.__configs[index], event, value)
+        elif frame_type == _METRICS:
+            worker.metrics = FleetMetrics(*_METRICS_STRUCT.unpack_from(frame, 1))
+        elif frame_type == _DONE:
+            worker.done = True
+        else:
+            raise NotImplementedError(frame_type)
+
+    def poll(self, timeout=0.):
+        """Waits up to `timeout` seconds for reports from workers and
+        processes every report available.
+
+        Parameters
+        ----------
+        timeout: float
+        """
+        conns = dict((worker.report_conn, worker) for worker in self.__workers if not worker.done)
+        if conns:
+            rlist, wlist, xlist = select.select(list(conns.keys()), [], [], timeout)
+            for conn in rlist:
+                worker = conns[conn]
+                try:
+                    while not worker.done and conn.poll():
+                        self.__on_frame(worker, conn.recv_bytes())
+                except EOFError:
+                    worker.done = True
+
+    def stop(self, timeout=None):
+        """Asks every worker to disconnect its clients, waits for them
+        to finish, then joins them.
+
+        Parameters
+        ----------
+        timeout: float or None
+            Seconds to wait for workers to finish before killing them;
+            defaults to twice the `stop_timeout` passed to the
+            constructor.
+        """
+        if not self.__started:
+            return
+
+        if timeout is None:
+            timeout = 2 * self.__stop_timeout
+
+        for worker in self.__workers:
+            if not worker.done:
+                try:
+                    worker.conn.send_bytes(struct.pack('!B', _STOP))
+                except (IOError, OSError):
+                    worker.done = True
+
+        # Workers block on their final reports so keep reading them.
+        clock = MonotonicClock()
+        end = clock.time() + timeout
+        while self.is_running() and clock.time() < end:
+            self.poll(min(0.05, max(0., end - clock.time())))
+
+        for worker in self.__workers:
+            worker.process.join(max(0., end - clock.time()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+
+        # Collect the final reports.
+        self.poll(0)
+        for worker in self.__workers:
+            worker.done = True
+            worker.conn.close()
+            worker.report_conn.close()
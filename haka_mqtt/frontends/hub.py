@@ -0,0 +1,281 @@
+"""Runs any number of reactors from a single thread.
+
+A :class:`ReactorHub` owns one selector, one scheduler, and one
+asynchronous DNS resolver and shares them between all of its reactors.
+This is the M:N model where M reactors are mapped onto a single thread;
+run one hub per thread to map them onto N threads.
+
+>>> hub = ReactorHub()
+>>> p = hub.reactor_properties()
+>>> p.endpoint = ('test.mosquitto.org', 1883)
+>>> p.client_id = 'client-0'
+>>> reactor = hub.add(Reactor(p))
+>>> reactor.start()              # doctest: +SKIP
+>>> hub.run()                    # doctest: +SKIP
+>>> hub.close()
+"""
+
+import select
+
+from haka_mqtt.clock import MonotonicClock, CachedClock
+from haka_mqtt.dns_async import AsyncFutureDnsResolver
+from haka_mqtt.frontends.poll import _PollClientSelector
+from haka_mqtt.reactor import ReactorProperties, Reactor
+from haka_mqtt.scheduler import ClockScheduler
+from haka_mqtt.socket_factory import SocketFactory
+
+if hasattr(select, 'epoll'):
+    from haka_mqtt.frontends.epoll import EpollSelector
+else:
+    EpollSelector = None
+
+
+class ReactorHub(object):
+    """Drives many reactors with one selector, one scheduler, and one
+    DNS resolver.
+
+    The cost of each loop iteration is proportional to the number of
+    ready file descriptors and expired deadlines, not to the number of
+    reactors.  :class:`haka_mqtt.frontends.epoll.EpollSelector` is used
+    where available; elsewhere a :func:`select.select`-based selector
+    is used and the hub is limited to FD_SETSIZE file descriptors.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    clock: object or None
+        Object with a `time` method.  Defaults to a
+        :class:`haka_mqtt.clock.MonotonicClock`.
+    scheduler: object or None
+        A scheduler with the interface of
+        :class:`haka_mqtt.scheduler.ClockScheduler` (for example a
+        :class:`haka_mqtt.timing_wheel.TimingWheelScheduler`) built on
+        `clock`.  Defaults to a ClockScheduler.
+    thread_pool_size: int
+        Number of DNS resolver threads.
+    edge_triggered: bool
+        Passed to :class:`haka_mqtt.frontends.epoll.EpollSelector`.
+    cache_time: bool
+        When `True` the clock is sampled once per loop iteration as
+        described in
+        :class:`haka_mqtt.frontends.poll.MqttPollClientProperties`.
+        Requires that the default scheduler is used.
+    """
+    def __init__(self, clock=None, scheduler=None, thread_pool_size=1, edge_triggered=False, cache_time=False):
+        assert not (cache_time and scheduler is not None)
+
+        if clock is None:
+            clock = MonotonicClock()
+        self.__raw_clock = clock
+        self.__clock = CachedClock(clock)
+        self.__cache_time = cache_time
+
+        if scheduler is None:
+            scheduler = ClockScheduler(self.__clock)
+        self.__scheduler = scheduler
+
+        self.__name_resolver = AsyncFutureDnsResolver(thread_pool_size)
+        if EpollSelector is None:
+            self.__selector = _PollClientSelector(self.__name_resolver)
+        else:
+            self.__selector = EpollSelector(self.__name_resolver, edge_triggered=edge_triggered)
+
+        self.__reactors = set()
+        self.__num_iterations = 0
+        self.__busy_time = 0.
+        self.__interrupted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    @property
+    def scheduler(self):
+        """Scheduler shared by all reactors."""
+        return self.__scheduler
+
+    @property
+    def selector(self):
+        """Selector shared by all reactors."""
+        return self.__selector
+
+    @property
+    def name_resolver(self):
+        """haka_mqtt.dns_async.AsyncFutureDnsResolver: DNS resolver
+        shared by all reactors."""
+        return self.__name_resolver
+
+    @property
+    def num_iterations(self):
+        """int: Number of loop iterations made by :meth:`poll`."""
+        return self.__num_iterations
+
+    @property
+    def busy_time(self):
+        """float: Total time spent by :meth:`poll` calling reactors and
+        deadlines; time spent waiting for file descriptors is
+        excluded."""
+        return self.__busy_time
+
+    def add_callback_read(self, fd, cb):
+        """Calls `cb` from the hub loop whenever `fd` is readable.
+
+        Parameters
+        ----------
+        fd: file descriptor
+            Integer or file-like object.
+        cb: callable()
+        """
+        self.__selector.add_callback_read(fd, cb)
+
+    def del_callback_read(self, fd):
+        """Stops calling the callback registered for `fd` with
+        :meth:`add_callback_read`.
+
+        Parameters
+        ----------
+        fd: file descriptor
+            Integer or file-like object.
+        """
+        self.__selector.del_callback_read(fd)
+
+    def reactor_properties(self):
+        """Returns properties with the `selector`, `scheduler`, and
+        `name_resolver` dependencies set to those of the hub and a
+        :class:`haka_mqtt.socket_factory.SocketFactory`.  The caller
+        must set at least `endpoint` and `client_id`.
+
+        Returns
+        -------
+        haka_mqtt.reactor.ReactorProperties
+        """
+        p = ReactorProperties()
+        p.socket_factory = SocketFactory()
+        p.selector = self.__selector
+        p.scheduler = self.__scheduler
+        p.name_resolver = self.__name_resolver
+        return p
+
+    def add(self, reactor):
+        """Adds `reactor` to the hub.  The reactor must have been
+        created with properties returned by :meth:`reactor_properties`.
+
+        Parameters
+        ----------
+        reactor: haka_mqtt.reactor.Reactor
+
+        Returns
+        -------
+        haka_mqtt.reactor.Reactor
+            `reactor`
+        """
+        self.__reactors.add(reactor)
+        return reactor
+
+    def remove(self, reactor):
+        """Removes `reactor` from the hub.  The reactor should be
+        inactive.
+
+        Parameters
+        ----------
+        reactor: haka_mqtt.reactor.Reactor
+
+        Raises
+        ------
+        KeyError
+            Raised when `reactor` has not been added to the hub.
+        """
+        assert not reactor.is_active()
+        self.__reactors.remove(reactor)
+
+    def reactors(self):
+        """
+        Returns
+        -------
+        list of haka_mqtt.reactor.Reactor
+            Reactors added to the hub.
+        """
+        return list(self.__reactors)
+
+    def __len__(self):
+        return len(self.__reactors)
+
+    def is_active(self):
+        """True if any reactor in the hub is active; False otherwise.
+        Stops at the first active reactor found.
+
+        Returns
+        -------
+        bool
+        """
+        return any(reactor.is_active() for reactor in self.__reactors)
+
+    def interrupt(self):
+        """Makes the current call to :meth:`poll` return once the
+        current loop iteration completes; if :meth:`poll` is not
+        running then the next call makes a single iteration.  Must be
+        called from the hub thread (for example from a callback)."""
+        self.__interrupted = True
+
+    def poll(self, period=0.):
+        """Services all reactors until `period` seconds have elapsed or
+        until no reactor is active.  At least one loop iteration is
+        made.
+
+        Parameters
+        ----------
+        period: float
+        """
+        poll_end_time = self.__clock.time() + period
+
+        try:
+            while True:
+                select_timeout = self.__scheduler.remaining()
+                if select_timeout is None or self.__clock.time() + select_timeout > poll_end_time:
+                    select_timeout = poll_end_time - self.__clock.time()
+
+                if select_timeout < 0.:
+                    select_timeout = 0
+
+                ready = self.__selector.wait(select_timeout)
+                start = self.__raw_clock.time()
+                if self.__cache_time:
+                    self.__clock.sample()
+                self.__selector.dispatch(ready)
+                self.__scheduler.poll()
+                self.__num_iterations += 1
+                self.__busy_time += self.__raw_clock.time() - start
+
+                if self.__interrupted:
+                    self.__interrupted = False
+                    break
+                elif self.__clock.time() >= poll_end_time:
+                    break
+                elif len(self.__scheduler) == 0 and not self.is_active():
+                    # Inactive reactors have no deadlines so the hub
+                    # is only examined when the scheduler is empty.
+                    break
+        finally:
+            self.__clock.release()
+
+    def run(self, period=1.):
+        """Services all reactors until every one of them is inactive.
+
+        Parameters
+        ----------
+        period: float
+            Period passed to each call to :meth:`poll`.
+        """
+        while self.is_active():
+            self.poll(period)
+
+    def close(self):
+        """Closes the DNS resolver and the selector.  Reactors should be
+        inactive before the hub is closed."""
+        self.__name_resolver.close()
+        if hasattr(self.__selector, 'close'):
+            self.__selector.close()
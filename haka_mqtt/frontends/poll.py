@@ -5,12 +5,13 @@ from datetime import datetime
 from select import select
 from time import sleep
 
-from haka_mqtt.clock import SystemClock
+from haka_mqtt.clock import MonotonicClock, CachedClock
 from haka_mqtt.dns_async import AsyncFutureDnsResolver
 from haka_mqtt.dns_sync import SynchronousFutureDnsResolver
 from haka_mqtt.reactor import ReactorProperties, Reactor, ACTIVE_STATES
 from haka_mqtt.scheduler import ClockScheduler
 from haka_mqtt.socket_factory import SslSocketFactory, SocketFactory, BlockingSocketFactory, BlockingSslSocketFactory
+from haka_mqtt.threadsafe import ThreadSafePublisher
 
 
 def generate_client_id():
@@ -72,13 +73,61 @@ class _PollClientSelector(object):
         """
         del self.__wmap[fd]
 
-    def select(self, select_timeout=None):
+    def add_callback_read(self, fd, cb):
+        """Calls `cb` whenever `fd` is readable.
+
+        Parameters
+        ----------
+        fd: file descriptor
+            Integer or file-like object.
+        cb: callable()
+        """
+        self.__rmap[fd] = cb
+
+    def del_callback_read(self, fd):
+        """
+        Parameters
+        ----------
+        fd: file descriptor
+            Integer or file-like object.
+        """
+        del self.__rmap[fd]
+
+    def wait(self, select_timeout=None):
+        """Blocks until a file descriptor is ready or `select_timeout`
+        elapses.
+
+        Returns
+        -------
+        tuple of (list, list)
+            Lists of file descriptors ready for reading and writing.
+        """
         rlist, wlist, xlist = select(self.__rmap.keys(), self.__wmap.keys(), [], select_timeout)
+        return rlist, wlist
+
+    def dispatch(self, ready):
+        """Calls the read and write handlers of ready file descriptors.
+
+        Parameters
+        ----------
+        ready: tuple of (list, list)
+            Lists of file descriptors ready for reading and writing as
+            returned by :meth:`wait`.
+        """
+        rlist, wlist = ready
         for fd in rlist:
-            self.__rmap[fd]()
+            # A handler called earlier may have unregistered fd.
+            cb = self.__rmap.get(fd)
+            if cb is not None:
+                cb()
 
         for fd in wlist:
-            self.__wmap[fd]()
+            cb = self.__wmap.get(fd)
+            if cb is not None:
+                cb()
+
+    def select(self, select_timeout=None):
+        self.dispatch(self.wait(select_timeout))
 
 
 class MqttPollClientProperties(object):
@@ -120,6 +169,44 @@ class MqttPollClientProperties(object):
         If ``ssl`` has a callable ``wrap_socket`` method then it is
         assumed that ``ssl`` is a SSLContext to be used for securing
         sockets.
+    cache_time: bool
+        When `True` the clock is sampled once per poll iteration and
+        every deadline calculation in that iteration uses the sampled
+        instant.  Deadlines added by callbacks that block for a long
+        time will be early by the time they blocked.  Default is
+        `False`.
+
+        .. versionadded:: 0.3.6
+    happy_eyeballs_delay: float or None
+        See :attr:`haka_mqtt.reactor.ReactorProperties.happy_eyeballs_delay`;
+        used by :class:`MqttPollClient` and
+        :class:`haka_mqtt.frontends.asyncio.MqttAsyncioClient` only.
+        Default is `None`.
+
+        .. versionadded:: 0.3.6
+    name_resolution_timeout: float or None
+        See :attr:`haka_mqtt.reactor.ReactorProperties.name_resolution_timeout`;
+        not supported by :class:`BlockingMqttClient`.  Default is
+        `None`.
+
+        .. versionadded:: 0.3.6
+    connect_timeout: float or None
+        See :attr:`haka_mqtt.reactor.ReactorProperties.connect_timeout`;
+        :class:`BlockingMqttClient` also sets it as the socket timeout
+        while connecting.  Default is `None`.
+
+        .. versionadded:: 0.3.6
+    endpoints: haka_mqtt.endpoints.EndpointList or None
+        See :attr:`haka_mqtt.reactor.ReactorProperties.endpoints`; when
+        set `host` and `port` are ignored.  Default is `None`.
+
+        .. versionadded:: 0.3.6
+    socket_options: haka_mqtt.socket_factory.SocketOptions or str or None
+        Options set on each socket before it is connected, or the name
+        of a :func:`haka_mqtt.socket_factory.socket_options_profile`
+        such as ``'low-latency'``.  Default is `None`.
+
+        .. versionadded:: 0.3.6
     """
     def __init__(self):
         self.host = None
@@ -130,6 +217,12 @@ class MqttPollClientProperties(object):
         self.recv_idle_abort_period = 2 * self.recv_idle_ping_period
         self.ssl = True
         self.address_family = socket.AF_UNSPEC
+        self.cache_time = False
+        self.happy_eyeballs_delay = None
+        self.name_resolution_timeout = None
+        self.connect_timeout = None
+        self.endpoints = None
+        self.socket_options = None
 
 
 class MqttPollClient(Reactor):
@@ -140,7 +233,8 @@ class MqttPollClient(Reactor):
     properties: MqttPollClientProperties
     """
     def __init__(self, properties, log='haka'):
-        self._clock = SystemClock()
+        self._clock = CachedClock(MonotonicClock())
+        self._cache_time = properties.cache_time
         self._scheduler = ClockScheduler(self._clock)
         self._async_name_resolver = AsyncFutureDnsResolver()
         self._selector = _PollClientSelector(self._async_name_resolver)
@@ -149,12 +243,12 @@ class MqttPollClient(Reactor):
 
         p = ReactorProperties()
         if hasattr(properties.ssl, 'wrap_socket') and callable(properties.ssl.wrap_socket):
-            p.socket_factory = SslSocketFactory(properties.ssl)
+            p.socket_factory = SslSocketFactory(properties.ssl, properties.socket_options)
         elif properties.ssl:
             ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
-            p.socket_factory = SslSocketFactory(ssl_context)
+            p.socket_factory = SslSocketFactory(ssl_context, properties.socket_options)
         else:
-            p.socket_factory = SocketFactory()
+            p.socket_factory = SocketFactory(properties.socket_options)
 
         p.endpoint = endpoint
         p.keepalive_period = properties.keepalive_period
@@ -168,25 +262,132 @@ class MqttPollClient(Reactor):
         p.name_resolver = self._async_name_resolver
         p.selector = self._selector
         p.address_family = properties.address_family
+        p.happy_eyeballs_delay = properties.happy_eyeballs_delay
+        p.name_resolution_timeout = properties.name_resolution_timeout
+        p.connect_timeout = properties.connect_timeout
+        p.endpoints = properties.endpoints
 
         Reactor.__init__(self, p, log=log)
 
+        self._threadsafe_publisher = ThreadSafePublisher(self, self._selector)
+
+    def publish_threadsafe(self, topic, payload, qos, retain=False):
+        """Queues a :meth:`publish` call; unlike :meth:`publish` this
+        method may be called from any thread.  The thread blocked in
+        :meth:`poll` is woken immediately and places everything queued
+        since it was last woken on the preflight queue in one batch.
+
+        .. versionadded:: 0.3.6
+
+        Parameters
+        -----------
+        topic: str
+        payload: bytes
+        qos: int
+            0 <= qos <= 2
+        retain: bool
+        """
+        self._threadsafe_publisher.publish(topic, payload, qos, retain)
+
+    def on_packet_ids_available(self, reactor):
+        """Retries publishes queued by :meth:`publish_threadsafe` that
+        were held because no packet id was available.  Subclasses that
+        override this method should call it.
+
+        .. versionadded:: 0.3.6
+
+        Parameters
+        ----------
+        reactor: Reactor
+        """
+        self._threadsafe_publisher.on_packet_ids_available()
+
+    def close(self):
+        """Terminates the reactor if it is active then releases the
+        file descriptors and threads used by :meth:`publish_threadsafe`
+        and name resolution.  Publishes still queued by
+        :meth:`publish_threadsafe` are discarded.
+
+        .. versionadded:: 0.3.6
+        """
+        self.terminate()
+        if not self._async_name_resolver.closed():
+            self._selector.del_callback_read(self._async_name_resolver.read_fd())
+            self._async_name_resolver.close()
+        self._threadsafe_publisher.close()
+
     def poll(self, period=0.):
+        self.__poll(period)
+
+    def __poll(self, period, until=None):
+        """Services the reactor until `period` seconds have elapsed, the
+        reactor is inactive, or `until` returns True."""
         poll_end_time = self._clock.time() + period
 
-        while True:
-            select_timeout = self._scheduler.remaining()
-            if select_timeout is None or self._clock.time() + select_timeout > poll_end_time:
-                select_timeout = poll_end_time - self._clock.time()
+        try:
+            while True:
+                select_timeout = self._scheduler.remaining()
+                if select_timeout is None or self._clock.time() + select_timeout > poll_end_time:
+                    select_timeout = poll_end_time - self._clock.time()
+
+                if select_timeout < 0.:
+                    select_timeout = 0
+
+                ready = self._selector.wait(select_timeout)
+                if self._cache_time:
+                    self._clock.sample()
+                self._selector.dispatch(ready)
+                self._scheduler.poll()
 
-            if select_timeout < 0.:
-                select_timeout = 0
+                if self._clock.time() > poll_end_time or self.state not in ACTIVE_STATES:
+                    break
+                elif until is not None and until():
+                    break
+        finally:
+            self._clock.release()
 
-            self._selector.select(select_timeout)
-            self._scheduler.poll()
+    def wait_all(self, tickets, timeout=None):
+        """Polls until every ticket in `tickets` is done, `timeout`
+        seconds elapse, or the reactor becomes inactive.
 
-            if self._clock.time() > poll_end_time or self.state not in ACTIVE_STATES:
-                break
+        .. versionadded:: 0.3.6
+
+        Parameters
+        ----------
+        tickets: iterable of haka_mqtt.mqtt_request.MqttRequest
+            Publish, subscribe, or unsubscribe tickets.
+        timeout: float or None
+            None waits indefinitely.
+
+        Returns
+        -------
+        bool
+            True if every ticket is done; False otherwise.
+        """
+        outstanding = [0]
+
+        def on_done(ticket):
+            outstanding[0] -= 1
+
+        for ticket in tickets:
+            if not ticket.done():
+                outstanding[0] += 1
+                ticket.add_done_callback(on_done)
+
+        if timeout is not None:
+            end_time = self._clock.time() + timeout
+
+        while outstanding[0] and self.state in ACTIVE_STATES:
+            if timeout is None:
+                period = 1.
+            else:
+                period = end_time - self._clock.time()
+                if period <= 0:
+                    break
+
+            self.__poll(period, lambda: outstanding[0] == 0)
+
+        return outstanding[0] == 0
 
 
 class BlockingMqttClient(Reactor):
@@ -198,23 +399,35 @@ class BlockingMqttClient(Reactor):
     Parameters
     ----------
     properties: MqttPollClientProperties
+        `name_resolution_timeout` is not supported and must be `None`
+        because the synchronous DNS lookup cannot be interrupted.
+        `connect_timeout` is set as the timeout of each new socket so
+        that a blocking connect (and SSL handshake) gives up after
+        that long.  `happy_eyeballs_delay` is ignored.
     """
     def __init__(self, properties, log='haka'):
-        self._clock = SystemClock()
-        self._scheduler = ClockScheduler(self._clock)
+        assert properties.name_resolution_timeout is None
 
-        endpoint = (properties.host, properties.port)
+        self._clock = CachedClock(MonotonicClock())
+        self._cache_time = properties.cache_time
+        self._scheduler = ClockScheduler(self._clock)
 
         p = ReactorProperties()
         if hasattr(properties.ssl, 'wrap_socket') and callable(properties.ssl.wrap_socket):
-            p.socket_factory = BlockingSslSocketFactory(properties.ssl)
+            p.socket_factory = BlockingSslSocketFactory(properties.ssl,
+                                                        properties.socket_options,
+                                                        connect_timeout=properties.connect_timeout)
         elif properties.ssl:
             ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
-            p.socket_factory = BlockingSslSocketFactory(ssl_context)
+            p.socket_factory = BlockingSslSocketFactory(ssl_context,
+                                                        properties.socket_options,
+                                                        connect_timeout=properties.connect_timeout)
         else:
-            p.socket_factory = BlockingSocketFactory()
+            p.socket_factory = BlockingSocketFactory(properties.socket_options,
+                                                     connect_timeout=properties.connect_timeout)
 
-        p.endpoint = endpoint
+        if properties.endpoints is None:
+            p.endpoint = (properties.host, properties.port)
         p.keepalive_period = properties.keepalive_period
         if properties.client_id is None:
             p.client_id = generate_client_id()
@@ -223,31 +436,41 @@ class BlockingMqttClient(Reactor):
         p.scheduler = self._scheduler
         p.name_resolver = SynchronousFutureDnsResolver()
         p.address_family = properties.address_family
+        p.connect_timeout = properties.connect_timeout
+        p.endpoints = properties.endpoints
 
         Reactor.__init__(self, p, log=log)
 
     def poll(self, period=0.):
         poll_end_time = self._clock.time() + period
 
-        while True:
-            select_timeout = self._scheduler.remaining()
-            if select_timeout is None or self._clock.time() + select_timeout > poll_end_time:
-                select_timeout = poll_end_time - self._clock.time()
+        try:
+            while True:
+                # Blocking reads and writes take the place of a select
+                # so the iteration's instant is sampled before them.
+                if self._cache_time:
+                    self._clock.sample()
 
-            if select_timeout <= 0.:
-                select_timeout = 0.001
+                select_timeout = self._scheduler.remaining()
+                if select_timeout is None or self._clock.time() + select_timeout > poll_end_time:
+                    select_timeout = poll_end_time - self._clock.time()
 
-            if self.socket is not None:
-                self.socket.settimeout(select_timeout)
+                if select_timeout <= 0.:
+                    select_timeout = 0.001
 
-            if self.want_write():
-                self.write()
-            elif self.want_read():
-                self.read()
-            else:
-                sleep(select_timeout)
+                if self.socket is not None:
+                    self.socket.settimeout(select_timeout)
+
+                if self.want_write():
+                    self.write()
+                elif self.want_read():
+                    self.read()
+                else:
+                    sleep(select_timeout)
 
-            self._scheduler.poll()
+                self._scheduler.poll()
 
-            if self._clock.time() > poll_end_time or self.state not in ACTIVE_STATES:
-                break
+                if self._clock.time() > poll_end_time or self.state not in ACTIVE_STATES:
+                    break
+        finally:
+            self._clock.release()
@@ -0,0 +1,443 @@
+"""Spreads reactors across several event-loop threads.
+
+A :class:`ShardedHub` runs `K` shards.  Each shard is a thread with its
+own :class:`haka_mqtt.frontends.hub.ReactorHub` (selector, scheduler,
+and DNS resolver).  A reactor is placed on a shard when it is added and
+lives on that shard's thread for its whole life; a placement policy
+chooses the shard.
+
+Reactors are not thread-safe so every operation on a reactor is
+submitted to the thread that owns it.  Submissions are queued and the
+shard is woken through a per-shard wakeup file descriptor registered
+with its selector.
+
+>>> def create_reactor(properties):
+...     properties.endpoint = ('test.mosquitto.org', 1883)
+...     return Reactor(properties, log=None)
+...
+>>> with ShardedHub(2, placement=LeastLoadedPlacement()) as hub:
+...     hub.start()
+...     indexes = [hub.add(client_id, create_reactor, start=False) for client_id in ('client-0', 'client-1')]
+...     num_reactors = [stats.num_reactors for stats in hub.shard_stats()]
+...
+>>> indexes
+[0, 1]
+>>> num_reactors
+[1, 1]
+
+Leaving the ``with`` block closes the hub, which terminates every
+reactor and joins the shard threads.
+"""
+
+import logging
+import threading
+import zlib
+from Queue import Queue, Empty
+
+from haka_mqtt.frontends.hub import ReactorHub
+from haka_mqtt.null_log import NullLogger
+from haka_mqtt.reactor import Reactor
+from haka_mqtt.wakeup import Wakeup
+
+
+class RoundRobinPlacement(object):
+    """Places reactors on shards in turn."""
+    def __init__(self):
+        self.__next = 0
+
+    def __call__(self, client_id, shard_stats):
+        """
+        Parameters
+        ----------
+        client_id: str
+        shard_stats: list of ShardStats
+
+        Returns
+        -------
+        int
+            Index of the chosen shard.
+        """
+        rv = self.__next % len(shard_stats)
+        self.__next = rv + 1
+        return rv
+
+
+class LeastLoadedPlacement(object):
+    """Places each reactor on the shard hosting the fewest reactors;
+    ties go to the lowest shard index."""
+    def __call__(self, client_id, shard_stats):
+        """
+        Parameters
+        ----------
+        client_id: str
+        shard_stats: list of ShardStats
+
+        Returns
+        -------
+        int
+            Index of the chosen shard.
+        """
+        return min(shard_stats, key=lambda stats: (stats.num_reactors, stats.index)).index
+
+
+class ClientIdHashPlacement(object):
+    """Places reactors by a hash of their client id so that a client id
+    always maps to the same shard for a given number of shards, even
+    across processes."""
+    def __call__(self, client_id, shard_stats):
+        """
+        Parameters
+        ----------
+        client_id: str
+        shard_stats: list of ShardStats
+
+        Returns
+        -------
+        int
+            Index of the chosen shard.
+        """
+        if not isinstance(client_id, bytes):
+            client_id = client_id.encode('utf-8')
+
+        return (zlib.crc32(client_id) & 0xffffffff) % len(shard_stats)
+
+
+class ShardStats(object):
+    """Snapshot of the load on one shard.
+
+    Attributes
+    ----------
+    index: int
+        Shard index.
+    num_reactors: int
+        Number of reactors placed on the shard.
+    num_commands: int
+        Number of submitted commands the shard has executed.
+    num_iterations: int
+        Number of event-loop iterations the shard has made.
+    busy_time: float
+        Seconds the shard has spent calling reactors, deadlines, and
+        commands (time spent waiting is excluded).
+    """
+    def __init__(self, index, num_reactors, num_commands, num_iterations, busy_time):
+        self.index = index
+        self.num_reactors = num_reactors
+        self.num_commands = num_commands
+        self.num_iterations = num_iterations
+        self.busy_time = busy_time
+
+    def __repr__(self):
+        return 'ShardStats(index={}, num_reactors={}, num_commands={}, num_iterations={}, busy_time={})'.format(
+            self.index, self.num_reactors, self.num_commands, self.num_iterations, self.busy_time)
+
+
+class _Shard(object):
+    def __init__(self, index, hub, period, log):
+        self.index = index
+        self.hub = hub
+        self.num_reactors = 0
+        self.num_commands = 0
+        self.__period = period
+        self.__log = log
+        self.__commands = Queue()
+        self.__reactors = {}
+        self.__stopping = False
+        self.__wakeup = Wakeup()
+        self.hub.add_callback_read(self.__wakeup.fileno(), self.__on_wakeup)
+        self.thread = threading.Thread(target=self.__run, name='haka-shard-{}'.format(index))
+        self.thread.daemon = True
+
+    def submit(self, fn):
+        """Queues `fn` to be called on the shard thread; may be called
+        from any thread."""
+        self.__commands.put(fn)
+        self.__wakeup.wake()
+
+    def stop(self):
+        self.submit(self.__stop)
+
+    def __stop(self):
+        self.__stopping = True
+        self.hub.interrupt()
+
+    def add_reactor(self, client_id, reactor_factory, start):
+        properties = self.hub.reactor_properties()
+        properties.client_id = client_id
+        reactor = reactor_factory(properties)
+        self.hub.add(reactor)
+        self.__reactors[client_id] = reactor
+        if start:
+            try:
+                reactor.start()
+            except Exception:
+                self.remove_reactor(client_id)
+                raise
+
+    def remove_reactor(self, client_id):
+        reactor = self.__reactors.pop(client_id)
+        reactor.terminate()
+        self.hub.remove(reactor)
+
+    def call(self, client_id, fn):
+        fn(self.__reactors[client_id])
+
+    def __on_wakeup(self):
+        # Drain before reading the queue so that a submission racing
+        # with this call leaves a wakeup pending.
+        self.__wakeup.drain()
+        while True:
+            try:
+                fn = self.__commands.get_nowait()
+            except Empty:
+                break
+
+            self.num_commands += 1
+            try:
+                fn()
+            except Exception:
+                self.__log_exception('Command submitted to shard %d failed.', self.index)
+
+    def __log_exception(self, msg, *args):
+        try:
+            self.__log.exception(msg, *args)
+        except Exception:
+            # A failing logger must not stop the shard thread.
+            pass
+
+    def __run(self):
+        while not self.__stopping:
+            self.hub.poll(self.__period)
+
+        for reactor in self.hub.reactors():
+            try:
+                reactor.terminate()
+            except Exception:
+                self.__log_exception('Terminating reactor on shard %d failed.', self.index)
+
+    def close(self):
+        self.hub.del_callback_read(self.__wakeup.fileno())
+        self.__wakeup.close()
+        self.hub.close()
+
+
+class ShardedHub(object):
+    """Runs reactors on `num_shards` event-loop threads.
+
+    Methods of this class may be called from any thread.  Callables
+    passed to :meth:`add` and :meth:`submit` run on the thread of the
+    shard that owns the reactor.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    num_shards: int
+        Number of event-loop threads; 0 < num_shards.
+    placement: callable or None
+        Called as ``placement(client_id, shard_stats)`` and returns the
+        index of the shard to place a new reactor on.
+        :class:`RoundRobinPlacement`, :class:`LeastLoadedPlacement`, and
+        :class:`ClientIdHashPlacement` are provided.  Defaults to
+        :class:`RoundRobinPlacement`.
+    hub_factory: callable or None
+        Called with no arguments to create the
+        :class:`haka_mqtt.frontends.hub.ReactorHub` of each shard.
+    period: float
+        Period passed to each call to
+        :meth:`haka_mqtt.frontends.hub.ReactorHub.poll`.
+    log: str or logging.Logger or None
+        Logger used to report commands that raise exceptions; as for
+        :class:`haka_mqtt.reactor.Reactor`.
+    """
+    def __init__(self, num_shards, placement=None, hub_factory=None, period=1., log='haka'):
+        assert num_shards > 0
+
+        if placement is None:
+            placement = RoundRobinPlacement()
+        if hub_factory is None:
+            hub_factory = ReactorHub
+
+        if log is None:
+            log = NullLogger()
+        elif isinstance(log, (str, unicode)):
+            log = logging.getLogger(log)
+
+        self.__placement = placement
+        self.__lock = threading.Lock()
+        self.__client_shards = {}
+        self.__shards = [_Shard(i, hub_factory(), period, log) for i in range(0, num_shards)]
+        self.__started = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        """Number of shards."""
+        return len(self.__shards)
+
+    def start(self):
+        """Starts the shard threads."""
+        assert not self.__started
+        self.__started = True
+        for shard in self.__shards:
+            shard.thread.start()
+
+    def close(self):
+        """Terminates every reactor, stops the shard threads, and
+        releases their resources."""
+        if self.__started:
+            for shard in self.__shards:
+                shard.stop()
+            for shard in self.__shards:
+                shard.thread.join()
+
+        for shard in self.__shards:
+            shard.close()
+        self.__started = False
+
+    def __stats(self, shard):
+        return ShardStats(shard.index,
+                          shard.num_reactors,
+                          shard.num_commands,
+                          shard.hub.num_iterations,
+                          shard.hub.busy_time)
+
+    def shard_stats(self):
+        """Returns the load on each shard.  Counters are read without
+        stopping the shards so they are approximate while the shards
+        are busy.
+
+        Returns
+        -------
+        list of ShardStats
+        """
+        with self.__lock:
+            return [self.__stats(shard) for shard in self.__shards]
+
+    def shard_of(self, client_id):
+        """
+        Parameters
+        ----------
+        client_id: str
+
+        Raises
+        ------
+        KeyError
+            Raised when no reactor with `client_id` has been added.
+
+        Returns
+        -------
+        int
+            Index of the shard hosting the reactor with `client_id`.
+        """
+        with self.__lock:
+            return self.__client_shards[client_id].index
+
+    def add(self, client_id, reactor_factory, start=True):
+        """Places a new reactor on a shard.
+
+        Parameters
+        ----------
+        client_id: str
+        reactor_factory: callable
+            Called on the shard thread as ``reactor_factory(properties)``
+            with :class:`haka_mqtt.reactor.ReactorProperties` whose
+            dependencies and `client_id` are set; must set any other
+            properties (at least `endpoint`) and return a new
+            :class:`haka_mqtt.reactor.Reactor`.  If it raises, or
+            starting the reactor raises, the exception is logged and
+            the client id is removed from the hub.
+        start: bool
+            If True the reactor is started once created.
+
+        Raises
+        ------
+        ValueError
+            Raised when a reactor with `client_id` has already been
+            added.
+
+        Returns
+        -------
+        int
+            Index of the chosen shard.
+        """
+        with self.__lock:
+            if client_id in self.__client_shards:
+                raise ValueError(client_id)
+
+            index = self.__placement(client_id, [self.__stats(shard) for shard in self.__shards])
+            shard = self.__shards[index]
+            shard.num_reactors += 1
+            self.__client_shards[client_id] = shard
+
+        def add_reactor():
+            try:
+                shard.add_reactor(client_id, reactor_factory, start)
+            except Exception:
+                # Forget the reactor so that the client id may be added
+                # again.
+                with self.__lock:
+                    if self.__client_shards.get(client_id) is shard:
+                        del self.__client_shards[client_id]
+                        shard.num_reactors -= 1
+                raise
+
+        shard.submit(add_reactor)
+        return index
+
+    def remove(self, client_id):
+        """Terminates the reactor with `client_id` and removes it from
+        its shard.
+
+        Parameters
+        ----------
+        client_id: str
+
+        Raises
+        ------
+        KeyError
+            Raised when no reactor with `client_id` has been added.
+        """
+        with self.__lock:
+            shard = self.__client_shards.pop(client_id)
+            shard.num_reactors -= 1
+
+        shard.submit(lambda: shard.remove_reactor(client_id))
+
+    def submit(self, client_id, fn):
+        """Calls ``fn(reactor)`` on the thread that owns the reactor
+        with `client_id`.
+
+        Parameters
+        ----------
+        client_id: str
+        fn: callable(Reactor)
+
+        Raises
+        ------
+        KeyError
+            Raised when no reactor with `client_id` has been added.
+        """
+        with self.__lock:
+            shard = self.__client_shards[client_id]
+
+        shard.submit(lambda: shard.call(client_id, fn))
+
+    def publish(self, client_id, topic, payload, qos, retain=False):
+        """Queues a :meth:`haka_mqtt.reactor.Reactor.publish` call on
+        the reactor with `client_id`."""
+        self.submit(client_id, lambda reactor: reactor.publish(topic, payload, qos, retain))
+
+    def subscribe(self, client_id, topics):
+        """Queues a :meth:`haka_mqtt.reactor.Reactor.subscribe` call on
+        the reactor with `client_id`."""
+        self.submit(client_id, lambda reactor: reactor.subscribe(topics))
+
+    def unsubscribe(self, client_id, topics):
+        """Queues a :meth:`haka_mqtt.reactor.Reactor.unsubscribe` call
+        on the reactor with `client_id`."""
+        self.submit(client_id, lambda reactor: reactor.unsubscribe(topics))
@@ -0,0 +1,282 @@
+"""Blocking frontend with dedicated reader and writer threads.
+
+:class:`ThreadedMqttClient` owns two threads.  The reader thread blocks
+until the socket is readable and then calls
+:meth:`haka_mqtt.reactor.Reactor.read`; the writer thread sleeps on a
+condition variable until the reactor wants to write or a deadline is
+due, then blocks until the socket is writable and calls
+:meth:`haka_mqtt.reactor.Reactor.write`.  Neither thread holds the lock
+while it is blocked on the socket so reading never delays writing.
+
+Every call into the reactor, from the client threads or from the
+application, is serialized by one lock.  The selector given to the
+reactor notifies the condition variable whenever the reactor's read or
+write interest changes, so a :meth:`ThreadedMqttClient.publish` made on
+an idle client wakes the writer immediately.  Changes in read interest
+also wake the reader through a wakeup file descriptor in its select set
+so that after a reconnect it stops waiting on the old socket at once.
+"""
+
+import select
+import socket
+import ssl
+import threading
+
+from haka_mqtt.clock import MonotonicClock
+from haka_mqtt.dns_sync import SynchronousFutureDnsResolver
+from haka_mqtt.frontends.poll import generate_client_id
+from haka_mqtt.reactor import ReactorProperties, Reactor
+from haka_mqtt.scheduler import ClockScheduler
+from haka_mqtt.socket_factory import SslSocketFactory, SocketFactory
+from haka_mqtt.wakeup import Wakeup
+
+
+class _NotifySelector(object):
+    """Selector that notifies a condition variable when interest
+    changes and wakes a reader blocked in select when read interest
+    changes; the caller must hold the condition's lock."""
+    def __init__(self, cond, read_wakeup):
+        self.__cond = cond
+        self.__read_wakeup = read_wakeup
+
+    def add_read(self, fd, reactor):
+        self.__cond.notify_all()
+        self.__read_wakeup.wake()
+
+    def del_read(self, fd, reactor):
+        self.__cond.notify_all()
+        self.__read_wakeup.wake()
+
+    def add_write(self, fd, reactor):
+        self.__cond.notify_all()
+
+    def del_write(self, fd, reactor):
+        self.__cond.notify_all()
+
+
+class _NotifyScheduler(ClockScheduler):
+    """Scheduler that notifies a condition variable when a deadline is
+    added so that the writer thread recomputes its timeout.  Deadlines
+    may be added from any thread; the condition's lock is re-entrant so
+    callers that already hold it may add them too."""
+    def __init__(self, clock, cond):
+        ClockScheduler.__init__(self, clock)
+        self.__cond = cond
+
+    def add(self, duration, cb):
+        with self.__cond:
+            rv = ClockScheduler.add(self, duration, cb)
+            self.__cond.notify_all()
+        return rv
+
+
+def _wait_ready(sock, timeout, write, wakeup=None):
+    """Blocks until `sock` is readable (or writable when `write` is
+    True), `wakeup` is woken, or `timeout` seconds elapse.
+
+    Returns
+    -------
+    bool
+        True if `sock` is ready; False on timeout, on wakeup, or if the
+        socket was closed by another thread.
+    """
+    rfds = [] if write else [sock]
+    wfds = [sock] if write else []
+    if wakeup is not None:
+        rfds.append(wakeup.fileno())
+
+    try:
+        rlist, wlist, xlist = select.select(rfds, wfds, [], timeout)
+    except (select.error, socket.error, ValueError, IOError, OSError):
+        # Socket closed by another thread.
+        return False
+
+    if wakeup is not None and wakeup.fileno() in rlist:
+        # The caller re-reads reactor state after the drain so no
+        # wakeup is lost.
+        wakeup.drain()
+        return False
+
+    return bool(rlist or wlist)
+
+
+class ThreadedMqttClient(Reactor):
+    """A reactor serviced by a reader thread and a writer thread.
+
+    Methods of this class may be called from any thread.  Callbacks
+    (`on_connack`, `on_publish`, ...) are called from the client threads
+    with the client lock held; they may call back into the client.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    properties: haka_mqtt.frontends.poll.MqttPollClientProperties
+        The `cache_time` property is ignored.  `happy_eyeballs_delay`
+        is not supported and must be `None`; the client threads wait
+        on a single socket so racing connection attempts cannot be
+        watched.
+    log: str or logging.Logger or None
+        As for :class:`haka_mqtt.reactor.Reactor`.
+    period: float
+        Longest time the client threads block on the socket before
+        checking whether the socket has been replaced or the client
+        closed.
+    """
+    def __init__(self, properties, log='haka', period=1.):
+        assert properties.happy_eyeballs_delay is None
+
+        # Re-entrant so that callbacks may call back into the client.
+        self.__cond = threading.Condition(threading.RLock())
+        self.__period = period
+        self.__closing = False
+        self.__read_wakeup = Wakeup()
+        self._clock = MonotonicClock()
+        self._scheduler = _NotifyScheduler(self._clock, self.__cond)
+
+        p = ReactorProperties()
+        if hasattr(properties.ssl, 'wrap_socket') and callable(properties.ssl.wrap_socket):
+            p.socket_factory = SslSocketFactory(properties.ssl, properties.socket_options)
+        elif properties.ssl:
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            p.socket_factory = SslSocketFactory(ssl_context, properties.socket_options)
+        else:
+            p.socket_factory = SocketFactory(properties.socket_options)
+
+        p.endpoint = (properties.host, properties.port)
+        p.keepalive_period = properties.keepalive_period
+        p.recv_idle_ping_period = properties.recv_idle_ping_period
+        p.recv_idle_abort_period = properties.recv_idle_abort_period
+        if properties.client_id is None:
+            p.client_id = generate_client_id()
+        else:
+            p.client_id = properties.client_id
+        p.scheduler = self._scheduler
+        p.name_resolver = SynchronousFutureDnsResolver()
+        p.selector = _NotifySelector(self.__cond, self.__read_wakeup)
+        p.address_family = properties.address_family
+        p.name_resolution_timeout = properties.name_resolution_timeout
+        p.connect_timeout = properties.connect_timeout
+        p.endpoints = properties.endpoints
+
+        Reactor.__init__(self, p, log=log)
+
+        self.__reader = threading.Thread(target=self.__read_loop, name='haka-reader')
+        self.__writer = threading.Thread(target=self.__write_loop, name='haka-writer')
+        for thread in (self.__reader, self.__writer):
+            thread.daemon = True
+            thread.start()
+
+    def __read_loop(self):
+        while True:
+            with self.__cond:
+                while not self.__closing and not self.want_read():
+                    self.__cond.wait()
+                if self.__closing:
+                    break
+                sock = self.socket
+
+            if _wait_ready(sock, self.__period, write=False, wakeup=self.__read_wakeup):
+                with self.__cond:
+                    if self.socket is sock and self.want_read():
+                        self.read()
+
+    def __write_loop(self):
+        while True:
+            with self.__cond:
+                while True:
+                    if self.__closing:
+                        return
+                    self._scheduler.poll()
+                    if self.want_write():
+                        sock = self.socket
+                        timeout = self._scheduler.remaining()
+                        break
+                    self.__cond.wait(self._scheduler.remaining())
+
+            if timeout is None or timeout > self.__period:
+                timeout = self.__period
+            elif timeout < 0:
+                timeout = 0
+
+            if _wait_ready(sock, timeout, write=True):
+                with self.__cond:
+                    if self.socket is sock and self.want_write():
+                        self.write()
+
+    def start(self):
+        with self.__cond:
+            Reactor.start(self)
+            self.__cond.notify_all()
+
+    def stop(self):
+        with self.__cond:
+            Reactor.stop(self)
+            self.__cond.notify_all()
+
+    def terminate(self):
+        with self.__cond:
+            Reactor.terminate(self)
+            self.__cond.notify_all()
+
+    def publish(self, topic, payload, qos, retain=False):
+        with self.__cond:
+            return Reactor.publish(self, topic, payload, qos, retain)
+
+    def publish_batch(self, publishes):
+        with self.__cond:
+            return Reactor.publish_batch(self, publishes)
+
+    def subscribe(self, topics):
+        with self.__cond:
+            return Reactor.subscribe(self, topics)
+
+    def unsubscribe(self, topics):
+        with self.__cond:
+            return Reactor.unsubscribe(self, topics)
+
+    def wait(self, timeout=None):
+        """Blocks until the reactor is inactive or `timeout` seconds
+        elapse.
+
+        Parameters
+        ----------
+        timeout: float or None
+            None waits indefinitely.
+
+        Returns
+        -------
+        bool
+            True if the reactor is inactive; False otherwise.
+        """
+        end = None if timeout is None else self._clock.time() + timeout
+        with self.__cond:
+            while self.is_active():
+                if end is None:
+                    remaining = None
+                else:
+                    remaining = end - self._clock.time()
+                    if remaining <= 0:
+                        break
+                self.__cond.wait(remaining)
+
+            return not self.is_active()
+
+    def close(self):
+        """Terminates the reactor if it is active then stops and joins
+        the client threads."""
+        with self.__cond:
+            self.__closing = True
+            Reactor.terminate(self)
+            self.__cond.notify_all()
+            if not self.__read_wakeup.closed():
+                self.__read_wakeup.wake()
+
+        current = threading.current_thread()
+        for thread in (self.__reader, self.__writer):
+            if thread is not current:
+                thread.join()
+
+        if current not in (self.__reader, self.__writer):
+            # Both threads have exited so nothing selects on the wakeup.
+            self.__read_wakeup.close()
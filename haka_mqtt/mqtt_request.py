@@ -15,6 +15,44 @@ class MqttRequest(object):
     def __init__(self, packet_id, packet_type):
         self.__packet_id = packet_id
         self.__packet_type = packet_type
+        self.__done_callbacks = []
+
+    def done(self):
+        """True once the request has completed; False otherwise.
+
+        .. versionadded:: 0.3.6
+
+        Returns
+        -------
+        bool
+        """
+        raise NotImplementedError()
+
+    def add_done_callback(self, fn):
+        """Calls `fn` with the request as its only argument when the
+        request completes; if it has already completed then `fn` is
+        called immediately.  Callbacks are called by the reactor on its
+        loop thread in the order they were added.  Requests dropped by
+        the reactor (for example subscribes pending when the reactor
+        restarts) never complete.
+
+        .. versionadded:: 0.3.6
+
+        Parameters
+        ----------
+        fn: callable(MqttRequest)
+        """
+        if self.done():
+            fn(self)
+        else:
+            self.__done_callbacks.append(fn)
+
+    def _notify_done(self):
+        """Called by the reactor once the request completes."""
+        callbacks = self.__done_callbacks
+        self.__done_callbacks = []
+        for fn in callbacks:
+            fn(self)
 
     @property
     def packet_id(self):
@@ -22,11 +60,20 @@ class MqttRequest(object):
 
         Returns
         -------
-        int
-            0 <= self.packet_id <= 2**16 - 1
+        int or None
+            0 <= self.packet_id <= 2**16 - 1; `None` when a packet id
+            has not yet been assigned.
         """
         return self.__packet_id
 
+    def _set_packet_id(self, packet_id):
+        """
+        Parameters
+        ----------
+        packet_id: int
+        """
+        self.__packet_id = packet_id
+
     @property
     def packet_type(self):
         """
@@ -119,6 +166,18 @@ class MqttPublishTicket(MqttRequest):
         """
         return self.__status
 
+    def done(self):
+        """True once ``self.status is MqttPublishStatus.done``; False
+        otherwise.
+
+        .. versionadded:: 0.3.6
+
+        Returns
+        -------
+        bool
+        """
+        return self.__status is MqttPublishStatus.done
+
     def packet(self):
         return MqttPublish(self.packet_id, self.topic, self.payload, self.dupe, self.qos, self.retain)
 
@@ -206,6 +265,18 @@ class MqttSubscribeTicket(MqttRequest):
         """
         return self.__status
 
+    def done(self):
+        """True once ``self.status is MqttSubscribeStatus.done``; False
+        otherwise.
+
+        .. versionadded:: 0.3.6
+
+        Returns
+        -------
+        bool
+        """
+        return self.__status is MqttSubscribeStatus.done
+
     def packet(self):
         return MqttSubscribe(self.packet_id, self.topics)
 
@@ -259,6 +330,18 @@ class MqttUnsubscribeTicket(MqttRequest):
         """
         return self.__status
 
+    def done(self):
+        """True once ``self.status is MqttSubscribeStatus.done``; False
+        otherwise.
+
+        .. versionadded:: 0.3.6
+
+        Returns
+        -------
+        bool
+        """
+        return self.__status is MqttSubscribeStatus.done
+
     def encode(self, f):
         return self.packet().encode(f)
 
@@ -1,11 +1,44 @@
-from haka_mqtt.cycle_iter import IntegralCycleIter
 from haka_mqtt.exception import PacketIdReactorException
 
 
+# Packet ids are tracked in a bitmap of `_WORD_BITS`-bit words; a
+# second-level summary has one bit per word set when that word is full.
+_WORD_BITS = 64
+_WORD_FULL = (1 << _WORD_BITS) - 1
+
+
+def _lowest_bit(x):
+    """Returns the index of the lowest set bit of `x`; `x` > 0."""
+    return (x & -x).bit_length() - 1
+
+
 class PacketIdGenerator(object):
+    """Allocates packet ids in O(1) time.
+
+    Ids are handed out cyclically: the search for a free id begins just
+    after the most recently acquired id so that a freshly released id
+    is not immediately re-used.
+
+    Parameters
+    ----------
+    ids: iterable of int
+        Packet ids that are initially consumed.
+    """
     def __init__(self, ids=[]):
-        self.__packet_id_iter = IntegralCycleIter(1, self.id_stop())
-        self.__consumed_ids = set(ids)
+        num_words = self.id_stop() // _WORD_BITS
+        self.__words = [0] * num_words
+        self.__full_words = 0
+        self.__all_words = (1 << num_words) - 1
+        self.__next = 1
+        self.__len = 0
+
+        # Zero is not a valid packet id [MQTT-2.3.1-1]; permanently
+        # mark it consumed.
+        self.__set(0)
+        for packet_id in ids:
+            if not self.__is_set(packet_id):
+                self.__set(packet_id)
+                self.__len += 1
 
     @staticmethod
     def id_stop():
@@ -17,6 +50,17 @@ class PacketIdGenerator(object):
         """
         return 2**16
 
+    def __is_set(self, n):
+        w, b = divmod(n, _WORD_BITS)
+        return bool(self.__words[w] & (1 << b))
+
+    def __set(self, n):
+        w, b = divmod(n, _WORD_BITS)
+        word = self.__words[w] | (1 << b)
+        self.__words[w] = word
+        if word == _WORD_FULL:
+            self.__full_words |= 1 << w
+
     def __len__(self):
         """Returns number of packet ids that have been consumed.
 
@@ -24,10 +68,19 @@ class PacketIdGenerator(object):
         -------
         int
         """
-        return len(self.__consumed_ids)
+        return self.__len
 
     def __iter__(self):
-        return iter(self.__consumed_ids)
+        rv = []
+        for w, word in enumerate(self.__words):
+            while word:
+                b = _lowest_bit(word)
+                word &= word - 1
+                n = w * _WORD_BITS + b
+                if n != 0:
+                    rv.append(n)
+
+        return iter(rv)
 
     def acquire(self):
         """
@@ -42,13 +95,28 @@ class PacketIdGenerator(object):
         int
             A `packet_id` such that 0 <= `packet_id` <= 2**16-1.
         """
-        for i in xrange(1, self.id_stop()):
-            n = next(self.__packet_id_iter)
-            if n not in self.__consumed_ids:
-                self.__consumed_ids.add(n)
-                break
-        else:
-            raise PacketIdReactorException()
+        w, b = divmod(self.__next, _WORD_BITS)
+        free = ~self.__words[w] & (_WORD_FULL << b) & _WORD_FULL
+        if not free:
+            # Search the following words first then wrap around to the
+            # beginning; the wrap includes the low bits of word `w`.
+            non_full = ~self.__full_words & self.__all_words
+            later = non_full & (self.__all_words << (w + 1))
+            if later:
+                non_full = later
+            elif not non_full:
+                raise PacketIdReactorException()
+
+            w = _lowest_bit(non_full)
+            free = ~self.__words[w] & _WORD_FULL
+
+        n = w * _WORD_BITS + _lowest_bit(free)
+        self.__set(n)
+        self.__len += 1
+
+        self.__next = n + 1
+        if self.__next == self.id_stop():
+            self.__next = 1
 
         return n
 
@@ -63,7 +131,12 @@ class PacketIdGenerator(object):
         Raises
         ------
         KeyError
-            Raised when there are no packet ids remaining to be
-            acquired.
+            Raised when `packet_id` has not been acquired.
         """
-        self.__consumed_ids.remove(packet_id)
+        if not 0 < packet_id < self.id_stop() or not self.__is_set(packet_id):
+            raise KeyError(packet_id)
+
+        w, b = divmod(packet_id, _WORD_BITS)
+        self.__words[w] &= ~(1 << b)
+        self.__full_words &= ~(1 << w)
+        self.__len -= 1
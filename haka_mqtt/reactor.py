@@ -8,7 +8,7 @@ import errno
 import socket
 import logging
 import ssl
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from io import BytesIO
 import os
 
@@ -17,6 +17,7 @@ from enum import (
     unique,
 )
 
+from haka_mqtt.exception import PacketIdReactorException
 from haka_mqtt.null_log import NullLogger
 from haka_mqtt.packet_ids import PacketIdGenerator
 from haka_mqtt.selector import Selector
@@ -56,6 +57,10 @@ class ReactorProperties(object):
     Attributes
     ----------
     socket_factory: haka_mqtt.socket_factory.SocketFactory
+        Called with ``(getaddrinfo_params, sockaddr)`` and returns an
+        unconnected socket.  If the factory has an ``on_connected``
+        method then it is called with ``(getaddrinfo_params, socket)``
+        when the server accepts the connection.
     name_resolver: callable
         DNS resolver.
     scheduler:
@@ -64,7 +69,14 @@ class ReactorProperties(object):
     client_id: str
     endpoint: tuple
         2-tuple of (host: `str`, port: `int`).  The `port` value is
-        constrainted such that 0 <= `port` <= 2**16-1.
+        constrainted such that 0 <= `port` <= 2**16-1.  Ignored when
+        `endpoints` is set.
+    endpoints: haka_mqtt.endpoints.EndpointList or None
+        When not None the reactor selects the endpoint to connect to
+        from this list each time it starts and reports the outcome of
+        every connection attempt back to the list.  Default is `None`.
+
+        .. versionadded:: 0.3.6
     keepalive_period: int
         0 <= keepalive_period <= 2*16-1; zero disables keepalive.  Sends
         a :class:`mqtt_codec.packet.MqttPingreq` packet to the server
@@ -93,6 +105,58 @@ class ReactorProperties(object):
         :data:`socket.AF_UNSPEC` by default.
     username: str optional
     password: str optional
+    packet_id_backpressure: bool
+        When False (the default) :meth:`Reactor.publish` acquires a
+        packet id for QoS=1 and QoS=2 messages immediately and raises
+        :class:`haka_mqtt.exception.PacketIdReactorException` if none
+        are free.  When True these messages are queued without a packet
+        id and one is assigned just before the message is launched;
+        launching of publishes pauses while all packet ids are in use
+        (other packets are still launched) and
+        :meth:`Reactor.on_packet_ids_available` is called once one is
+        released.
+
+        .. versionadded:: 0.3.6
+    happy_eyeballs_delay: float or None
+        When None (the default) the reactor connects to the first
+        address returned by name resolution.  Otherwise connection
+        attempts are raced across the resolved addresses in the manner
+        of RFC 8305 ("Happy Eyeballs"): addresses are ordered to
+        alternate between address families, a new non-blocking connect
+        is started every `happy_eyeballs_delay` seconds (or immediately
+        when an attempt fails) while earlier attempts are still
+        pending, the first socket to connect is kept and the others are
+        closed.  RFC 8305 recommends 0.25 seconds.
+
+        Racing sockets are registered directly with the selector and
+        :attr:`Reactor.socket` is `None` until an attempt wins so
+        racing requires a selector-driven frontend such as
+        :class:`haka_mqtt.frontends.poll.MqttPollClient`.
+
+        .. versionadded:: 0.3.6
+    name_resolution_timeout: float or None
+        0 < name_resolution_timeout; aborts with
+        :class:`NameResolutionTimeoutReactorError` if name resolution
+        has not completed this many seconds after it began.  `None`
+        (the default) disables the timeout.
+
+        .. versionadded:: 0.3.6
+    connect_timeout: float or None
+        0 < connect_timeout; aborts with
+        :class:`ConnectTimeoutReactorError` if the socket has not
+        connected, and for SSL sockets completed its handshake, this
+        many seconds after the first connection attempt began.  `None`
+        (the default) disables the timeout.
+
+        .. versionadded:: 0.3.6
+    read_budget: int
+        0 < read_budget; most bytes a single :meth:`Reactor.read` call
+        takes from an SSL socket that has decrypted bytes buffered
+        (see :meth:`ssl.SSLSocket.pending`).  When the budget is spent
+        with bytes still buffered another read is scheduled
+        immediately.  Default is 65536.
+
+        .. versionadded:: 0.3.6
     """
     def __init__(self):
         # Dependencies
@@ -103,6 +167,7 @@ class ReactorProperties(object):
 
         # Parameters
         self.endpoint = None
+        self.endpoints = None
         self.client_id = None
         self.keepalive_period = 10*60
         self.recv_idle_ping_period = 10 * 60
@@ -111,6 +176,11 @@ class ReactorProperties(object):
         self.username = None
         self.password = None
         self.address_family = socket.AF_UNSPEC
+        self.packet_id_backpressure = False
+        self.happy_eyeballs_delay = None
+        self.name_resolution_timeout = None
+        self.connect_timeout = None
+        self.read_budget = 2**16
 
 
 @unique
@@ -231,6 +301,35 @@ ACTIVE_STATES = (
 assert set(INACTIVE_STATES).union(ACTIVE_STATES) == set(iter(ReactorState))
 
 
+def _interleave_families(resolutions):
+    """Reorders `resolutions` so that address families alternate
+    starting with the family of the first resolution [RFC 8305 s4];
+    order within each family is preserved.
+
+    Parameters
+    ----------
+    resolutions: list of 5-tuple
+        (family, socktype, proto, canonname, sockaddr) as returned by
+        `socket.getaddrinfo`.
+
+    Returns
+    -------
+    list of 5-tuple
+    """
+    families = OrderedDict()
+    for resolution in resolutions:
+        families.setdefault(resolution[0], []).append(resolution)
+
+    rv = []
+    queues = list(families.values())
+    while queues:
+        for queue in queues:
+            rv.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+
+    return rv
+
+
 class ReactorError(object):
     def __repr__(self):
         return '{}()'.format(self.__class__.__name__)
@@ -273,6 +372,26 @@ class RecvTimeoutReactorError(ReactorError):
         return isinstance(other, RecvTimeoutReactorError)
 
 
+class NameResolutionTimeoutReactorError(ReactorError):
+    """Name resolution did not complete within
+    :attr:`ReactorProperties.name_resolution_timeout` seconds.
+
+    .. versionadded:: 0.3.6
+    """
+    def __eq__(self, other):
+        return isinstance(other, NameResolutionTimeoutReactorError)
+
+
+class ConnectTimeoutReactorError(ReactorError):
+    """The socket did not connect and complete any SSL handshake within
+    :attr:`ReactorProperties.connect_timeout` seconds.
+
+    .. versionadded:: 0.3.6
+    """
+    def __eq__(self, other):
+        return isinstance(other, ConnectTimeoutReactorError)
+
+
 class SocketReactorError(ReactorError):
     """A socket.error exception was raised by the socket subsystem and
     it the error code was `self.errno`.  If this errno is in the
@@ -427,7 +546,7 @@ class Reactor(object):
     def __init__(self, properties, log='haka'):
         assert properties.client_id is not None
         assert properties.socket_factory is not None
-        assert properties.endpoint is not None
+        assert properties.endpoint is not None or properties.endpoints is not None
         assert properties.scheduler is not None
         assert 0 <= properties.keepalive_period <= 2**16-1
         assert isinstance(properties.keepalive_period, int)
@@ -437,12 +556,18 @@ class Reactor(object):
         assert isinstance(properties.recv_idle_ping_period, int)
         assert isinstance(properties.clean_session, bool)
         assert callable(properties.name_resolver)
-        host, port = properties.endpoint
-        assert isinstance(host, str)
-        assert 0 <= port <= 2**16-1
-        assert isinstance(port, int)
+        if properties.endpoints is None:
+            host, port = properties.endpoint
+            assert isinstance(host, str)
+            assert 0 <= port <= 2**16-1
+            assert isinstance(port, int)
         assert properties.selector is not None
         assert isinstance(properties.address_family, int)
+        assert isinstance(properties.packet_id_backpressure, bool)
+        assert properties.happy_eyeballs_delay is None or 0 <= properties.happy_eyeballs_delay
+        assert properties.name_resolution_timeout is None or 0 < properties.name_resolution_timeout
+        assert properties.connect_timeout is None or 0 < properties.connect_timeout
+        assert 0 < properties.read_budget
 
         if log is None:
             self.__log = NullLogger()
@@ -456,6 +581,10 @@ class Reactor(object):
             assert hasattr(log, 'critical')
             self.__log = log
 
+        self.__debug_enabled = False
+        self.__info_enabled = False
+        self.refresh_log_levels()
+
         self.__wbuf = bytearray()
         self.__rbuf = bytearray()
 
@@ -473,20 +602,23 @@ class Reactor(object):
         self.__recv_idle_abort_deadline = None
         self.__recv_idle_ping_period = properties.recv_idle_ping_period
         self.__recv_idle_ping_deadline = None
+        self.__name_resolution_timeout = properties.name_resolution_timeout
+        self.__name_resolution_deadline = None
+        self.__connect_timeout = properties.connect_timeout
+        self.__connect_deadline = None
+        self.__read_budget = properties.read_budget
+        self.__pending_read_deadline = None
         self.__clean_session = properties.clean_session
         self.__name_resolver = properties.name_resolver
 
         self.__socket_factory = properties.socket_factory
         self.socket = None
-        self.__host, self.__port = properties.endpoint
-        self.__getaddrinfo_params = (
-            self.__host,
-            self.__port,
-            self.__address_family,
-            socket.SOCK_STREAM,
-            socket.IPPROTO_TCP,
-            0
-        )
+        self.__endpoints = properties.endpoints
+        self.__connect_instant = None
+        if self.__endpoints is None:
+            self.__set_endpoint(properties.endpoint)
+        else:
+            self.__set_endpoint(next(iter(self.__endpoints)).endpoint)
 
         self.__state = ReactorState.init
         self.__mqtt_state = MqttState.stopped
@@ -495,10 +627,21 @@ class Reactor(object):
 
         self.__send_packet_ids = set()
         self.__send_path_packet_ids = PacketIdGenerator()
+        self.__packet_id_backpressure = properties.packet_id_backpressure
+        self.__packet_ids_exhausted = False
 
         self.__preflight_queue = []
         self.__inflight_queue = OrderedDict()
 
+        # Publishes waiting for a packet id while packet id backpressure
+        # is enabled.  They follow everything on the preflight queue and
+        # publishes made while any are held join them.
+        self.__held_publishes = deque()
+
+        # QoS=2 publish tickets whose pubrel is queued or in-flight; they
+        # are completed by the matching pubcomp.
+        self.__pubcomp_tickets = {}
+
         # Publish packets must be ack'd in order of publishing
         # [MQTT-4.6.0-2], [MQTT-4.6.0-3]
         #self.__in_flight_publish = []
@@ -518,6 +661,15 @@ class Reactor(object):
         self.__pingreq_active = False
         self.__pingreq_due = False
 
+        # Connection racing; pending attempts are (socket, sockaddr)
+        # 2-tuples registered directly with the selector.
+        self.__happy_eyeballs_delay = properties.happy_eyeballs_delay
+        self.__race_selector = properties.selector
+        self.__race_resolutions = []
+        self.__race_attempts = []
+        self.__race_deadline = None
+        self.__race_error = None
+
         # Want read
         self.__selector = _AssertSelectAdapter(self, properties.selector)
 
@@ -586,6 +738,19 @@ class Reactor(object):
         """
         pass
 
+    def on_packet_ids_available(self, reactor):
+        """Called when a send-path packet id is released after an
+        attempt to acquire one failed because all packet ids were in
+        use.  Called at most once per exhaustion.
+
+        .. versionadded:: 0.3.6
+
+        Parameters
+        ----------
+        reactor: Reactor
+        """
+        pass
+
     # Subscribe path
     def on_suback(self, reactor, suback):
         """Called immediately upon receiving a `MqttSuback` packet from
@@ -633,6 +798,38 @@ class Reactor(object):
         """
         pass
 
+    def refresh_log_levels(self):
+        """Re-reads which log levels are enabled on the reactor log.
+
+        Whether the `DEBUG` and `INFO` levels are enabled is cached when
+        the reactor is created so that the send and receive paths do
+        not need to consult the logging framework for every packet.
+        Call this method after changing the level of the reactor log
+        (or any of its handlers) so that the change takes effect.
+
+        Loggers without an `isEnabledFor` method are treated as having
+        all levels enabled.
+
+        .. versionadded:: 0.3.6
+        """
+        is_enabled_for = getattr(self.__log, 'isEnabledFor', None)
+        if callable(is_enabled_for):
+            self.__debug_enabled = bool(is_enabled_for(logging.DEBUG))
+            self.__info_enabled = bool(is_enabled_for(logging.INFO))
+        else:
+            self.__debug_enabled = True
+            self.__info_enabled = True
+
+    @property
+    def packet_id_backpressure(self):
+        """bool: True if QoS=1 and QoS=2 publishes are assigned packet
+        ids just before launch; False if they are assigned by
+        :meth:`publish`.
+
+        .. versionadded:: 0.3.6
+        """
+        return self.__packet_id_backpressure
+
     @property
     def clean_session(self):
         """bool: Clean session flag is true/false."""
@@ -678,6 +875,27 @@ class Reactor(object):
         idle."""
         return self.__recv_idle_ping_period
 
+    @property
+    def endpoint(self):
+        """tuple: 2-tuple of (host: `str`, port: `int`) that the reactor
+        is connecting or connected to or, when inactive, last connected
+        to.
+
+        .. versionadded:: 0.3.6
+        """
+        return self.__host, self.__port
+
+    def __set_endpoint(self, endpoint):
+        self.__host, self.__port = endpoint
+        self.__getaddrinfo_params = (
+            self.__host,
+            self.__port,
+            self.__address_family,
+            socket.SOCK_STREAM,
+            socket.IPPROTO_TCP,
+            0
+        )
+
     @property
     def error(self):
         """ReactorError or None: When `self.state` is
@@ -745,6 +963,73 @@ class Reactor(object):
 
         return packet
 
+    def __acquire_packet_id(self):
+        """Acquires a send-path packet id and records when none are
+        available so that `self.on_packet_ids_available` can be called
+        once one is released.
+
+        Raises
+        ------
+        haka_mqtt.exception.PacketIdReactorException
+
+        Returns
+        -------
+        int
+        """
+        try:
+            return self.__send_path_packet_ids.acquire()
+        except PacketIdReactorException:
+            self.__packet_ids_exhausted = True
+            raise
+
+    def __release_packet_id(self, packet_id):
+        self.__send_path_packet_ids.release(packet_id)
+        if self.__packet_ids_exhausted:
+            self.__packet_ids_exhausted = False
+            self.on_packet_ids_available(self)
+
+    def __held_launchable(self):
+        """True when the first held publish can be moved to the
+        preflight queue; False otherwise."""
+        if not self.__held_publishes:
+            return False
+        elif self.__held_publishes[0].packet_id is not None:
+            return True
+        else:
+            return len(self.__send_path_packet_ids) < self.__send_path_packet_ids.id_stop() - 1
+
+    def __queue_publishes(self, reqs):
+        """Places publish tickets on the preflight queue or, while
+        earlier publishes are held, behind them."""
+        if self.__held_publishes:
+            self.__held_publishes.extend(reqs)
+        else:
+            self.__preflight_queue.extend(reqs)
+
+    def __hold_publishes(self, start):
+        """Moves the publishes on the preflight queue at and after index
+        `start` to the held publishes; other packets stay queued."""
+        assert not self.__held_publishes
+        tail = self.__preflight_queue[start:]
+        del self.__preflight_queue[start:]
+        for packet_record in tail:
+            if packet_record.packet_type is MqttControlPacketType.publish:
+                self.__held_publishes.append(packet_record)
+            else:
+                self.__preflight_queue.append(packet_record)
+
+    def __release_held_publishes(self):
+        """Assigns packet ids to held publishes in order and moves them
+        to the preflight queue until one cannot be assigned an id."""
+        while self.__held_publishes:
+            packet_record = self.__held_publishes[0]
+            if packet_record.packet_id is None:
+                try:
+                    packet_record._set_packet_id(self.__acquire_packet_id())
+                except PacketIdReactorException:
+                    break
+            self.__preflight_queue.append(self.__held_publishes.popleft())
+
     def __update_io_notification(self):
         if self.socket is not None:
             self.__selector.update(self.want_read(), self.want_write(), self.socket)
@@ -778,9 +1063,18 @@ class Reactor(object):
         else:
             raise NotImplementedError(self.sock_state)
 
+        if self.sock_state is not SocketState.name_resolution:
+            assert self.__name_resolution_deadline is None
+
+        if self.sock_state not in (SocketState.connecting, SocketState.handshake):
+            assert self.__connect_deadline is None
+
         if self.sock_state not in (SocketState.connected, SocketState.deaf):
             assert self.__keepalive_due_deadline is None
 
+        if self.sock_state in INACTIVE_SOCK_STATES:
+            assert self.__pending_read_deadline is None
+
         if self.keepalive_period == 0:
             assert self.__keepalive_due_deadline is None
 
@@ -796,6 +1090,11 @@ class Reactor(object):
         if self.sock_state in INACTIVE_SOCK_STATES:
             self.__selector.assert_closed()
 
+        if self.sock_state is not SocketState.connecting or self.socket is not None:
+            assert not self.__race_attempts
+            assert not self.__race_resolutions
+            assert self.__race_deadline is None
+
         if self.state is ReactorState.error:
             assert self.error is not None
 
@@ -846,7 +1145,7 @@ class Reactor(object):
         return list(self.__inflight_queue.values())
 
     def preflight_packets(self):
-        return list(self.__preflight_queue)
+        return list(self.__preflight_queue) + list(self.__held_publishes)
 
     def subscribe(self, topics):
         """Places a ``subscribe`` packet on the preflight queue.
@@ -874,7 +1173,7 @@ class Reactor(object):
         """
         self.__assert_state_rules()
 
-        req = MqttSubscribeTicket(self.__send_path_packet_ids.acquire(), topics)
+        req = MqttSubscribeTicket(self.__acquire_packet_id(), topics)
         self.__preflight_queue.append(req)
 
         self.__assert_state_rules()
@@ -907,7 +1206,7 @@ class Reactor(object):
         """
         self.__assert_state_rules()
 
-        req = MqttUnsubscribeTicket(self.__send_path_packet_ids.acquire(), topics)
+        req = MqttUnsubscribeTicket(self.__acquire_packet_id(), topics)
         self.__preflight_queue.append(req)
 
         self.__assert_state_rules()
@@ -954,6 +1253,12 @@ class Reactor(object):
         ``pubcomp`` acknowledgements are placed in the front of the
         preflight queue as ``pubrel`` packets.
 
+        When :attr:`packet_id_backpressure` is True QoS=1 and QoS=2
+        messages are returned with a `packet_id` of `None`; a packet id
+        is assigned when the message reaches the front of the preflight
+        queue and one is free.  No exception is raised when all packet
+        ids are in use.
+
         Parameters
         -----------
         topic: str
@@ -966,7 +1271,8 @@ class Reactor(object):
         ------
         haka_mqtt.exception.PacketIdReactorException
             Raised when there are no free packet ids to create a
-            `MqttPublish` packet with.
+            `MqttPublish` packet with and
+            :attr:`packet_id_backpressure` is False.
 
         Return
         -------
@@ -975,21 +1281,78 @@ class Reactor(object):
             `ticket.status is MqttPublishStatus.preflight`.
         """
         self.__assert_state_rules()
+
+        req = self.__publish_ticket(topic, payload, qos, retain)
+        self.__queue_publishes([req])
+        self.__assert_state_rules()
+        self.__update_io_notification()
+        return req
+
+    def publish_batch(self, publishes):
+        """Places publish packets on the preflight queue in a single
+        bulk insertion.  The result is the same as calling
+        :meth:`publish` for each element of `publishes` in turn but the
+        queue is extended and socket notifications are updated only
+        once.
+
+        .. versionadded:: 0.3.6
+
+        Parameters
+        -----------
+        publishes: iterable of tuple
+            Each element is a 4-tuple of (topic: str, payload: bytes,
+            qos: int, retain: bool) as passed to :meth:`publish`.
+
+        Raises
+        ------
+        haka_mqtt.exception.PacketIdReactorException
+            As for :meth:`publish`.  Publishes that were assigned packet
+            ids before the exception was raised remain on the preflight
+            queue; their tickets are in the `tickets` attribute of the
+            exception.  Later elements of `publishes`, including the one
+            that raised, are not queued.
+
+        Return
+        -------
+        list of MqttPublishTicket
+        """
+        self.__assert_state_rules()
+
+        reqs = []
+        try:
+            for topic, payload, qos, retain in publishes:
+                reqs.append(self.__publish_ticket(topic, payload, qos, retain))
+        except PacketIdReactorException as e:
+            e.tickets = list(reqs)
+            raise
+        finally:
+            self.__queue_publishes(reqs)
+            self.__assert_state_rules()
+            self.__update_io_notification()
+
+        return reqs
+
+    def __publish_ticket(self, topic, payload, qos, retain):
+        """Creates a publish ticket with a packet id assigned as
+        described in :meth:`publish`.
+
+        Returns
+        -------
+        MqttPublishTicket
+        """
         assert 0 <= qos <= 2
         assert isinstance(payload, bytes)
 
         if qos is 0:
             packet_id = 0
+        elif self.__packet_id_backpressure:
+            packet_id = None
         elif qos is 1 or 2:
-            packet_id = self.__send_path_packet_ids.acquire()
+            packet_id = self.__acquire_packet_id()
         else:
             raise NotImplementedError(qos)
 
-        req = MqttPublishTicket(packet_id, topic, payload, qos, retain)
-        self.__preflight_queue.append(req)
-        self.__assert_state_rules()
-        self.__update_io_notification()
-        return req
+        return MqttPublishTicket(packet_id, topic, payload, qos, retain)
 
     def __start(self):
         assert self.sock_state in INACTIVE_SOCK_STATES
@@ -1025,10 +1388,29 @@ class Reactor(object):
                 else:
                     raise NotImplementedError(p.qos)
                 preflight_queue.append(p)
+            elif p.packet_type is MqttControlPacketType.pubrel:
+                # The pubrel is re-sent so that the remote completes the
+                # QoS=2 exchange with a pubcomp.
+                #
+                # [MQTT-4.4.0-1]
+                #
+                preflight_queue.append(p)
+            elif p.packet_type in (MqttControlPacketType.subscribe, MqttControlPacketType.unsubscribe):
+                # Dropped; return packet id so that it may be re-used.
+                self.__release_packet_id(p.packet_id)
 
         for p in self.__preflight_queue:
             if p.packet_type in (MqttControlPacketType.publish, MqttControlPacketType.pubrel):
                 preflight_queue.append(p)
+            elif p.packet_type in (MqttControlPacketType.subscribe, MqttControlPacketType.unsubscribe):
+                self.__release_packet_id(p.packet_id)
+
+        # Only tickets whose pubrel is sent again can be completed by a
+        # pubcomp.
+        pubrel_ids = set(p.packet_id for p in preflight_queue if p.packet_type is MqttControlPacketType.pubrel)
+        for packet_id in list(self.__pubcomp_tickets):
+            if packet_id not in pubrel_ids:
+                del self.__pubcomp_tickets[packet_id]
 
         self.socket = None
         self.__inflight_queue = OrderedDict()
@@ -1041,7 +1423,13 @@ class Reactor(object):
         self.__sock_state = SocketState.name_resolution
         self.__mqtt_state = MqttState.connack
 
+        if self.__endpoints is not None:
+            self.__set_endpoint(self.__endpoints.select(self.__scheduler.instant()))
+
         self.__log.info('Looking up host %s:%d.', self.__host, self.__port)
+        if self.__name_resolution_timeout is not None:
+            self.__name_resolution_deadline = self.__scheduler.add(self.__name_resolution_timeout,
+                                                                   self.__name_resolution_timeout_expired)
         self.__name_resolution_future = self.__name_resolver(*self.__getaddrinfo_params)
         self.__name_resolution_future.add_done_callback(self.__on_name_resolution)
 
@@ -1060,6 +1448,10 @@ class Reactor(object):
         assert future.done()
 
         if not future.cancelled():
+            if self.__name_resolution_deadline is not None:
+                self.__name_resolution_deadline.cancel()
+                self.__name_resolution_deadline = None
+
             results = future.result(timeout=0)
             if results is None:
                 e = future.exception(timeout=0)
@@ -1069,6 +1461,10 @@ class Reactor(object):
                 if len(results) == 0:
                     self.__log.error('No hostname entries found.  Aborting.')
                     self.__abort(AddressReactorError(socket.gaierror(socket.EAI_NONAME, 'Name or service not known')))
+                elif len(results) > 1 and self.__happy_eyeballs_delay is not None:
+                    for result in results:
+                        self.__log_name_resolution(result)
+                    self.__race(results)
                 elif len(results) > 0:
                     self.__log_name_resolution(results[0], chosen=True)
                     for result in results[1:]:
@@ -1147,10 +1543,15 @@ class Reactor(object):
         assert self.state is ReactorState.starting
 
         family, socktype, proto, canonname, sockaddr = resolution
+        self.__sock_state = SocketState.connecting
+        self.__start_connect_deadline()
         try:
-            self.__sock_state = SocketState.connecting
             self.socket = self.__socket_factory(self.__getaddrinfo_params, sockaddr)
             self.socket.connect(sockaddr)
+        except socket.timeout:
+            # Blocking sockets enforce the connect timeout themselves.
+            self.__log.warning("Connection not established within socket timeout.  Aborting.")
+            self.__abort(ConnectTimeoutReactorError())
         except socket.error as e:
             if e.errno == errno.EINPROGRESS:
                 # Connection in progress.
@@ -1161,6 +1562,129 @@ class Reactor(object):
         else:
             self.__on_connect()
 
+    def __start_connect_deadline(self):
+        assert self.__connect_deadline is None
+        self.__connect_instant = self.__scheduler.instant()
+        if self.__connect_timeout is not None:
+            self.__connect_deadline = self.__scheduler.add(self.__connect_timeout, self.__connect_timeout_expired)
+
+    def __race(self, resolutions):
+        """Races connection attempts to `resolutions`.
+
+        Parameters
+        ----------
+        resolutions: list of 5-tuple
+            (family, socktype, proto, canonname, sockaddr) as returned
+            by `socket.getaddrinfo`."""
+        assert self.sock_state is SocketState.name_resolution
+        assert self.state is ReactorState.starting
+
+        self.__sock_state = SocketState.connecting
+        self.__start_connect_deadline()
+        self.__race_resolutions = _interleave_families(resolutions)
+        self.__race_error = None
+        self.__log.info("Racing connections to %d addresses.", len(resolutions))
+        self.__race_next()
+
+    def __race_next(self):
+        """Starts connection attempts until one is pending, then
+        schedules the next attempt; calls :meth:`__race_won` if an
+        attempt connects immediately and aborts once every attempt has
+        failed."""
+        if self.__race_deadline is not None:
+            self.__race_deadline.cancel()
+            self.__race_deadline = None
+
+        while self.__race_resolutions:
+            family, socktype, proto, canonname, sockaddr = self.__race_resolutions.pop(0)
+            self.__log.debug("Connecting to %r.", sockaddr)
+            try:
+                sock = self.__socket_factory(self.__getaddrinfo_params, sockaddr)
+            except socket.error as e:
+                self.__race_error = e.errno
+                continue
+
+            try:
+                sock.connect(sockaddr)
+            except socket.error as e:
+                if e.errno == errno.EINPROGRESS:
+                    self.__race_attempts.append((sock, sockaddr))
+                    self.__race_selector.add_write(sock, self)
+                    break
+                else:
+                    self.__log.debug("Connection to %r failed (errno=%d).", sockaddr, e.errno)
+                    self.__race_error = e.errno
+                    sock.close()
+            else:
+                self.__race_won(sock)
+                return
+
+        if self.__race_attempts:
+            if self.__race_resolutions:
+                self.__race_deadline = self.__scheduler.add(self.__happy_eyeballs_delay, self.__race_timeout)
+        else:
+            self.__abort_socket_error(SocketReactorError(self.__race_error))
+
+    def __race_timeout(self):
+        self.__assert_state_rules()
+        assert self.sock_state is SocketState.connecting
+        self.__race_deadline = None
+        self.__race_next()
+        self.__update_io_notification()
+        self.__assert_state_rules()
+
+    def __race_poll(self):
+        """Called when a racing attempt may have become writable; keeps
+        the first connected attempt, discards failed attempts, and
+        starts the next attempt early if one failed."""
+        failed = False
+        for attempt in list(self.__race_attempts):
+            sock, sockaddr = attempt
+            e = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if e in (0, errno.EINPROGRESS):
+                # SO_ERROR is also zero while the connect is pending;
+                # only a connected socket has a peer.
+                try:
+                    sock.getpeername()
+                except socket.error as e:
+                    if e.errno != errno.ENOTCONN:
+                        raise
+                else:
+                    self.__race_won(sock)
+                    return
+            else:
+                self.__log.debug("Connection to %r failed (errno=%d).", sockaddr, e)
+                self.__race_error = e
+                self.__race_attempts.remove(attempt)
+                self.__race_selector.del_write(sock, self)
+                sock.close()
+                failed = True
+
+        if failed:
+            self.__race_next()
+
+    def __race_won(self, sock):
+        """Closes every attempt other than `sock` then continues the
+        connection with `sock` as :attr:`socket`."""
+        self.__terminate_race(keep=sock)
+        self.socket = sock
+        self.__on_connect()
+
+    def __terminate_race(self, keep=None):
+        """Cancels the next attempt and closes pending attempts other
+        than `keep`; `keep` is unregistered from the selector but
+        remains open."""
+        if self.__race_deadline is not None:
+            self.__race_deadline.cancel()
+            self.__race_deadline = None
+
+        self.__race_resolutions = []
+        for sock, sockaddr in self.__race_attempts:
+            self.__race_selector.del_write(sock, self)
+            if sock is not keep:
+                sock.close()
+        self.__race_attempts = []
+
     def start(self):
         """Attempts to connect with remote if in one of the inactive
         states :py:const:`ReactorState.init`,
@@ -1264,11 +1788,12 @@ class Reactor(object):
         if self.sock_state in (SocketState.stopped, SocketState.name_resolution, SocketState.mute):
             rv = False
         elif self.sock_state is SocketState.connecting:
-            rv = True
+            # No socket while racing connection attempts.
+            rv = self.socket is not None
         elif self.sock_state is SocketState.handshake:
             rv = self.__ssl_want_write
         elif self.sock_state is SocketState.connected:
-            rv = bool(self.__wbuf) or bool(self.__preflight_queue)
+            rv = bool(self.__wbuf) or bool(self.__preflight_queue) or self.__held_launchable()
         else:
             raise NotImplementedError(self.sock_state)
 
@@ -1287,19 +1812,16 @@ class Reactor(object):
         assert self.sock_state in (SocketState.connected, SocketState.mute)
         assert len(new_bytes) > 0
 
-        if self.sock_state is not SocketState.mute:
-            if self.__recv_idle_ping_deadline is not None:
-                self.__recv_idle_ping_deadline.cancel()
-                self.__recv_idle_ping_deadline = None
-
-            if self.recv_idle_ping_period > 0:
+        if self.sock_state is not SocketState.mute and self.recv_idle_ping_period > 0:
+            if self.__recv_idle_ping_deadline is None:
                 self.__recv_idle_ping_deadline = self.__scheduler.add(self.recv_idle_ping_period, self.__recv_idle_ping_timeout)
+            else:
+                self.__recv_idle_ping_deadline.reset(self.recv_idle_ping_period)
 
-        self.__recv_idle_abort_deadline.cancel()
-        self.__recv_idle_abort_deadline = self.__scheduler.add(self.__recv_idle_abort_period,
-                                                               self.__recv_idle_abort_timeout)
+        self.__recv_idle_abort_deadline.reset(self.__recv_idle_abort_period)
 
-        self.__log.debug('recv %d bytes 0x%s', len(new_bytes), HexOnStr(new_bytes))
+        if self.__debug_enabled:
+            self.__log.debug('recv %d bytes 0x%s', len(new_bytes), HexOnStr(new_bytes))
         self.__rbuf.extend(new_bytes)
 
         while True:
@@ -1329,11 +1851,83 @@ class Reactor(object):
                     self.__log.error(m)
                     self.__abort(DecodeReactorError(m))
 
+    def __ssl_pending(self):
+        """int: Number of decrypted bytes buffered by an SSL socket;
+        zero for other sockets."""
+        pending = getattr(self.socket, 'pending', None)
+        if pending is None:
+            return 0
+        else:
+            return pending()
+
+    def __pending_read_timeout(self):
+        """Called when bytes were left pending in an SSL socket after a
+        read spent its budget."""
+        self.__pending_read_deadline = None
+        self.read()
+
+    def __recv(self):
+        """Calls recv on the underlying socket exactly once.
+
+        Returns
+        -------
+        int
+            number of bytes read from socket.
+        """
+        num_bytes_read = 0
+        try:
+            new_bytes = self.socket.recv(4096)
+            num_bytes_read = len(new_bytes)
+            if new_bytes:
+                self.__on_recv_bytes(new_bytes)
+            else:
+                self.__on_muted_remote()
+
+        except UnderflowDecodeError:
+            # Not enough header bytes.
+            pass
+        except DecodeError as e:
+            self.__log.error('Error decoding message (%s)', str(e))
+            self.__abort(DecodeReactorError(str(e)))
+        except ssl.SSLWantWriteError:
+            self.__ssl_want_write = True
+        except ssl.SSLWantReadError:
+            self.__ssl_want_read = True
+        except ssl.SSLError as e:
+            # TODO #14
+            #
+            # Issue: https://github.com/kcallin/haka-mqtt/issues/14
+            #
+            # In blocking socket mode can't find a way to detect
+            # a timeout other than a string comparison.  SUPER
+            # brittle.  Don't like at all!
+            # to = ssl.SSLError('The read operation timed out')
+            if e.message == 'The read operation timed out':
+                self.__ssl_want_read = True
+            else:
+                self.__log.error("SSLError while reading socket; %s.", ReprOnStr(e))
+                self.__abort(SslReactorError(e))
+        except socket.timeout:
+            # See https://github.com/kcallin/haka-mqtt/issues/25
+            pass
+        except socket.error as e:
+            if e.errno == errno.EWOULDBLOCK:
+                # No write space ready.
+                pass
+            else:
+                self.__abort_socket_error(SocketReactorError(e.errno))
+
+        return num_bytes_read
+
     def read(self):
-        """Calls recv on underlying socket exactly once and returns the
-        number of bytes read.  If the underlying socket does not return
-        any bytes due to an error or exception then zero is returned and
-        the reactor state is set to error.
+        """Calls recv on underlying socket once and returns the number
+        of bytes read.  If the underlying socket does not return any
+        bytes due to an error or exception then zero is returned and the
+        reactor state is set to error.
+
+        An SSL socket with decrypted bytes pending after the first recv
+        is read again until nothing is pending or
+        :attr:`ReactorProperties.read_budget` bytes have been read.
 
         This method may be called at any time in any state and if `self`
         is not prepared for a read at that point then no action will be
@@ -1360,47 +1954,26 @@ class Reactor(object):
         elif self.sock_state is SocketState.handshake:
             self.__set_handshake()
         elif self.sock_state in (SocketState.connected, SocketState.mute):
-            try:
-                new_bytes = self.socket.recv(4096)
-                num_bytes_read = len(new_bytes)
-                if new_bytes:
-                    self.__on_recv_bytes(new_bytes)
-                else:
-                    self.__on_muted_remote()
-
-            except UnderflowDecodeError:
-                # Not enough header bytes.
-                pass
-            except DecodeError as e:
-                self.__log.error('Error decoding message (%s)', str(e))
-                self.__abort(DecodeReactorError(str(e)))
-            except ssl.SSLWantWriteError:
-                self.__ssl_want_write = True
-            except ssl.SSLWantReadError:
-                self.__ssl_want_read = True
-            except ssl.SSLError as e:
-                # TODO #14
-                #
-                # Issue: https://github.com/kcallin/haka-mqtt/issues/14
-                #
-                # In blocking socket mode can't find a way to detect
-                # a timeout other than a string comparison.  SUPER
-                # brittle.  Don't like at all!
-                # to = ssl.SSLError('The read operation timed out')
-                if e.message == 'The read operation timed out':
-                    self.__ssl_want_read = True
-                else:
-                    self.__log.error("SSLError while reading socket; %s.", ReprOnStr(e))
-                    self.__abort(SslReactorError(e))
-            except socket.timeout:
-                # See https://github.com/kcallin/haka-mqtt/issues/25
-                pass
-            except socket.error as e:
-                if e.errno == errno.EWOULDBLOCK:
-                    # No write space ready.
-                    pass
-                else:
-                    self.__abort_socket_error(SocketReactorError(e.errno))
+            num_bytes_read = self.__recv()
+            # Decrypted bytes buffered by an SSL socket do not make its
+            # file descriptor readable again so they are consumed now.
+            while (num_bytes_read
+                   and self.sock_state in (SocketState.connected, SocketState.mute)
+                   and self.__ssl_pending()):
+                if num_bytes_read >= self.__read_budget:
+                    if self.__pending_read_deadline is None:
+                        self.__pending_read_deadline = self.__scheduler.add(0, self.__pending_read_timeout)
+                    break
+
+                num_bytes = self.__recv()
+                if num_bytes == 0:
+                    break
+                num_bytes_read += num_bytes
+
+            if self.__pending_read_deadline is not None and not self.__ssl_pending():
+                # Drained before the deadline expired.
+                self.__pending_read_deadline.cancel()
+                self.__pending_read_deadline = None
         else:
             raise NotImplementedError(self.sock_state)
 
@@ -1429,6 +2002,14 @@ class Reactor(object):
                 raise NotImplementedError(self.state)
             self.__mqtt_state = MqttState.connected
 
+            if self.__endpoints is not None:
+                latency = self.__scheduler.instant() - self.__connect_instant
+                self.__endpoints.on_success(self.endpoint, latency)
+
+            on_connected = getattr(self.__socket_factory, 'on_connected', None)
+            if on_connected is not None:
+                on_connected(self.__getaddrinfo_params, self.socket)
+
             self.on_connack(self, connack)
 
             self.__update_io_notification()
@@ -1483,7 +2064,8 @@ class Reactor(object):
         if self.mqtt_state is MqttState.connack:
             self.__abort_early_packet(publish)
         elif self.mqtt_state is MqttState.connected:
-            self.__log.info('Received %s.', repr(publish))
+            if self.__info_enabled:
+                self.__log.info('Received %s.', ReprOnStr(publish))
             self.on_publish(self, publish)
 
             if self.sock_state in (SocketState.connected, SocketState.deaf):
@@ -1526,11 +2108,13 @@ class Reactor(object):
                                                 repr(suback))
             else:
                 if len(suback.results) == len(subscribe.topics):
-                    self.__log.info('Received %s.', repr(suback))
+                    if self.__info_enabled:
+                        self.__log.info('Received %s.', ReprOnStr(suback))
                     subscribe._set_status(MqttSubscribeStatus.done)
 
-                    self.__send_path_packet_ids.release(subscribe.packet_id)
+                    self.__release_packet_id(subscribe.packet_id)
                     del self.__inflight_queue[suback.packet_id]
+                    subscribe._notify_done()
                     self.on_suback(self, suback)
                 else:
                     m = 'Received %s as a response to %s, but the number of subscription' \
@@ -1558,11 +2142,13 @@ class Reactor(object):
                 self.__abort_protocol_violation('Received %s for a mid that is not in-flight; aborting.',
                                                 repr(unsuback))
             else:
-                self.__log.info('Received %s.', repr(unsuback))
+                if self.__info_enabled:
+                    self.__log.info('Received %s.', ReprOnStr(unsuback))
                 unsubscribe._set_status(MqttSubscribeStatus.done)
 
-                self.__send_path_packet_ids.release(unsubscribe.packet_id)
+                self.__release_packet_id(unsubscribe.packet_id)
                 del self.__inflight_queue[unsuback.packet_id]
+                unsubscribe._notify_done()
 
                 if self.on_unsuback is not None:
                     self.on_unsuback(self, unsuback)
@@ -1586,9 +2172,11 @@ class Reactor(object):
             if publish and publish.packet_id == puback.packet_id:
                 if publish.qos == 1:
                     del self.__inflight_queue[puback.packet_id]
-                    self.__send_path_packet_ids.release(publish.packet_id)
-                    self.__log.info('Received %s.', repr(puback))
+                    self.__release_packet_id(publish.packet_id)
+                    if self.__info_enabled:
+                        self.__log.info('Received %s.', ReprOnStr(puback))
                     publish._set_status(MqttPublishStatus.done)
+                    publish._notify_done()
                     self.on_puback(self, puback)
                 else:
                     self.__abort_protocol_violation('Received %s, an inappropriate response to qos=%d %s; aborting.',
@@ -1624,7 +2212,11 @@ class Reactor(object):
                 publish_ticket = in_flight_publish_ids[pubrec.packet_id]
                 if publish_ticket.qos == 2:
                     del self.__inflight_queue[pubrec.packet_id]
-                    self.__log.info('Received %s.', repr(pubrec))
+                    if self.__info_enabled:
+                        self.__log.info('Received %s.', ReprOnStr(pubrec))
+
+                    publish_ticket._set_status(MqttPublishStatus.pubcomp)
+                    self.__pubcomp_tickets[pubrec.packet_id] = publish_ticket
 
                     insert_idx = len(self.__preflight_queue)
                     self.on_pubrec(self, pubrec)
@@ -1658,7 +2250,13 @@ class Reactor(object):
             in_flight_pubrel = dict([(p.packet_id, p) for p in self.__inflight_queue.values() if p.packet_type is MqttControlPacketType.pubrel])
             if pubcomp.packet_id in in_flight_pubrel:
                 del self.__inflight_queue[pubcomp.packet_id]
-                self.__log.info('Received %s.', repr(pubcomp))
+                self.__release_packet_id(pubcomp.packet_id)
+                if self.__info_enabled:
+                    self.__log.info('Received %s.', ReprOnStr(pubcomp))
+                publish_ticket = self.__pubcomp_tickets.pop(pubcomp.packet_id, None)
+                if publish_ticket is not None:
+                    publish_ticket._set_status(MqttPublishStatus.done)
+                    publish_ticket._notify_done()
                 self.on_pubcomp(self, pubcomp)
             else:
                 m = 'Received %s when no pubrel for packet_id=%d was in-flight; aborting.'
@@ -1682,7 +2280,8 @@ class Reactor(object):
         if self.mqtt_state is MqttState.connack:
             self.__abort_early_packet(pubrel)
         elif self.mqtt_state is MqttState.connected:
-            self.__log.info('Received %s.', repr(pubrel))
+            if self.__info_enabled:
+                self.__log.info('Received %s.', ReprOnStr(pubrel))
             self.on_pubrel(self, pubrel)
             self.__preflight_queue.append(MqttPubcomp(pubrel.packet_id))
         else:
@@ -1699,7 +2298,8 @@ class Reactor(object):
             self.__abort_early_packet(pingresp)
         elif self.mqtt_state is MqttState.connected:
             if self.__pingreq_active:
-                self.__log.info('Received %s.', repr(pingresp))
+                if self.__info_enabled:
+                    self.__log.info('Received %s.', ReprOnStr(pingresp))
                 self.__pingreq_active = False
             else:
                 self.__log.warning('Received unsolicited %s.', repr(pingresp))
@@ -1748,11 +2348,30 @@ class Reactor(object):
         #
         # packet_end_offset = [1, 4, 7]
         #
+        if self.__held_publishes:
+            self.__release_held_publishes()
+
         packet_end_offsets = [wbuf_size]
         bio = BytesIO()
-        for packet_record in self.__preflight_queue:
+        idx = 0
+        while idx < len(self.__preflight_queue):
+            packet_record = self.__preflight_queue[idx]
+            if packet_record.packet_type is MqttControlPacketType.publish and packet_record.packet_id is None:
+                # Packet ids are assigned at launch when
+                # self.__packet_id_backpressure is set.  This publish
+                # and those behind it are held until a packet id is
+                # released; other packets are still launched so that
+                # the pubrels, acks, and pingreqs that lead to ids being
+                # released are not stuck behind it.
+                try:
+                    packet_record._set_packet_id(self.__acquire_packet_id())
+                except PacketIdReactorException:
+                    self.__hold_publishes(idx)
+                    continue
+
             wbuf_size += packet_record.encode(bio)
             packet_end_offsets.append(wbuf_size)
+            idx += 1
 
             if packet_record.packet_type is MqttControlPacketType.disconnect or wbuf_size >= min_buf_size:
                 break
@@ -1772,14 +2391,16 @@ class Reactor(object):
 
         launched_packets = self.__preflight_queue[0:num_messages_launched]
         del self.__preflight_queue[0:num_messages_launched]
+        sent_tickets = []
 
         for packet_record in launched_packets:
             packet = packet_record
 
-            if packet.packet_type is MqttControlPacketType.connect:
-                self.__log.info('Launching message %s.', packet.packet())
-            else:
-                self.__log.info('Launching message %s.', ReprOnStr(packet.packet()))
+            if self.__info_enabled:
+                if packet.packet_type is MqttControlPacketType.connect:
+                    self.__log.info('Launching message %s.', packet.packet())
+                else:
+                    self.__log.info('Launching message %s.', ReprOnStr(packet.packet()))
 
             # if packet.packet_type is MqttControlPacketType.connect:
             #     pass
@@ -1788,6 +2409,7 @@ class Reactor(object):
             if packet_record.packet_type is MqttControlPacketType.publish:
                 if packet_record.qos == 0:
                     packet_record._set_status(MqttPublishStatus.done)
+                    sent_tickets.append(packet_record)
                 elif packet_record.qos == 1:
                     packet_record._set_status(MqttPublishStatus.puback)
                     assert packet_record.packet_id not in self.__inflight_queue
@@ -1838,11 +2460,16 @@ class Reactor(object):
 
                 assert self.__recv_idle_abort_deadline is not None
 
-        if num_bytes_flushed:
+        if num_bytes_flushed and self.__debug_enabled:
             self.__log.debug('send %d bytes 0x%s.', num_bytes_flushed, HexOnStr(self.__wbuf[0:num_bytes_flushed]))
 
         self.__wbuf = self.__wbuf[num_bytes_flushed:packet_end_offsets[num_messages_launched]]
 
+        # Done callbacks may publish so they are called once the queues
+        # are consistent.
+        for packet_record in sent_tickets:
+            packet_record._notify_done()
+
         return num_bytes_flushed
 
     def __feed_wbuf(self):
@@ -1879,6 +2506,9 @@ class Reactor(object):
         assert not self.__wbuf
 
         self.__sock_state = SocketState.connected
+        if self.__connect_deadline is not None:
+            self.__connect_deadline.cancel()
+            self.__connect_deadline = None
 
         connect = MqttConnect(self.client_id,
                               self.clean_session,
@@ -1905,8 +2535,17 @@ class Reactor(object):
             self.__ssl_want_write = True
             self.__update_io_notification()
         except ssl.SSLError as e:
-            self.__log.warning('SSL handshake failure: %s.', e)
-            self.__abort(SslReactorError(e))
+            # Python 2 reports a blocking handshake timeout as an
+            # SSLError; see the read timeout in :meth:`read`.
+            if 'The handshake operation timed out' in str(e):
+                self.__log.warning("SSL handshake not completed within socket timeout.  Aborting.")
+                self.__abort(ConnectTimeoutReactorError())
+            else:
+                self.__log.warning('SSL handshake failure: %s.', e)
+                self.__abort(SslReactorError(e))
+        except socket.timeout:
+            self.__log.warning("SSL handshake not completed within socket timeout.  Aborting.")
+            self.__abort(ConnectTimeoutReactorError())
         except socket.error as e:
             self.__log.warning('SSL handshake failure: %s.', e)
             self.__abort(SocketReactorError(e.errno))
@@ -1968,13 +2607,11 @@ class Reactor(object):
                     self.__abort_socket_error(SocketReactorError(e.errno))
 
         if num_bytes_written > 0:
-            if self.sock_state in (SocketState.connected, SocketState.deaf):
-                if self.__keepalive_due_deadline is not None:
-                    self.__keepalive_due_deadline.cancel()
-                    self.__keepalive_due_deadline = None
-
-                if self.keepalive_period:
+            if self.sock_state in (SocketState.connected, SocketState.deaf) and self.keepalive_period:
+                if self.__keepalive_due_deadline is None:
                     self.__keepalive_due_deadline = self.__scheduler.add(self.keepalive_period, self.__keepalive_due_timeout)
+                else:
+                    self.__keepalive_due_deadline.reset(self.keepalive_period)
 
         return num_bytes_written
 
@@ -2009,6 +2646,8 @@ class Reactor(object):
             self.__name_resolution_future.cancel()
             self.__name_resolution_future = None
 
+        self.__terminate_race()
+
         if self.socket is not None:
             self.__selector.update(False, False, self.socket)
             try:
@@ -2040,6 +2679,8 @@ class Reactor(object):
         # Clean up all MQTT protocol related items.
         if self.mqtt_state is MqttState.connack:
             on_disconnect_cb = self.on_connect_fail
+            if error is not None and self.__endpoints is not None:
+                self.__endpoints.on_failure(self.endpoint, self.__scheduler.instant())
         elif self.mqtt_state in (MqttState.connected, MqttState.mute):
             on_disconnect_cb = self.on_disconnect
         elif self.mqtt_state in INACTIVE_MQTT_STATES:
@@ -2064,6 +2705,18 @@ class Reactor(object):
             self.__keepalive_due_deadline.cancel()
             self.__keepalive_due_deadline = None
 
+        if self.__name_resolution_deadline is not None:
+            self.__name_resolution_deadline.cancel()
+            self.__name_resolution_deadline = None
+
+        if self.__connect_deadline is not None:
+            self.__connect_deadline.cancel()
+            self.__connect_deadline = None
+
+        if self.__pending_read_deadline is not None:
+            self.__pending_read_deadline.cancel()
+            self.__pending_read_deadline = None
+
         self.__state = state
         self.__error = error
 
@@ -2170,6 +2823,33 @@ class Reactor(object):
         self.__update_io_notification()
         self.__assert_state_rules()
 
+    def __name_resolution_timeout_expired(self):
+        """Called when name resolution has not completed within
+        ``self.__name_resolution_timeout`` seconds."""
+        self.__assert_state_rules()
+        assert self.sock_state is SocketState.name_resolution
+
+        self.__log.warning("Name resolution did not complete within %.01fs.  Aborting.",
+                           self.__name_resolution_timeout)
+        self.__name_resolution_deadline = None
+        self.__abort(NameResolutionTimeoutReactorError())
+
+        self.__update_io_notification()
+        self.__assert_state_rules()
+
+    def __connect_timeout_expired(self):
+        """Called when the socket has not connected and completed any
+        SSL handshake within ``self.__connect_timeout`` seconds."""
+        self.__assert_state_rules()
+        assert self.sock_state in (SocketState.connecting, SocketState.handshake)
+
+        self.__log.warning("Connection not established within %.01fs.  Aborting.", self.__connect_timeout)
+        self.__connect_deadline = None
+        self.__abort(ConnectTimeoutReactorError())
+
+        self.__update_io_notification()
+        self.__assert_state_rules()
+
     def write(self):
         """If there is any data queued to be written to the underlying
         socket then a single call to socket send will be made to try
@@ -2184,7 +2864,11 @@ class Reactor(object):
         """
         self.__assert_state_rules()
 
-        if self.sock_state is SocketState.connecting:
+        if self.sock_state is SocketState.connecting and self.socket is None:
+            self.__race_poll()
+            if self.socket is not None:
+                self.__feed_wbuf()
+        elif self.sock_state is SocketState.connecting:
             e = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
             if e == 0:
                 self.__on_connect()
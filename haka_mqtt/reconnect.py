@@ -0,0 +1,175 @@
+import random
+
+from enum import IntEnum, unique
+
+
+@unique
+class Jitter(IntEnum):
+    """Randomization applied to reconnect delays so that clients
+    disconnected at the same time do not reconnect at the same time.
+
+    * :py:const:`Jitter.none`: ``min(max_delay, base_delay * multiplier**attempt)``.
+    * :py:const:`Jitter.full`: uniformly distributed between zero and
+      the un-jittered delay.
+    * :py:const:`Jitter.decorrelated`: uniformly distributed between
+      `base_delay` and three times the previous delay, capped at
+      `max_delay`.
+
+    .. versionadded:: 0.3.6
+    """
+    none = 0
+    full = 1
+    decorrelated = 2
+
+
+class ReconnectPolicy(object):
+    """Restarts a reactor after a disconnect or failed connection with
+    an exponentially increasing delay.
+
+    Call :meth:`schedule` from the reactor's `on_disconnect` and
+    `on_connect_fail` callbacks and :meth:`on_connack` from its
+    `on_connack` callback.  A connection that lasts at least
+    `stable_period` seconds resets the delay to its starting value.
+
+    .. code-block:: python
+
+        class Client(MqttPollClient):
+            def __init__(self, properties):
+                MqttPollClient.__init__(self, properties)
+                self.reconnect_policy = ReconnectPolicy(self, self._scheduler)
+
+            def on_connack(self, reactor, connack):
+                self.reconnect_policy.on_connack()
+
+            def on_disconnect(self, reactor):
+                self.reconnect_policy.schedule()
+
+            def on_connect_fail(self, reactor):
+                self.reconnect_policy.schedule()
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    reactor: haka_mqtt.reactor.Reactor
+        Object with a `start` method.
+    scheduler: haka_mqtt.scheduler.Scheduler
+        The reactor's scheduler.
+    base_delay: float
+        0 < base_delay; delay before the first reconnect.
+    max_delay: float
+        base_delay <= max_delay.
+    multiplier: float
+        1 <= multiplier; growth of the delay with each attempt.
+    jitter: Jitter
+    stable_period: float
+        0 <= stable_period; seconds a connection must last after
+        connack for the delay to be reset.
+    rand: random.Random or None
+        Source of randomness; defaults to a new `random.Random`.
+    """
+    def __init__(self, reactor, scheduler, base_delay=1., max_delay=60., multiplier=2., jitter=Jitter.full,
+                 stable_period=60., rand=None):
+        assert 0 < base_delay <= max_delay
+        assert 1 <= multiplier
+        assert jitter in iter(Jitter)
+        assert 0 <= stable_period
+
+        self.__reactor = reactor
+        self.__scheduler = scheduler
+        self.__base_delay = base_delay
+        self.__max_delay = max_delay
+        self.__multiplier = multiplier
+        self.__jitter = jitter
+        self.__stable_period = stable_period
+        if rand is None:
+            rand = random.Random()
+        self.__rand = rand
+
+        self.__attempts = 0
+        self.__prev_delay = base_delay
+        self.__reconnect_deadline = None
+        self.__next_instant = None
+        self.__stable_deadline = None
+
+    @property
+    def attempts(self):
+        """int: Number of reconnects scheduled since the policy was
+        created or last reset."""
+        return self.__attempts
+
+    @property
+    def next_instant(self):
+        """float or None: Scheduler instant at which the reactor will
+        be restarted or None if no restart is scheduled."""
+        return self.__next_instant
+
+    def scheduled(self):
+        """bool: True if a restart is scheduled; False otherwise."""
+        return self.__reconnect_deadline is not None
+
+    def __next_delay(self):
+        if self.__jitter is Jitter.decorrelated:
+            delay = min(self.__max_delay, self.__rand.uniform(self.__base_delay, 3 * self.__prev_delay))
+        else:
+            # Exponent is capped so the multiplication cannot overflow.
+            exponent = min(self.__attempts, 64)
+            delay = min(self.__max_delay, self.__base_delay * self.__multiplier ** exponent)
+            if self.__jitter is Jitter.full:
+                delay = self.__rand.uniform(0, delay)
+            elif self.__jitter is Jitter.none:
+                pass
+            else:
+                raise NotImplementedError(self.__jitter)
+
+        self.__prev_delay = delay
+        return delay
+
+    def schedule(self):
+        """Schedules the reactor to be restarted after the next delay;
+        a restart that is already scheduled is replaced.
+
+        Returns
+        -------
+        float
+            The delay in seconds.
+        """
+        self.cancel()
+
+        delay = self.__next_delay()
+        self.__attempts += 1
+        self.__next_instant = self.__scheduler.instant() + delay
+        self.__reconnect_deadline = self.__scheduler.add(delay, self.__on_reconnect_timeout)
+        return delay
+
+    def __on_reconnect_timeout(self):
+        self.__reconnect_deadline = None
+        self.__next_instant = None
+        self.__reactor.start()
+
+    def on_connack(self):
+        """Starts the stable period; if the connection has not been
+        lost when it ends then the policy is reset."""
+        if self.__stable_deadline is not None:
+            self.__stable_deadline.cancel()
+        self.__stable_deadline = self.__scheduler.add(self.__stable_period, self.__on_stable_timeout)
+
+    def __on_stable_timeout(self):
+        self.__stable_deadline = None
+        self.reset()
+
+    def reset(self):
+        """Returns the attempt count and delay to their starting
+        values."""
+        self.__attempts = 0
+        self.__prev_delay = self.__base_delay
+
+    def cancel(self):
+        """Cancels any scheduled restart and stable period."""
+        for deadline in (self.__reconnect_deadline, self.__stable_deadline):
+            if deadline is not None:
+                deadline.cancel()
+
+        self.__reconnect_deadline = None
+        self.__stable_deadline = None
+        self.__next_instant = None
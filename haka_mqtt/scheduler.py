@@ -1,4 +1,5 @@
-from bisect import insort_right, bisect_left
+from heapq import heappush, heappop, heapify
+from itertools import count
 
 
 class Deadline(object):
@@ -15,49 +16,72 @@ class Deadline(object):
         cancel is called after the callback has already been made."""
         self.__deadline_entry.cancel()
 
+    def reset(self, duration):
+        """Reschedules the callback to be made `duration` ticks from
+        the current scheduler instant.  If the deadline has expired or
+        been cancelled then it is re-armed.
+
+        Moving a pending deadline later costs O(1); the scheduler
+        notices the new instant when the old one comes due.  This makes
+        it cheap to push back idle timers every time there is traffic.
+
+        .. versionadded:: 0.3.6
+
+        Parameters
+        ----------
+        duration: int
+        """
+        self.__deadline_entry.reset(duration)
+
 
 class _DeadlineEntry(object):
-    def __init__(self, instant, queue, cb):
+    """A scheduled callback.
+
+    Each pending entry owns exactly one item in the scheduler queue
+    (`self.item`).  Queue items that are no longer owned by their entry
+    (because it was cancelled or moved earlier) are tombstones which
+    are discarded when they reach the front of the queue or when the
+    queue is compacted.  An entry whose `instant` is later than its
+    queue item was pushed back by `reset` and is re-queued when the
+    item reaches the front of the queue."""
+    def __init__(self, instant, scheduler, cb):
         self.instant = instant
         self.cb = cb
-        self.queue = queue
+        self.scheduler = scheduler
         self.expired = False
+        self.item = None
 
     def cancel(self):
         if not self.expired:
             self.expired = True
-            idx = bisect_left(self.queue, self)
-            while idx < len(self.queue):
-                if id(self.queue[idx]) == id(self):
-                    del self.queue[idx]
-                    break
-                elif self.queue[idx] > self:
-                    raise AssertionError()
-                else:
-                    idx += 1
-
-    def __eq__(self, other):
-        return self.instant == other.instant
+            self.item = None
+            self.scheduler._on_cancel()
 
-    def __ne__(self, other):
-        return self.instant != other.instant
-
-    def __lt__(self, other):
-        return self.instant < other.instant
-
-    def __gt__(self, other):
-        return self.instant > other.instant
+    def reset(self, duration):
+        instant = self.scheduler.instant() + duration
+        self.instant = instant
+        if self.item is None or instant < self.item[0]:
+            if self.item is not None:
+                self.item = None
+                self.scheduler._on_cancel()
+            self.expired = False
+            self.scheduler._push(self)
 
-    def __le__(self, other):
-        return self.instant <= other.instant
 
-    def __ge__(self, other):
-        return self.instant >= other.instant
+class Scheduler(object):
+    """Base class of schedulers.  Deadlines are kept in a binary heap
+    so that adding a deadline is O(log n) while cancelling one or
+    pushing it later with :meth:`Deadline.reset` is O(1); deadlines
+    with equal instants are called in the order they were added."""
 
+    # Queue is not compacted until it holds at least this many
+    # cancelled entries.
+    _MIN_COMPACT_SIZE = 64
 
-class Scheduler(object):
     def __init__(self):
         self._queue = []
+        self._num_cancelled = 0
+        self.__sequence = count()
 
     def instant(self):
         """Returns the current tick.
@@ -68,6 +92,60 @@ class Scheduler(object):
         """
         raise NotImplementedError()
 
+    def _on_cancel(self):
+        """Called by a deadline entry when it is cancelled.  Compacts
+        the queue when more than half of it is cancelled entries."""
+        self._num_cancelled += 1
+        if self._num_cancelled >= self._MIN_COMPACT_SIZE and 2 * self._num_cancelled > len(self._queue):
+            # Modify queue in-place; poll may hold a reference to it.
+            self._queue[:] = [item for item in self._queue if item[2].item is item]
+            heapify(self._queue)
+            self._num_cancelled = 0
+
+    def _push(self, de):
+        """Places a queue item for `de` at `de.instant`."""
+        de.item = [de.instant, next(self.__sequence), de]
+        heappush(self._queue, de.item)
+
+    def _pop(self):
+        """Pops the front queue item; tombstones are discarded and
+        entries pushed back by `reset` are re-queued.
+
+        Returns
+        -------
+        _DeadlineEntry or None
+            The entry if it is due at the popped instant; otherwise
+            None.
+        """
+        item = heappop(self._queue)
+        de = item[2]
+        if de.item is not item:
+            self._num_cancelled -= 1
+            de = None
+        elif de.instant > item[0]:
+            self._push(de)
+            de = None
+
+        return de
+
+    def _discard_cancelled(self):
+        """Pops cancelled and pushed-back entries from the front of the
+        queue so that the front item holds the true next instant."""
+        queue = self._queue
+        while queue and (queue[0][2].item is not queue[0] or queue[0][2].instant > queue[0][0]):
+            self._pop()
+
+    def _expire(self):
+        """Calls all callbacks with instants at or before
+        `self.instant()`."""
+        queue = self._queue
+        while queue and queue[0][0] <= self.instant():
+            de = self._pop()
+            if de is not None:
+                de.item = None
+                de.expired = True
+                de.cb()
+
     def remaining(self):
         """Duration remaining to next scheduled callback.
 
@@ -75,16 +153,17 @@ class Scheduler(object):
         -------
         int or None
         """
+        self._discard_cancelled()
         if self._queue:
-            rv = self._queue[0].instant - self.instant()
+            rv = self._queue[0][0] - self.instant()
         else:
             rv = None
 
         return rv
 
     def add(self, duration, cb):
-        """Adds `duration` to `self.instant()` and calls all scheduled
-        callbacks.
+        """Schedules `cb` to be called once `duration` ticks have
+        elapsed.
 
         Parameters
         ----------
@@ -97,19 +176,18 @@ class Scheduler(object):
         -------
         Deadline
         """
-        de = _DeadlineEntry(self.instant() + duration, self._queue, cb)
-        insort_right(self._queue, de)
+        de = _DeadlineEntry(self.instant() + duration, self, cb)
+        self._push(de)
         return Deadline(de)
 
     def __len__(self):
-        return len(self._queue)
+        return len(self._queue) - self._num_cancelled
 
 
 class DurationScheduler(Scheduler):
     def __init__(self):
         Scheduler.__init__(self)
         self._instant = 0
-        self._queue = []
 
     def instant(self):
         """Returns the current tick.
@@ -129,11 +207,7 @@ class DurationScheduler(Scheduler):
         duration: int
         """
         self._instant += duration
-
-        while self._queue and self._queue[0].instant <= self.instant():
-            de = self._queue.pop(0)
-            de.expired = True
-            de.cb()
+        self._expire()
 
 
 class ClockScheduler(Scheduler):
@@ -153,7 +227,4 @@ class ClockScheduler(Scheduler):
 
     def poll(self):
         """Calls all callbacks awaiting execution to this point."""
-        while self._queue and self._queue[0].instant <= self.instant():
-            de = self._queue.pop(0)
-            de.expired = True
-            de.cb()
+        self._expire()
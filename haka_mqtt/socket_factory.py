@@ -1,52 +1,413 @@
 import socket
 import ssl
+import sys
+from collections import OrderedDict
+
+
+# Not defined by the socket module of older Python versions.
+_TCP_USER_TIMEOUT = getattr(socket, 'TCP_USER_TIMEOUT', 18 if sys.platform.startswith('linux') else None)
+# Darwin names the keepalive idle time option TCP_KEEPALIVE.
+_TCP_KEEPIDLE = getattr(socket, 'TCP_KEEPIDLE', getattr(socket, 'TCP_KEEPALIVE', 0x10 if sys.platform == 'darwin' else None))
+_TCP_KEEPINTVL = getattr(socket, 'TCP_KEEPINTVL', None)
+_TCP_KEEPCNT = getattr(socket, 'TCP_KEEPCNT', None)
+_IPV6_TCLASS = getattr(socket, 'IPV6_TCLASS', 67 if sys.platform.startswith('linux') else None)
+# TLS session resumption is available from Python 3.6.
+_HAS_SSL_SESSION = hasattr(ssl, 'SSLSession')
+
+
+class SocketOptions(object):
+    """Socket options applied by the socket factories to every socket
+    before it is connected.  Options left as `None` are not set and
+    keep their operating system defaults.  Options the platform does
+    not support (such as `user_timeout` outside of Linux) are skipped.
+
+    .. versionadded:: 0.3.6
+
+    Attributes
+    ----------
+    nodelay: bool or None
+        TCP_NODELAY; when `True` small writes such as publishes and
+        acknowledgements are sent without waiting to be coalesced
+        (Nagle's algorithm).
+    sndbuf: int or None
+        SO_SNDBUF in bytes.
+    rcvbuf: int or None
+        SO_RCVBUF in bytes.
+    keepalive: bool or None
+        SO_KEEPALIVE.
+    keepalive_idle: int or None
+        TCP_KEEPIDLE; seconds a connection is idle before the first
+        keepalive probe.
+    keepalive_interval: int or None
+        TCP_KEEPINTVL; seconds between keepalive probes.
+    keepalive_count: int or None
+        TCP_KEEPCNT; unanswered probes before the connection is
+        dropped.
+    user_timeout: float or None
+        TCP_USER_TIMEOUT in seconds; transmitted data may remain
+        unacknowledged this long before the connection is dropped.
+    tos: int or None
+        IP_TOS for IPv4 sockets and IPV6_TCLASS for IPv6 sockets.
+    """
+    def __init__(self,
+                 nodelay=None,
+                 sndbuf=None,
+                 rcvbuf=None,
+                 keepalive=None,
+                 keepalive_idle=None,
+                 keepalive_interval=None,
+                 keepalive_count=None,
+                 user_timeout=None,
+                 tos=None):
+        self.nodelay = nodelay
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
+        self.keepalive = keepalive
+        self.keepalive_idle = keepalive_idle
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_count = keepalive_count
+        self.user_timeout = user_timeout
+        self.tos = tos
+
+    def setsockopts(self, sock, family):
+        """Calls `sock.setsockopt` for every option that is set.
+
+        Parameters
+        ----------
+        sock: socket.socket
+        family: int
+            socket.AF_INET or socket.AF_INET6.
+
+        Raises
+        ------
+        socket.error
+        """
+        opts = []
+        if self.nodelay is not None:
+            opts.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self.nodelay)))
+        if self.sndbuf is not None:
+            opts.append((socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf))
+        if self.rcvbuf is not None:
+            opts.append((socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf))
+        if self.keepalive is not None:
+            opts.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, int(self.keepalive)))
+        if self.keepalive_idle is not None and _TCP_KEEPIDLE is not None:
+            opts.append((socket.IPPROTO_TCP, _TCP_KEEPIDLE, self.keepalive_idle))
+        if self.keepalive_interval is not None and _TCP_KEEPINTVL is not None:
+            opts.append((socket.IPPROTO_TCP, _TCP_KEEPINTVL, self.keepalive_interval))
+        if self.keepalive_count is not None and _TCP_KEEPCNT is not None:
+            opts.append((socket.IPPROTO_TCP, _TCP_KEEPCNT, self.keepalive_count))
+        if self.user_timeout is not None and _TCP_USER_TIMEOUT is not None:
+            opts.append((socket.IPPROTO_TCP, _TCP_USER_TIMEOUT, int(self.user_timeout * 1000)))
+        if self.tos is not None:
+            if family == socket.AF_INET:
+                opts.append((socket.IPPROTO_IP, socket.IP_TOS, self.tos))
+            elif _IPV6_TCLASS is not None:
+                opts.append((socket.IPPROTO_IPV6, _IPV6_TCLASS, self.tos))
+
+        for level, optname, value in opts:
+            sock.setsockopt(level, optname, value)
+
+    def __repr__(self):
+        attrs = ('nodelay', 'sndbuf', 'rcvbuf', 'keepalive', 'keepalive_idle', 'keepalive_interval',
+                 'keepalive_count', 'user_timeout', 'tos')
+        return 'SocketOptions({})'.format(', '.join('{}={!r}'.format(a, getattr(self, a))
+                                                    for a in attrs if getattr(self, a) is not None))
+
+
+_PROFILES = {
+    # Interactive traffic: no Nagle delay and dead peers detected in
+    # well under a minute.
+    'low-latency': dict(nodelay=True,
+                        keepalive=True,
+                        keepalive_idle=30,
+                        keepalive_interval=10,
+                        keepalive_count=3,
+                        user_timeout=30.,
+                        tos=0x10),
+    # Large or frequent publishes: writes coalesced and buffers sized
+    # for a high bandwidth-delay product.
+    'bulk-throughput': dict(nodelay=False,
+                            sndbuf=1024 * 1024,
+                            rcvbuf=1024 * 1024,
+                            keepalive=True,
+                            keepalive_idle=60,
+                            keepalive_interval=15,
+                            keepalive_count=4,
+                            tos=0x08),
+}
+
+
+def socket_options_profiles():
+    """Names accepted by :func:`socket_options_profile`.
+
+    .. versionadded:: 0.3.6
+
+    Returns
+    -------
+    list of str
+    """
+    return sorted(_PROFILES)
+
+
+def socket_options_profile(name):
+    """Creates the named preset.
+
+    * ``low-latency``: TCP_NODELAY, aggressive keepalives, a 30 s
+      TCP_USER_TIMEOUT and the low-delay type of service.
+    * ``bulk-throughput``: Nagle's algorithm enabled, 1 MiB send and
+      receive buffers, relaxed keepalives and the throughput type of
+      service.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    name: str
+
+    Raises
+    ------
+    KeyError
+        If there is no profile named `name`.
+
+    Returns
+    -------
+    SocketOptions
+        A new object that may be modified without affecting the
+        preset.
+    """
+    return SocketOptions(**_PROFILES[name])
+
+
+def _socket_options(options):
+    if options is None or isinstance(options, SocketOptions):
+        return options
+    else:
+        return socket_options_profile(options)
+
+
+def _create_socket(addr, options):
+    if len(addr) == 2:
+        family = socket.AF_INET
+    elif len(addr) == 4:
+        family = socket.AF_INET6
+    else:
+        raise NotImplementedError(addr)
+
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    if options is not None:
+        try:
+            options.setsockopts(sock, family)
+        except socket.error:
+            sock.close()
+            raise
+
+    return sock
 
 
 class BlockingSocketFactory(object):
-    def __init__(self):
-        pass
+    def __init__(self, options=None, connect_timeout=None):
+        """
+
+        Parameters
+        ----------
+        options: SocketOptions or str or None
+            Options set on each socket before it is connected, or the
+            name of a :func:`socket_options_profile`.
+
+            .. versionadded:: 0.3.6
+        connect_timeout: float or None
+            Timeout set on each socket so that a blocking connect
+            raises `socket.timeout` rather than blocking indefinitely;
+            `None` (the default) blocks indefinitely.
+
+            .. versionadded:: 0.3.6
+        """
+        assert connect_timeout is None or 0 < connect_timeout
+        self.__options = _socket_options(options)
+        self.__connect_timeout = connect_timeout
 
     def __call__(self, getaddrinfo_params, addr):
         host, port, address_family, socktype, proto, flags = getaddrinfo_params
 
-        if len(addr) == 2:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        elif len(addr) == 4:
-            sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-        else:
-            raise NotImplementedError(addr)
+        sock = _create_socket(addr, self.__options)
 
-        sock.setblocking(True)
+        sock.settimeout(self.__connect_timeout)
         return sock
 
 
 class SocketFactory(object):
-    def __init__(self):
-        pass
+    def __init__(self, options=None):
+        """
+
+        Parameters
+        ----------
+        options: SocketOptions or str or None
+            Options set on each socket before it is connected, or the
+            name of a :func:`socket_options_profile`.
+
+            .. versionadded:: 0.3.6
+        """
+        self.__options = _socket_options(options)
 
     def __call__(self, getaddrinfo_params, addr):
         host, port, address_family, socktype, proto, flags = getaddrinfo_params
 
-        if len(addr) == 2:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        elif len(addr) == 4:
-            sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-        else:
-            raise NotImplementedError(addr)
+        sock = _create_socket(addr, self.__options)
 
         sock.setblocking(False)
         return sock
 
 
+class SslSessionCache(object):
+    """Keeps the TLS session of the last accepted connection to each
+    endpoint so that the next connection to that endpoint can resume
+    it with an abbreviated handshake.
+
+    Sessions are stored when the server accepts a connection with a
+    connack rather than when the handshake completes because TLS 1.3
+    servers send their session tickets after the handshake.  Resumption
+    requires :attr:`ssl.SSLSocket.session` (Python 3.6+); on older
+    versions statistics are kept but no sessions are offered.
+
+    One cache may be shared by several factories that use the same
+    :class:`ssl.SSLContext`.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    max_entries: int
+        0 < max_entries; when full the least recently used session is
+        evicted.
+    """
+    def __init__(self, max_entries=256):
+        assert 0 < max_entries
+
+        self.__max_entries = max_entries
+        self.__sessions = OrderedDict()
+        self.__num_offered = 0
+        self.__num_resumed = 0
+        self.__num_connections = 0
+
+    @property
+    def num_offered(self):
+        """int: Number of sockets that were offered a cached session."""
+        return self.__num_offered
+
+    @property
+    def num_resumed(self):
+        """int: Number of accepted connections whose handshake resumed
+        a session."""
+        return self.__num_resumed
+
+    @property
+    def num_connections(self):
+        """int: Number of accepted connections."""
+        return self.__num_connections
+
+    @property
+    def hit_rate(self):
+        """float: `num_resumed` / `num_offered`; zero when no session
+        has been offered.  Offers to sockets that never connected count
+        as misses."""
+        if self.__num_offered:
+            return float(self.__num_resumed) / self.__num_offered
+        else:
+            return 0.
+
+    def __len__(self):
+        return len(self.__sessions)
+
+    def get(self, endpoint):
+        """
+        Parameters
+        ----------
+        endpoint: tuple
+            2-tuple of (host: `str`, port: `int`).
+
+        Returns
+        -------
+        ssl.SSLSession or None
+        """
+        session = self.__sessions.pop(endpoint, None)
+        if session is not None:
+            self.__sessions[endpoint] = session
+
+        return session
+
+    def invalidate(self, endpoint=None):
+        """Removes the session for `endpoint` or every session when
+        `endpoint` is None."""
+        if endpoint is None:
+            self.__sessions.clear()
+        else:
+            self.__sessions.pop(endpoint, None)
+
+    def _wrap_socket(self, context, sock, endpoint):
+        host, port = endpoint
+        kwargs = {}
+        if _HAS_SSL_SESSION:
+            session = self.get(endpoint)
+            if session is not None:
+                kwargs['session'] = session
+                self.__num_offered += 1
+
+        return context.wrap_socket(sock,
+                                   server_side=False,
+                                   do_handshake_on_connect=False,
+                                   suppress_ragged_eofs=True,
+                                   server_hostname=host,
+                                   **kwargs)
+
+    def _on_connected(self, sock, endpoint):
+        self.__num_connections += 1
+        if getattr(sock, 'session_reused', False):
+            self.__num_resumed += 1
+
+        session = getattr(sock, 'session', None)
+        if session is not None:
+            self.__sessions.pop(endpoint, None)
+            self.__sessions[endpoint] = session
+            while len(self.__sessions) > self.__max_entries:
+                self.__sessions.popitem(last=False)
+
+
 class BlockingSslSocketFactory(object):
-    def __init__(self, context):
+    def __init__(self, context, options=None, session_cache=None, connect_timeout=None):
         """
 
         Parameters
         ----------
         context: ssl.SSLContext
+        options: SocketOptions or str or None
+            Options set on each socket before it is connected, or the
+            name of a :func:`socket_options_profile`.
+
+            .. versionadded:: 0.3.6
+        session_cache: SslSessionCache or None
+            Defaults to a new :class:`SslSessionCache`.
+
+            .. versionadded:: 0.3.6
+        connect_timeout: float or None
+            Timeout set on each socket so that a blocking connect or
+            SSL handshake raises `socket.timeout` rather than blocking
+            indefinitely; `None` (the default) blocks indefinitely.
+
+            .. versionadded:: 0.3.6
         """
+        assert connect_timeout is None or 0 < connect_timeout
         self.__context = context
+        self.__options = _socket_options(options)
+        if session_cache is None:
+            session_cache = SslSessionCache()
+        self.__session_cache = session_cache
+        self.__connect_timeout = connect_timeout
+
+    @property
+    def session_cache(self):
+        """SslSessionCache: TLS sessions and resumption statistics."""
+        return self.__session_cache
 
     def __call__(self, getaddrinfo_params, addr):
         """
@@ -57,31 +418,53 @@ class BlockingSslSocketFactory(object):
 
         host, port, address_family, socktype, proto, flags = getaddrinfo_params
 
-        if len(addr) == 2:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        elif len(addr) == 4:
-            sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-        else:
-            raise NotImplementedError(addr)
-
-        sock = self.__context.wrap_socket(sock,
-                                          server_side=False,
-                                          do_handshake_on_connect=False,
-                                          suppress_ragged_eofs=True,
-                                          server_hostname=host)
-        sock.setblocking(True)
+        sock = _create_socket(addr, self.__options)
+
+        sock = self.__session_cache._wrap_socket(self.__context, sock, (host, port))
+        sock.settimeout(self.__connect_timeout)
         return sock
 
+    def on_connected(self, getaddrinfo_params, sock):
+        """Called by the reactor when the server accepts a connection
+        made with `sock`; stores its TLS session for reuse.
+
+        Parameters
+        ----------
+        getaddrinfo_params: tuple
+            The parameters `sock` was created with.
+        sock: ssl.SSLSocket
+        """
+        host, port, address_family, socktype, proto, flags = getaddrinfo_params
+        self.__session_cache._on_connected(sock, (host, port))
+
 
 class SslSocketFactory(object):
-    def __init__(self, context):
+    def __init__(self, context, options=None, session_cache=None):
         """
 
         Parameters
         ----------
         context: ssl.SSLContext
+        options: SocketOptions or str or None
+            Options set on each socket before it is connected, or the
+            name of a :func:`socket_options_profile`.
+
+            .. versionadded:: 0.3.6
+        session_cache: SslSessionCache or None
+            Defaults to a new :class:`SslSessionCache`.
+
+            .. versionadded:: 0.3.6
         """
         self.__context = context
+        self.__options = _socket_options(options)
+        if session_cache is None:
+            session_cache = SslSessionCache()
+        self.__session_cache = session_cache
+
+    @property
+    def session_cache(self):
+        """SslSessionCache: TLS sessions and resumption statistics."""
+        return self.__session_cache
 
     def __call__(self, getaddrinfo_params, addr):
         """
@@ -92,17 +475,21 @@ class SslSocketFactory(object):
 
         host, port, address_family, socktype, proto, flags = getaddrinfo_params
 
-        if len(addr) == 2:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        elif len(addr) == 4:
-            sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-        else:
-            raise NotImplementedError(addr)
+        sock = _create_socket(addr, self.__options)
 
-        sock = self.__context.wrap_socket(sock,
-                                          server_side=False,
-                                          do_handshake_on_connect=False,
-                                          suppress_ragged_eofs=True,
-                                          server_hostname=host)
+        sock = self.__session_cache._wrap_socket(self.__context, sock, (host, port))
         sock.setblocking(False)
         return sock
+
+    def on_connected(self, getaddrinfo_params, sock):
+        """Called by the reactor when the server accepts a connection
+        made with `sock`; stores its TLS session for reuse.
+
+        Parameters
+        ----------
+        getaddrinfo_params: tuple
+            The parameters `sock` was created with.
+        sock: ssl.SSLSocket
+        """
+        host, port, address_family, socktype, proto, flags = getaddrinfo_params
+        self.__session_cache._on_connected(sock, (host, port))
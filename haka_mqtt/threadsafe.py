@@ -0,0 +1,112 @@
+import threading
+
+from haka_mqtt.exception import PacketIdReactorException
+from haka_mqtt.wakeup import Wakeup
+
+
+class ThreadSafePublisher(object):
+    """Accepts publishes from any thread and hands them to a reactor on
+    its loop thread.
+
+    Publishes are appended to a pending list and the loop is woken
+    through a :class:`haka_mqtt.wakeup.Wakeup` registered with the
+    reactor's selector.  The loop is woken only when the pending list
+    goes from empty to non-empty; when woken, everything submitted
+    since the last wakeup is placed on the preflight queue with a single
+    :meth:`haka_mqtt.reactor.Reactor.publish_batch` call.
+
+    The publisher must be created and closed on the loop thread.  If a
+    QoS=1 or QoS=2 publish cannot be assigned a packet id then it and
+    every publish after it are held, in order, ahead of later
+    submissions until :meth:`on_packet_ids_available` is called; the
+    reactor's :meth:`haka_mqtt.reactor.Reactor.on_packet_ids_available`
+    callback should call it.  Enabling
+    :attr:`haka_mqtt.reactor.ReactorProperties.packet_id_backpressure`
+    leaves the reactor to hold publishes instead.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    reactor: haka_mqtt.reactor.Reactor
+    selector: object
+        Selector the reactor is registered with; must have the
+        `add_callback_read` and `del_callback_read` methods of
+        :class:`haka_mqtt.frontends.epoll.EpollSelector`.
+    """
+    def __init__(self, reactor, selector):
+        self.__reactor = reactor
+        self.__selector = selector
+        self.__lock = threading.Lock()
+        self.__pending = []
+        self.__num_batches = 0
+        self.__wakeup = Wakeup()
+        selector.add_callback_read(self.__wakeup.fileno(), self.__on_wakeup)
+
+    @property
+    def num_batches(self):
+        """int: Number of batches placed on the preflight queue."""
+        return self.__num_batches
+
+    def publish(self, topic, payload, qos, retain=False):
+        """Queues a :meth:`haka_mqtt.reactor.Reactor.publish` call; may
+        be called from any thread.  The ticket is created on the loop
+        thread and is not returned.
+
+        Parameters
+        -----------
+        topic: str
+        payload: bytes
+        qos: int
+            0 <= qos <= 2
+        retain: bool
+        """
+        assert 0 <= qos <= 2
+        assert isinstance(payload, bytes)
+
+        with self.__lock:
+            wake = not self.__pending
+            self.__pending.append((topic, payload, qos, retain))
+
+        if wake:
+            self.__wakeup.wake()
+
+    def __on_wakeup(self):
+        # Drain before taking the pending list so that a publish racing
+        # with this call leaves a wakeup pending.
+        self.__wakeup.drain()
+        with self.__lock:
+            batch = self.__pending
+            self.__pending = []
+
+        if batch:
+            self.__num_batches += 1
+            try:
+                self.__reactor.publish_batch(batch)
+            except PacketIdReactorException as e:
+                # Hold the publishes that were not queued ahead of any
+                # submitted since the list was taken.  No wakeup is
+                # needed; on_packet_ids_available provides it.
+                with self.__lock:
+                    self.__pending[0:0] = batch[len(e.tickets):]
+
+    def on_packet_ids_available(self):
+        """Wakes the loop to retry publishes held because no packet id
+        was available; call on the loop thread from
+        :meth:`haka_mqtt.reactor.Reactor.on_packet_ids_available`."""
+        with self.__lock:
+            wake = bool(self.__pending)
+
+        if wake:
+            self.__wakeup.wake()
+
+    def closed(self):
+        """bool: True if the object has been closed; False otherwise."""
+        return self.__wakeup.closed()
+
+    def close(self):
+        """Unregisters from the selector; publishes still pending are
+        discarded."""
+        if not self.__wakeup.closed():
+            self.__selector.del_callback_read(self.__wakeup.fileno())
+            self.__wakeup.close()
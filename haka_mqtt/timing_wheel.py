@@ -0,0 +1,246 @@
+"""A hierarchical timing wheel scheduler for processes hosting a very
+large number of reactors.
+
+Deadlines are rounded up to a whole number of ticks and placed into
+wheels of slots.  Adding, cancelling, and resetting a deadline are O(1)
+regardless of how many deadlines are outstanding.  Deadlines that are
+far in the future are placed on coarse wheels and cascaded down to
+finer wheels as their instants approach.
+
+Deadlines are never called early but may be called up to one tick
+late.
+"""
+
+from math import ceil, floor
+from itertools import count
+
+from haka_mqtt.scheduler import Deadline
+
+
+# Allowance for floating point error when converting instants to ticks.
+_TICK_EPSILON = 1e-6
+
+
+class _WheelEntry(object):
+    def __init__(self, instant, seq, scheduler, cb):
+        self.instant = instant
+        self.seq = seq
+        self.cb = cb
+        self.scheduler = scheduler
+        self.expired = False
+        self.tick = None
+        self.slot = None
+
+    def cancel(self):
+        if not self.expired:
+            self.expired = True
+            self.scheduler._remove(self)
+
+    def reset(self, duration):
+        if not self.expired:
+            self.scheduler._remove(self)
+        self.expired = False
+        self.instant = self.scheduler.instant() + duration
+        self.seq = self.scheduler._next_sequence()
+        self.scheduler._insert(self)
+
+
+class TimingWheelScheduler(object):
+    """A scheduler with the same interface as
+    :class:`haka_mqtt.scheduler.ClockScheduler` built on a hierarchical
+    timing wheel.
+
+    The default configuration has a 10ms tick and wheels of 256, 64,
+    64, and 64 slots covering about 47 days; deadlines beyond that are
+    parked in the outermost wheel and re-examined each time it turns.
+
+    Driving the scheduler with a :class:`haka_mqtt.clock.SettableClock`
+    makes it fully deterministic for testing.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    clock: object
+        Object with a `time` method returning the current instant (for
+        example :class:`haka_mqtt.clock.SystemClock`).
+    resolution: float
+        Duration of one tick; 0 < resolution.
+    wheel_sizes: iterable of int
+        Number of slots in each wheel from finest to coarsest.
+    """
+    def __init__(self, clock, resolution=0.01, wheel_sizes=(256, 64, 64, 64)):
+        assert resolution > 0
+        wheel_sizes = tuple(wheel_sizes)
+        assert len(wheel_sizes) >= 1
+        assert all(size >= 2 for size in wheel_sizes)
+
+        self.__clock = clock
+        self.__resolution = resolution
+        self.__origin = clock.time()
+        self.__tick = 0
+        self.__sizes = wheel_sizes
+        self.__wheels = [[set() for i in range(0, size)] for size in wheel_sizes]
+
+        # Span of one slot in each wheel measured in ticks.
+        self.__spans = []
+        span = 1
+        for size in wheel_sizes:
+            self.__spans.append(span)
+            span *= size
+
+        # Deadlines whose tick has already been processed.
+        self.__due = set()
+        self.__len = 0
+        self.__sequence = count()
+
+    @property
+    def resolution(self):
+        """float: duration of one tick."""
+        return self.__resolution
+
+    def instant(self):
+        """Current clock instant.
+
+        Returns
+        -------
+        float
+        """
+        return self.__clock.time()
+
+    def __tick_of(self, instant):
+        """Returns the last tick that has started at `instant`."""
+        return int(floor((instant - self.__origin) / self.__resolution + _TICK_EPSILON))
+
+    def __time_of(self, tick):
+        """Returns the instant at which `tick` begins."""
+        return self.__origin + tick * self.__resolution
+
+    def _next_sequence(self):
+        return next(self.__sequence)
+
+    def _insert(self, de):
+        """Places `de` in the slot appropriate to its instant."""
+        de.tick = int(ceil((de.instant - self.__origin) / self.__resolution - _TICK_EPSILON))
+        delta = de.tick - self.__tick
+        if delta <= 0:
+            slot = self.__due
+        else:
+            slot = None
+            for level, span in enumerate(self.__spans):
+                if delta < span * self.__sizes[level]:
+                    slot = self.__wheels[level][(de.tick // span) % self.__sizes[level]]
+                    break
+
+            if slot is None:
+                # Beyond the range of the outermost wheel; park the
+                # entry in the outermost slot that turns next.
+                level = len(self.__sizes) - 1
+                span = self.__spans[level]
+                slot = self.__wheels[level][(self.__tick // span + 1) % self.__sizes[level]]
+
+        slot.add(de)
+        de.slot = slot
+        self.__len += 1
+
+    def _remove(self, de):
+        de.slot.remove(de)
+        de.slot = None
+        self.__len -= 1
+
+    def __cascade(self, level, idx):
+        slot = self.__wheels[level][idx]
+        self.__wheels[level][idx] = set()
+        self.__len -= len(slot)
+        for de in slot:
+            self._insert(de)
+
+    def __advance(self, tick):
+        """Turns the wheels forward one tick to `tick` and moves the
+        deadlines that come due to `self.__due`."""
+        self.__tick = tick
+        for level in range(len(self.__sizes) - 1, 0, -1):
+            span = self.__spans[level]
+            if tick % span == 0:
+                self.__cascade(level, (tick // span) % self.__sizes[level])
+
+        idx = tick % self.__sizes[0]
+        slot = self.__wheels[0][idx]
+        if slot:
+            self.__wheels[0][idx] = set()
+            for de in slot:
+                de.slot = self.__due
+            self.__due.update(slot)
+
+    def add(self, duration, cb):
+        """Schedules `cb` to be called once `duration` has elapsed.
+
+        Parameters
+        ----------
+        duration: float
+        cb: callable()
+
+        Returns
+        -------
+        haka_mqtt.scheduler.Deadline
+        """
+        de = _WheelEntry(self.instant() + duration, self._next_sequence(), self, cb)
+        self._insert(de)
+        return Deadline(de)
+
+    def remaining(self):
+        """Duration remaining to next scheduled callback.  The value
+        returned may be shorter than the true duration when the next
+        deadline is on a coarse wheel; polling at that time cascades it
+        to a finer wheel.
+
+        Returns
+        -------
+        float or None
+        """
+        if self.__len == 0:
+            rv = None
+        elif self.__due:
+            rv = 0.
+        else:
+            # Slots on coarse wheels are examined as well as the finest
+            # since an entry placed on a coarse wheel some time ago may
+            # come due before one recently placed on a finer wheel.
+            next_tick = None
+            for level, span in enumerate(self.__spans):
+                size = self.__sizes[level]
+                first = self.__tick // span + 1
+                for n in range(first, first + size):
+                    if self.__wheels[level][n % size]:
+                        if next_tick is None or n * span < next_tick:
+                            next_tick = n * span
+                        break
+
+            rv = self.__time_of(next_tick) - self.instant()
+
+        return rv
+
+    def poll(self):
+        """Calls all callbacks awaiting execution to this point."""
+        while True:
+            now_tick = self.__tick_of(self.instant())
+            while self.__tick < now_tick:
+                if self.__len == len(self.__due):
+                    # Nothing on the wheels; jump straight to the present.
+                    self.__tick = now_tick
+                else:
+                    self.__advance(self.__tick + 1)
+
+            if not self.__due:
+                break
+
+            for de in sorted(self.__due, key=lambda de: (de.instant, de.seq)):
+                # Callbacks may cancel or reset entries that have not
+                # yet been called.
+                if de.slot is self.__due:
+                    self._remove(de)
+                    de.expired = True
+                    de.cb()
+
+    def __len__(self):
+        return self.__len
@@ -0,0 +1,90 @@
+import errno
+import fcntl
+import os
+
+
+class Wakeup(object):
+    """A file descriptor that another thread can make readable to wake a
+    thread blocked in select/epoll.
+
+    An eventfd is used where :func:`os.eventfd` is available (Linux,
+    Python 3.10 and later); elsewhere a non-blocking pipe is used.
+
+    Any number of calls to :meth:`wake` made before :meth:`drain` wake
+    the loop once.
+
+    .. versionadded:: 0.3.6
+
+    Parameters
+    ----------
+    eventfd: bool
+        When False a pipe is used even where an eventfd is available.
+    """
+    def __init__(self, eventfd=True):
+        self.__closed = False
+        if eventfd and hasattr(os, 'eventfd'):
+            self.__rd = self.__wd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        else:
+            self.__rd, self.__wd = os.pipe()
+            for fd in (self.__rd, self.__wd):
+                flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+                fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    @property
+    def eventfd(self):
+        """bool: True if an eventfd is used; False if a pipe is
+        used."""
+        return self.__rd == self.__wd
+
+    def fileno(self):
+        """int: file descriptor that becomes readable when
+        :meth:`wake` is called."""
+        return self.__rd
+
+    def wake(self):
+        """Makes :meth:`fileno` readable; may be called from any
+        thread."""
+        try:
+            if self.eventfd:
+                os.eventfd_write(self.__wd, 1)
+            else:
+                os.write(self.__wd, b'x')
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+            # Counter or pipe is full so the loop already has a wakeup
+            # pending.
+
+    def drain(self):
+        """Consumes all pending wakeups so that :meth:`fileno` is no
+        longer readable."""
+        if self.eventfd:
+            try:
+                # A single read resets the counter.
+                os.eventfd_read(self.__rd)
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+            return
+
+        while True:
+            try:
+                buf = os.read(self.__rd, 4096)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    break
+                raise
+            else:
+                if len(buf) < 4096:
+                    break
+
+    def closed(self):
+        """bool: True if the object has been closed; False otherwise."""
+        return self.__closed
+
+    def close(self):
+        if not self.__closed:
+            self.__closed = True
+            os.close(self.__rd)
+            if self.__wd != self.__rd:
+                os.close(self.__wd)
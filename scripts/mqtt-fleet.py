@@ -0,0 +1,119 @@
+#!/bin/env python
+from __future__ import print_function
+import logging
+import sys
+from argparse import ArgumentParser
+from time import time
+
+from haka_mqtt.frontends.fleet import FleetRunner, FleetClientConfig, FleetEvent
+from mqtt_codec.packet import MqttTopic
+
+
+class MqttFleetRunner(FleetRunner):
+    """Counts connection events as they are reported by workers."""
+    def __init__(self, num_workers):
+        FleetRunner.__init__(self, num_workers)
+        self.num_connacks = 0
+        self.num_connect_fails = 0
+        self.num_disconnects = 0
+        self.max_ack_latency = 0
+
+    def on_event(self, config, event, value):
+        """
+
+        Parameters
+        ----------
+        config: FleetClientConfig
+        event: FleetEvent
+        value: int
+        """
+        if event is FleetEvent.connack:
+            self.num_connacks += 1
+        elif event is FleetEvent.connect_fail:
+            self.num_connect_fails += 1
+        elif event is FleetEvent.disconnect:
+            self.num_disconnects += 1
+        elif event is FleetEvent.ack:
+            self.max_ack_latency = max(self.max_ack_latency, value)
+
+
+def create_parser():
+    """
+    Returns
+    -------
+    ArgumentParser
+    """
+    parser = ArgumentParser()
+    parser.add_argument("hostname")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--clients", type=int, default=1000, help="Number of simulated clients.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--clientid-prefix", default='haka-fleet-', help="Client ids are this prefix and an index.")
+    parser.add_argument("--keepalive", type=int, default=0,
+                        help="Launches keepalive pings after this many seconds without sending data.")
+    parser.add_argument("--publish-period", type=float, help="Seconds between publishes by each client.")
+    parser.add_argument("--qos", type=int, default=0, choices=(0, 1, 2), help="QoS of published messages.")
+    parser.add_argument("--payload-size", type=int, default=16, help="Size of published payloads in bytes.")
+    parser.add_argument("--topic0", "--t0", action="append", default=[], help="Subscribe to topic with max QoS=0.")
+    parser.add_argument("--topic1", "--t1", action="append", default=[], help="Subscribe to topic with max QoS=1.")
+    parser.add_argument("--topic2", "--t2", action="append", default=[], help="Subscribe to topic with max QoS=2.")
+    parser.add_argument("--duration", type=float, help="Seconds to run before stopping; runs forever by default.")
+    parser.add_argument("--report-period", type=float, default=5., help="Seconds between progress reports.")
+    return parser
+
+
+def main(args=sys.argv[1:]):
+    parser = create_parser()
+    ns = parser.parse_args(args)
+
+    logging.basicConfig(format='%(asctime)-15s %(message)s',
+                        level=logging.INFO,
+                        stream=sys.stdout)
+    log = logging.getLogger('haka')
+
+    topics = []
+    topics.extend(MqttTopic(topic, 0) for topic in ns.topic0)
+    topics.extend(MqttTopic(topic, 1) for topic in ns.topic1)
+    topics.extend(MqttTopic(topic, 2) for topic in ns.topic2)
+
+    endpoint = (ns.hostname, ns.port)
+    runner = MqttFleetRunner(ns.workers)
+    for i in range(0, ns.clients):
+        config = FleetClientConfig('{}{}'.format(ns.clientid_prefix, i), endpoint)
+        config.keepalive_period = ns.keepalive
+        config.topics = topics
+        config.publish_period = ns.publish_period
+        config.payload = b'x' * ns.payload_size
+        config.qos = ns.qos
+        runner.add(config)
+
+    start = time()
+    runner.start()
+    try:
+        next_report = start + ns.report_period
+        while ns.duration is None or time() - start < ns.duration:
+            runner.poll(0.1)
+            if time() >= next_report:
+                next_report += ns.report_period
+                metrics = runner.metrics()
+                log.info('%d/%d connected; %d connacks, %d connect failures, %d disconnects; '
+                         '%d published, %d acked (max %d ms), %d received.',
+                         metrics.num_connected,
+                         metrics.num_clients,
+                         runner.num_connacks,
+                         runner.num_connect_fails,
+                         runner.num_disconnects,
+                         metrics.num_published,
+                         metrics.num_acked,
+                         runner.max_ack_latency,
+                         metrics.num_received)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log.info('Stopping.')
+        runner.stop()
+        log.info('Stopped; %r.', runner.metrics())
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
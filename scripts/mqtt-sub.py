@@ -7,6 +7,7 @@ from argparse import ArgumentParser
 
 from haka_mqtt.frontends.poll import MqttPollClientProperties, MqttPollClient
 from haka_mqtt.reactor import ACTIVE_STATES
+from haka_mqtt.reconnect import ReconnectPolicy
 from mqtt_codec.packet import MqttTopic
 
 
@@ -34,8 +35,7 @@ class MqttSubClient(MqttPollClient):
         self.__req_queue = set()
         self.__ack_queue = set()
 
-        self.__reconnect_period = 10.
-        self.__reconnect_deadline = None
+        self.__reconnect_policy = ReconnectPolicy(self, self._scheduler, base_delay=1., max_delay=60.)
 
     def on_disconnect(self, reactor):
         """
@@ -44,9 +44,9 @@ class MqttSubClient(MqttPollClient):
         ----------
         reactor: Reactor
         """
-
-        assert self.__reconnect_deadline is None
-        self.__reconnect_deadline = self._scheduler.add(self.__reconnect_period, self.on_reconnect_timeout)
+        if reactor.error is not None:
+            # Only reconnect after a failure; not a deliberate stop.
+            self.__reconnect_policy.schedule()
 
     def on_connect_fail(self, reactor):
         """
@@ -55,20 +55,9 @@ class MqttSubClient(MqttPollClient):
         ----------
         reactor: Reactor
         """
-        assert self.__reconnect_deadline is None
-        self.__reconnect_deadline = self._scheduler.add(self.__reconnect_period, self.on_reconnect_timeout)
-
-    def on_reconnect_timeout(self):
-        """
-
-        Parameters
-        ----------
-        reactor: Reactor
-        """
-        self.__reconnect_deadline.cancel()
-        self.__reconnect_deadline = None
-
-        self.start()
+        if reactor.error is not None:
+            # Only reconnect after a failure; not a deliberate stop.
+            self.__reconnect_policy.schedule()
 
     def on_suback(self, reactor, p):
         """
@@ -88,6 +77,7 @@ class MqttSubClient(MqttPollClient):
         reactor: Reactor
         p: MqttConnack
         """
+        self.__reconnect_policy.on_connack()
         sub_ticket = self.subscribe(self.__topics)
         self.__req_queue.add(sub_ticket.packet_id)
 
@@ -104,6 +94,16 @@ class MqttSubClient(MqttPollClient):
     def start(self):
         super(type(self), self).start()
 
+    def stop(self):
+        """Cancels any scheduled reconnect then stops the client."""
+        self.__reconnect_policy.cancel()
+        super(type(self), self).stop()
+
+    def reconnect_scheduled(self):
+        """bool: True if the client will be restarted after a failure;
+        False otherwise."""
+        return self.__reconnect_policy.scheduled()
+
 
 def create_parser():
     """
@@ -116,7 +116,6 @@ def create_parser():
     parser.add_argument("port", type=int)
     parser.add_argument("--ssl", type=bool, help="Enable SSL/TLS encryption.")
     parser.add_argument("--clientid", help="Unique client id to use to connect to server.")
-    parser.add_argument("--keepalive", type=int, default=5*60*1000, help="Ensures bytes are sent to server at least")
     parser.add_argument("-v", "--verbosity", action="count", default=0, help="increase output verbosity")
     parser.add_argument("--topic0", "--t0", action="append", default=[], help="Subscribe to topic with max QoS=0.")
     parser.add_argument("--topic1", "--t1", action="append", default=[], help="Subscribe to topic with max QoS=1.")
@@ -166,8 +165,15 @@ def main(args=sys.argv[1:]):
                            ssl=ns.ssl)
     client.start()
 
-    while client.state in ACTIVE_STATES:
-        client.poll(5.)
+    try:
+        # Poll returns once the client is inactive so polling continues
+        # while a reconnect is scheduled.
+        while client.state in ACTIVE_STATES or client.reconnect_scheduled():
+            client.poll(5.)
+    except KeyboardInterrupt:
+        client.stop()
+        while client.state in ACTIVE_STATES:
+            client.poll(5.)
 
 
 if __name__ == '__main__':
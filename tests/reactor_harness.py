@@ -229,6 +229,7 @@ class TestReactor(unittest.TestCase):
         self.setup_logging()
 
         self.socket = Mock()
+        self.socket.pending.return_value = 0
         self.endpoint = ('test.mosquitto.org', 1883)
         self.name_resolver_future = DebugFuture()
         self.name_resolver_future.set_result([
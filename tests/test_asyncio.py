@@ -0,0 +1,155 @@
+import socket
+import unittest
+
+from mqtt_codec.packet import MqttConnack, ConnackResult, MqttPuback, MqttPublish
+
+from haka_mqtt.endpoints import EndpointList
+from haka_mqtt.frontends.poll import MqttPollClientProperties
+from haka_mqtt.reactor import SocketReactorError
+from tests.reactor_harness import buffer_packet
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+else:
+    from haka_mqtt.frontends.asyncio import (AsyncioScheduler, MqttAsyncioClient, ConnectFailReactorException,
+                                             PublishFailReactorException)
+
+
+@unittest.skipUnless(asyncio, 'asyncio requires Python 3.')
+class TestAsyncioScheduler(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.scheduler = AsyncioScheduler(self.loop)
+
+    def run_for(self, duration):
+        self.loop.run_until_complete(asyncio.sleep(duration))
+
+    def test_add_cancel_reset(self):
+        calls = []
+        d0 = self.scheduler.add(0.01, lambda: calls.append(0))
+        d1 = self.scheduler.add(0.02, lambda: calls.append(1))
+        self.assertEqual(2, len(self.scheduler))
+        self.assertTrue(0 < self.scheduler.remaining() <= 0.01)
+
+        d1.cancel()
+        self.assertTrue(d1.expired())
+        self.assertEqual(1, len(self.scheduler))
+        self.run_for(0.05)
+        self.assertEqual([0], calls)
+        self.assertTrue(d0.expired())
+        self.assertEqual(0, len(self.scheduler))
+        self.assertIsNone(self.scheduler.remaining())
+
+        d0.reset(0.01)
+        self.assertFalse(d0.expired())
+        self.run_for(0.05)
+        self.assertEqual([0, 0], calls)
+
+
+@unittest.skipUnless(asyncio, 'asyncio requires Python 3.')
+class TestMqttAsyncioClient(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.listener.setblocking(False)
+        self.addCleanup(self.listener.close)
+
+        properties = MqttPollClientProperties()
+        properties.host, properties.port = self.listener.getsockname()
+        properties.client_id = 'asyncio-client'
+        properties.ssl = False
+        self.client = MqttAsyncioClient(properties, loop=self.loop, log=None)
+
+    def wait(self, awaitable):
+        return self.loop.run_until_complete(asyncio.wait_for(awaitable, 5.))
+
+    def start_to_connected(self):
+        connected = self.client.connect()
+        server, addr = self.wait(self.loop.sock_accept(self.listener))
+        self.addCleanup(server.close)
+        server.setblocking(False)
+        self.assertTrue(self.wait(self.loop.sock_recv(server, 4096)))
+        self.wait(self.loop.sock_sendall(server, buffer_packet(MqttConnack(False, ConnackResult.accepted))))
+        self.wait(connected)
+        return server
+
+    def test_lifecycle(self):
+        connected = self.client.connect()
+        server, addr = self.wait(self.loop.sock_accept(self.listener))
+        self.addCleanup(server.close)
+        server.setblocking(False)
+        self.assertTrue(self.wait(self.loop.sock_recv(server, 4096)))
+        self.wait(self.loop.sock_sendall(server, buffer_packet(MqttConnack(False, ConnackResult.accepted))))
+        connack = self.wait(connected)
+        self.assertEqual(ConnackResult.accepted, connack.return_code)
+
+        # QoS=0 ticket completes once sent.
+        ticket = self.client.publish('topic', b'qos0', 0)
+        self.assertIs(ticket.ticket, self.wait(ticket))
+        self.assertTrue(self.wait(self.loop.sock_recv(server, 4096)))
+
+        # QoS=1 ticket completes on puback.
+        ticket = self.client.publish('topic', b'qos1', 1)
+        self.assertTrue(self.wait(self.loop.sock_recv(server, 4096)))
+        self.assertFalse(ticket.future.done())
+        self.wait(self.loop.sock_sendall(server, buffer_packet(MqttPuback(ticket.packet_id))))
+        self.assertIs(ticket.ticket, self.wait(ticket))
+
+        messages = self.client.messages()
+        self.wait(self.loop.sock_sendall(server, buffer_packet(MqttPublish(1, 'inbound', b'hello', False, 0, False))))
+        publish = self.wait(messages.__anext__())
+        self.assertEqual(b'hello', publish.payload)
+
+        disconnected = self.client.disconnect()
+        self.assertTrue(self.wait(self.loop.sock_recv(server, 4096)))
+        server.close()
+        self.wait(disconnected)
+        self.assertFalse(self.client.is_active())
+        self.assertRaises(StopAsyncIteration, self.wait, messages.__anext__())
+
+    def test_connect_fail(self):
+        self.listener.close()
+        with self.assertRaises(ConnectFailReactorException) as cm:
+            self.wait(self.client.connect())
+        self.assertIsInstance(cm.exception.error, SocketReactorError)
+        self.assertFalse(self.client.is_active())
+
+    def test_publish_fail(self):
+        server = self.start_to_connected()
+        messages = self.client.messages()
+        qos1 = self.client.publish('topic', b'qos1', 1)
+        qos2 = self.client.publish('topic', b'qos2', 2)
+        self.assertTrue(self.wait(self.loop.sock_recv(server, 4096)))
+
+        server.close()
+        self.assertRaises(StopAsyncIteration, self.wait, messages.__anext__())
+        self.assertFalse(self.client.is_active())
+        for ticket in (qos1, qos2):
+            with self.assertRaises(PublishFailReactorException) as cm:
+                self.wait(ticket)
+            self.assertIs(self.client.error, cm.exception.error)
+            self.assertIsNotNone(cm.exception.error)
+
+    def test_endpoints(self):
+        properties = MqttPollClientProperties()
+        properties.endpoints = EndpointList([self.listener.getsockname()])
+        properties.client_id = 'asyncio-client'
+        properties.ssl = False
+        properties.connect_timeout = 5.
+        properties.name_resolution_timeout = 5.
+        properties.happy_eyeballs_delay = 0.25
+        self.client = MqttAsyncioClient(properties, loop=self.loop, log=None)
+
+        server = self.start_to_connected()
+        disconnected = self.client.disconnect()
+        self.assertTrue(self.wait(self.loop.sock_recv(server, 4096)))
+        server.close()
+        self.wait(disconnected)
+        self.assertFalse(self.client.is_active())
@@ -0,0 +1,36 @@
+import unittest
+
+from haka_mqtt.clock import MonotonicClock, CachedClock, SettableClock
+
+
+class TestMonotonicClock(unittest.TestCase):
+    def test_non_decreasing(self):
+        clock = MonotonicClock()
+        t0 = clock.time()
+        for i in range(0, 1000):
+            t1 = clock.time()
+            self.assertGreaterEqual(t1, t0)
+            t0 = t1
+
+
+class TestCachedClock(unittest.TestCase):
+    def test_sample_release(self):
+        settable = SettableClock()
+        settable.set_time(10)
+        clock = CachedClock(settable)
+        self.assertEqual(10, clock.time())
+
+        # Without a sample the underlying clock is read.
+        settable.add_time(1)
+        self.assertEqual(11, clock.time())
+
+        self.assertEqual(11, clock.sample())
+        settable.add_time(1)
+        self.assertEqual(11, clock.time())
+
+        self.assertEqual(12, clock.sample())
+        settable.add_time(1)
+        self.assertEqual(12, clock.time())
+
+        clock.release()
+        self.assertEqual(13, clock.time())
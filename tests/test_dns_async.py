@@ -1,7 +1,116 @@
 import doctest
+import select
+import socket
+import threading
+import unittest
+from time import sleep
+
+from mock import Mock, patch
+
 import haka_mqtt.dns_async
+from haka_mqtt.dns_async import AsyncFutureDnsResolver
+
+
+_RESULT = [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', ('127.0.0.1', 1883))]
 
 
 def load_tests(loader, tests, ignore):
     tests.addTests(doctest.DocTestSuite(haka_mqtt.dns_async))
     return tests
+
+
+class TestAsyncFutureDnsResolverCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = []
+
+        def getaddrinfo(*args):
+            self.calls.append(args)
+            self.release.wait(5.)
+            return _RESULT
+
+        patcher = patch('socket.getaddrinfo', side_effect=getaddrinfo)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.resolver = AsyncFutureDnsResolver()
+        self.addCleanup(self.resolver.close)
+        self.addCleanup(self.release.set)
+
+    def poll_until_done(self, futures):
+        for i in range(0, 500):
+            if all(f.done() for f in futures):
+                break
+            self.resolver.poll()
+            sleep(0.01)
+
+    def test_coalesce(self):
+        futures = [self.resolver('localhost', 1883) for i in range(0, 3)]
+        other = self.resolver('localhost', 8883)
+        callback = Mock()
+        futures[0].add_done_callback(callback)
+
+        futures[1].cancel()
+        self.release.set()
+        self.poll_until_done(futures + [other])
+
+        self.assertEqual([('localhost', 1883, 0, 0, 0, 0), ('localhost', 8883, 0, 0, 0, 0)], self.calls)
+        callback.assert_called_once_with(futures[0])
+        self.assertTrue(futures[1].cancelled())
+        self.assertIsNone(futures[1].result(timeout=0))
+        for future in (futures[0], futures[2], other):
+            self.assertFalse(future.cancelled())
+            self.assertEqual(_RESULT, future.result(timeout=0))
+            self.assertIsNone(future.exception(timeout=0))
+
+        # The query is no longer in flight so a new one is made.
+        future = self.resolver('localhost', 1883)
+        self.poll_until_done([future])
+        self.assertEqual(3, len(self.calls))
+
+    def test_cancel_all(self):
+        blocker = self.resolver('blocker', 1883)
+        futures = [self.resolver('localhost', 1883) for i in range(0, 2)]
+        for future in futures:
+            self.assertTrue(future.cancel())
+
+        # A new lookup is not coalesced with the cancelled query.
+        future = self.resolver('localhost', 1883)
+        self.release.set()
+        self.poll_until_done([blocker, future])
+        self.assertEqual(_RESULT, future.result(timeout=0))
+        # The cancelled query is skipped by the worker.
+        self.assertEqual(['blocker', 'localhost'], [c[0] for c in self.calls])
+
+
+class TestAsyncFutureDnsResolverPoll(unittest.TestCase):
+    def test_batch(self):
+        num_names = 1000
+        all_queued = threading.Event()
+
+        def getaddrinfo(host, *args):
+            if host == 'barrier':
+                # The worker queues each completed lookup before starting
+                # the next so every other lookup is on the completion
+                # queue.
+                all_queued.set()
+            return _RESULT
+
+        with patch('socket.getaddrinfo', side_effect=getaddrinfo):
+            with AsyncFutureDnsResolver() as resolver:
+                futures = [resolver('host-{}'.format(i), 1883) for i in range(0, num_names)]
+                resolver('barrier', 1883)
+                self.assertTrue(all_queued.wait(5.))
+
+                num_iterations = 0
+                while not all(f.done() for f in futures):
+                    rlist, wlist, xlist = select.select([resolver.read_fd()], [], [], 5.)
+                    self.assertTrue(rlist)
+                    resolver.poll()
+                    num_iterations += 1
+
+                # One readiness event completes every finished lookup.
+                self.assertEqual(1, num_iterations)
+
+        for future in futures:
+            self.assertEqual(_RESULT, future.result(timeout=0))
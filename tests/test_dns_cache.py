@@ -0,0 +1,128 @@
+import doctest
+import socket
+import unittest
+
+import haka_mqtt.dns_cache
+from haka_mqtt.dns_async import _Future
+from haka_mqtt.dns_cache import CachingDnsResolver
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(haka_mqtt.dns_cache))
+    return tests
+
+
+class _Clock(object):
+    def __init__(self):
+        self.t = 0.
+
+    def time(self):
+        return self.t
+
+
+_RESULT = [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', ('127.0.0.1', 1883))]
+
+
+class _Resolver(object):
+    def __init__(self):
+        self.futures = []
+
+    def __call__(self, host, port, family=0, socktype=0, proto=0, flags=0):
+        future = _Future(self.lookup, host)
+        self.futures.append(future)
+        return future
+
+    def lookup(self, host):
+        if host == 'unknown':
+            raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+        elif host == 'error':
+            raise ValueError()
+        return _RESULT
+
+    def complete(self):
+        for future in self.futures:
+            future._work()
+            future._notify()
+        self.futures = []
+
+
+class TestCachingDnsResolver(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.wrapped = _Resolver()
+        self.resolver = CachingDnsResolver(self.wrapped, ttl=60., negative_ttl=5., max_entries=2, clock=self.clock)
+
+    def lookup(self, host, port=1883):
+        future = self.resolver(host, port)
+        self.wrapped.complete()
+        return future
+
+    def test_positive(self):
+        future = self.lookup('host')
+        self.assertEqual(_RESULT, future.result(timeout=0))
+        self.assertEqual((0, 1), (self.resolver.hits, self.resolver.misses))
+
+        self.clock.t = 59.
+        future = self.resolver('host', 1883)
+        self.assertTrue(future.done())
+        self.assertEqual(_RESULT, future.result(timeout=0))
+        self.assertIsNone(future.exception(timeout=0))
+        self.assertEqual((1, 1), (self.resolver.hits, self.resolver.misses))
+
+        # Different parameters are a different entry.
+        self.lookup('host', 8883)
+        self.assertEqual((1, 2), (self.resolver.hits, self.resolver.misses))
+
+        self.clock.t = 60.
+        self.lookup('host')
+        self.assertEqual((1, 3), (self.resolver.hits, self.resolver.misses))
+
+    def test_negative(self):
+        future = self.lookup('unknown')
+        self.assertIsInstance(future.exception(timeout=0), socket.gaierror)
+
+        self.clock.t = 4.
+        future = self.resolver('unknown', 1883)
+        self.assertTrue(future.done())
+        self.assertIsNone(future.result(timeout=0))
+        self.assertIsInstance(future.exception(timeout=0), socket.gaierror)
+        self.assertEqual((1, 1), (self.resolver.hits, self.resolver.misses))
+
+        self.clock.t = 5.
+        self.lookup('unknown')
+        self.assertEqual((1, 2), (self.resolver.hits, self.resolver.misses))
+
+    def test_not_cached(self):
+        self.lookup('error')
+        self.assertEqual(0, len(self.resolver))
+
+        future = self.resolver('host', 1883)
+        future.cancel()
+        self.wrapped.futures = []
+        self.assertEqual(0, len(self.resolver))
+
+    def test_lru_eviction(self):
+        self.lookup('a')
+        self.lookup('b')
+        # Touching 'a' makes 'b' the least recently used entry.
+        self.lookup('a')
+        self.lookup('c')
+        self.assertEqual(2, len(self.resolver))
+
+        self.lookup('a')
+        self.lookup('c')
+        self.assertEqual(3, self.resolver.hits)
+        self.lookup('b')
+        self.assertEqual(4, self.resolver.misses)
+
+    def test_invalidate(self):
+        self.lookup('a')
+        self.lookup('a', 8883)
+        self.assertEqual(2, self.resolver.invalidate('a'))
+        self.assertEqual(0, len(self.resolver))
+
+        self.lookup('a')
+        self.lookup('b')
+        self.assertEqual(0, self.resolver.invalidate('c'))
+        self.assertEqual(2, self.resolver.invalidate())
+        self.assertEqual(0, len(self.resolver))
@@ -0,0 +1,76 @@
+import unittest
+
+from haka_mqtt.endpoints import EndpointList, EndpointPolicy
+
+
+A = ('a.example.com', 1883)
+B = ('b.example.com', 1883)
+C = ('c.example.com', 8883)
+
+
+class TestEndpointList(unittest.TestCase):
+    def test_sticky(self):
+        endpoints = EndpointList([A, B, C], cool_down=10., max_cool_down=30.)
+        self.assertEqual(A, endpoints.select(0))
+        self.assertEqual(A, endpoints.select(0))
+
+        endpoints.on_failure(A, 0)
+        self.assertEqual(B, endpoints.select(0))
+        self.assertEqual(B, endpoints.select(9.9))
+        # Primary is used again once its cool-down ends.
+        self.assertEqual(A, endpoints.select(10))
+
+        # Consecutive failures double the cool-down up to the maximum.
+        endpoints.on_failure(A, 10)
+        self.assertEqual(30., endpoints.stats(A).cool_down_end)
+        endpoints.on_failure(A, 30)
+        self.assertEqual(60., endpoints.stats(A).cool_down_end)
+        self.assertEqual(3, endpoints.stats(A).consecutive_failures)
+
+        endpoints.on_success(A, 0.5)
+        self.assertEqual(0, endpoints.stats(A).consecutive_failures)
+        self.assertEqual(A, endpoints.select(30))
+
+    def test_round_robin(self):
+        endpoints = EndpointList([A, B, C], policy=EndpointPolicy.round_robin)
+        self.assertEqual([A, B, C, A], [endpoints.select(0) for i in range(0, 4)])
+
+        endpoints.on_failure(C, 0)
+        self.assertEqual([B, A, B], [endpoints.select(0) for i in range(0, 3)])
+
+    def test_lowest_latency(self):
+        endpoints = EndpointList([A, B, C], policy=EndpointPolicy.lowest_latency, health_alpha=0.5)
+
+        # Unmeasured endpoints are probed in list order.
+        self.assertEqual(A, endpoints.select(0))
+        endpoints.on_success(A, 0.3)
+        self.assertEqual(B, endpoints.select(0))
+        endpoints.on_success(B, 0.1)
+        self.assertEqual(C, endpoints.select(0))
+        endpoints.on_success(C, 0.2)
+        self.assertEqual(B, endpoints.select(0))
+
+        # Latency is a moving average.
+        endpoints.on_success(B, 0.5)
+        self.assertAlmostEqual(0.3, endpoints.stats(B).latency)
+        self.assertEqual(C, endpoints.select(0))
+
+        # A failure lowers health which still penalizes the endpoint's
+        # latency after its cool-down.
+        endpoints.on_failure(C, 0)
+        self.assertEqual(0.5, endpoints.stats(C).health)
+        self.assertEqual(A, endpoints.select(0))
+        self.assertEqual(A, endpoints.select(1000))
+
+    def test_all_cooling_down(self):
+        endpoints = EndpointList([A, B], cool_down=10.)
+        endpoints.on_failure(A, 5)
+        endpoints.on_failure(B, 0)
+        self.assertEqual(B, endpoints.select(1))
+
+    def test_stats(self):
+        endpoints = EndpointList([A, B])
+        self.assertEqual(2, len(endpoints))
+        self.assertEqual([A, B], [stats.endpoint for stats in endpoints])
+        self.assertRaises(KeyError, endpoints.stats, C)
+        repr(endpoints.stats(A))
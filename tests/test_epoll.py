@@ -0,0 +1,220 @@
+import errno
+import select
+import socket
+import unittest
+
+from mqtt_codec.packet import MqttConnack, ConnackResult, MqttDisconnect
+
+from haka_mqtt.clock import MonotonicClock
+from haka_mqtt.dns_sync import SynchronousFutureDnsResolver
+from haka_mqtt.reactor import ReactorProperties, Reactor, ReactorState, SocketState
+from haka_mqtt.scheduler import ClockScheduler
+from haka_mqtt.socket_factory import SocketFactory
+from tests.reactor_harness import buffer_packet
+
+if hasattr(select, 'epoll'):
+    from haka_mqtt.frontends.epoll import EpollSelector
+
+
+class _SocketReactor(object):
+    """Stands in for a reactor; reads at most `read_size` bytes from
+    `sock` per call to `read`."""
+    def __init__(self, sock, read_size=1):
+        self.sock = sock
+        self.read_size = read_size
+        self.num_reads = 0
+        self.num_writes = 0
+        self.wants_write = False
+
+    def read(self):
+        self.num_reads += 1
+        try:
+            return len(self.sock.recv(self.read_size))
+        except socket.error as e:
+            if e.errno == errno.EWOULDBLOCK:
+                return 0
+            raise
+
+    def write(self):
+        self.num_writes += 1
+
+    def want_write(self):
+        return self.wants_write
+
+
+@unittest.skipUnless(hasattr(select, 'epoll'), 'select.epoll is not available')
+class TestEpollSelector(unittest.TestCase):
+    def setUp(self):
+        self.a, self.b = socket.socketpair()
+        self.a.setblocking(False)
+        self.reactor = _SocketReactor(self.a)
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+
+    def selector(self, **kwargs):
+        selector = EpollSelector(**kwargs)
+        self.addCleanup(selector.close)
+        return selector
+
+    def test_read_level_triggered(self):
+        selector = self.selector()
+        selector.add_read(self.a, self.reactor)
+        self.assertEqual(1, len(selector))
+
+        selector.select(0)
+        self.assertEqual(0, self.reactor.num_reads)
+
+        self.b.send(b'xy')
+        selector.select(0)
+        self.assertEqual(1, self.reactor.num_reads)
+        selector.select(0)
+        self.assertEqual(2, self.reactor.num_reads)
+        selector.select(0)
+        self.assertEqual(2, self.reactor.num_reads)
+
+        selector.del_read(self.a, self.reactor)
+        self.assertEqual(0, len(selector))
+        self.b.send(b'z')
+        selector.select(0)
+        self.assertEqual(2, self.reactor.num_reads)
+
+    def test_read_edge_triggered(self):
+        selector = self.selector(edge_triggered=True)
+        self.assertTrue(selector.edge_triggered)
+        selector.add_read(self.a, self.reactor)
+
+        # Each read that returns data re-arms the registration so that
+        # bytes left in the socket are reported again.
+        self.b.send(b'xy')
+        selector.select(0)
+        self.assertEqual(1, self.reactor.num_reads)
+        selector.select(0)
+        self.assertEqual(2, self.reactor.num_reads)
+        selector.select(0)
+        self.assertEqual(2, self.reactor.num_reads)
+
+        self.b.send(b'z')
+        selector.select(0)
+        self.assertEqual(3, self.reactor.num_reads)
+
+    def test_write(self):
+        selector = self.selector()
+        selector.add_write(self.a, self.reactor)
+        selector.select(0)
+        self.assertEqual(1, self.reactor.num_writes)
+        self.assertEqual(0, self.reactor.num_reads)
+
+        selector.add_read(self.a, self.reactor)
+        self.assertEqual(1, len(selector))
+        selector.del_write(self.a, self.reactor)
+        self.assertEqual(1, len(selector))
+        selector.select(0)
+        self.assertEqual(1, self.reactor.num_writes)
+
+        selector.del_read(self.a, self.reactor)
+        self.assertEqual(0, len(selector))
+
+    def test_write_edge_triggered(self):
+        selector = self.selector(edge_triggered=True)
+        selector.add_write(self.a, self.reactor)
+        selector.select(0)
+        self.assertEqual(1, self.reactor.num_writes)
+        selector.select(0)
+        self.assertEqual(1, self.reactor.num_writes)
+
+        # Reactor still has bytes to write after being called.
+        self.reactor.wants_write = True
+        selector.del_write(self.a, self.reactor)
+        selector.add_write(self.a, self.reactor)
+        selector.select(0)
+        self.assertEqual(2, self.reactor.num_writes)
+        selector.select(0)
+        self.assertEqual(3, self.reactor.num_writes)
+
+        selector.del_write(self.a, self.reactor)
+
+    def test_handler_unregisters_other(self):
+        c, d = socket.socketpair()
+        self.addCleanup(c.close)
+        self.addCleanup(d.close)
+        selector = self.selector()
+        other = _SocketReactor(c)
+
+        class Unregistering(_SocketReactor):
+            def read(self):
+                selector.del_read(c, other)
+                return _SocketReactor.read(self)
+
+        reactor = Unregistering(self.a)
+        selector.add_read(self.a, reactor)
+        selector.add_read(c, other)
+        self.b.send(b'x')
+        d.send(b'x')
+        selector.select(0)
+        self.assertEqual(1, reactor.num_reads)
+        self.assertEqual(0, other.num_reads)
+
+    def test_callback_read(self):
+        calls = []
+        selector = self.selector(edge_triggered=True)
+        selector.add_callback_read(self.a.fileno(), lambda: calls.append(self.a.recv(1)))
+        self.b.send(b'xy')
+        selector.select(0)
+        selector.select(0)
+        self.assertEqual([b'x', b'y'], calls)
+        selector.del_callback_read(self.a.fileno())
+        self.assertEqual(0, len(selector))
+
+
+@unittest.skipUnless(hasattr(select, 'epoll'), 'select.epoll is not available')
+class TestEpollSelectorReactor(unittest.TestCase):
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.addCleanup(self.listener.close)
+
+    def loop_until(self, selector, scheduler, condition):
+        for i in range(0, 100):
+            if condition():
+                break
+            selector.select(0.05)
+            scheduler.poll()
+        self.assertTrue(condition())
+
+    def connect_and_stop(self, edge_triggered):
+        selector = EpollSelector(edge_triggered=edge_triggered)
+        self.addCleanup(selector.close)
+        scheduler = ClockScheduler(MonotonicClock())
+
+        p = ReactorProperties()
+        p.socket_factory = SocketFactory()
+        p.name_resolver = SynchronousFutureDnsResolver()
+        p.scheduler = scheduler
+        p.selector = selector
+        p.endpoint = self.listener.getsockname()
+        p.client_id = 'client'
+        reactor = Reactor(p, log=None)
+
+        reactor.start()
+        self.loop_until(selector, scheduler, lambda: reactor.sock_state is SocketState.connected)
+        server, addr = self.listener.accept()
+        self.addCleanup(server.close)
+        self.assertTrue(server.recv(4096))
+        server.send(buffer_packet(MqttConnack(False, ConnackResult.accepted)))
+        self.loop_until(selector, scheduler, lambda: reactor.state is ReactorState.started)
+
+        reactor.stop()
+        self.loop_until(selector, scheduler, lambda: not reactor.want_write())
+        self.assertEqual(buffer_packet(MqttDisconnect()), server.recv(4096))
+        server.close()
+        self.loop_until(selector, scheduler, lambda: reactor.state is ReactorState.stopped)
+        self.assertEqual(0, len(selector))
+
+    def test_level_triggered(self):
+        self.connect_and_stop(False)
+
+    def test_edge_triggered(self):
+        self.connect_and_stop(True)
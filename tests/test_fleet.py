@@ -0,0 +1,226 @@
+import errno
+import select
+import socket
+import threading
+import unittest
+from time import sleep, time
+
+from mqtt_codec.io import BytesReader, UnderflowDecodeError
+from mqtt_codec.packet import (
+    MqttConnack,
+    ConnackResult,
+    MqttControlPacketType,
+    MqttFixedHeader,
+    MqttPublish,
+    MqttPuback,
+)
+
+from haka_mqtt.frontends.fleet import (
+    FleetRunner,
+    FleetClientConfig,
+    FleetEvent,
+    FleetMetrics,
+    _encode_events,
+    _decode_events,
+)
+from tests.reactor_harness import buffer_packet
+
+
+class TestEventEncoding(unittest.TestCase):
+    def test_round_trip(self):
+        events = [
+            (0, FleetEvent.connack, 12),
+            (99999, FleetEvent.ack, 3),
+            (7, FleetEvent.disconnect, 0),
+        ]
+        frame = _encode_events(events)
+        self.assertEqual(1 + 9 * len(events), len(frame))
+        self.assertEqual(events, _decode_events(frame))
+
+    def test_value_saturates(self):
+        frame = _encode_events([(0, FleetEvent.ack, 2**40)])
+        self.assertEqual([(0, FleetEvent.ack, 2**32 - 1)], _decode_events(frame))
+
+    def test_empty(self):
+        self.assertEqual([], _decode_events(_encode_events([])))
+
+
+class _LoopbackServer(object):
+    """Answers every connection with a connack then discards whatever
+    is received; when `puback` is True QoS=1 publishes are answered
+    with pubacks."""
+    def __init__(self, puback=False):
+        self.puback = puback
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(64)
+        self.__stopping = False
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+
+    def endpoint(self):
+        return self.listener.getsockname()
+
+    def start(self):
+        self.__thread.start()
+
+    def close(self):
+        self.__stopping = True
+        self.__thread.join()
+        self.listener.close()
+
+    def __run(self):
+        connack = buffer_packet(MqttConnack(False, ConnackResult.accepted))
+        conns = {}
+        while not self.__stopping:
+            rlist, wlist, xlist = select.select([self.listener] + list(conns.keys()), [], [], 0.05)
+            for sock in rlist:
+                if sock is self.listener:
+                    conn, addr = self.listener.accept()
+                    conns[conn] = False
+                    continue
+
+                try:
+                    buf = sock.recv(4096)
+                except socket.error as e:
+                    if e.errno != errno.ECONNRESET:
+                        raise
+                    buf = b''
+
+                if not buf:
+                    del conns[sock]
+                    sock.close()
+                    continue
+                elif conns[sock] is False:
+                    conns[sock] = bytearray()
+                    sock.sendall(connack)
+                    continue
+
+                if self.puback:
+                    conns[sock].extend(buf)
+                    replies = self.__pubacks(conns[sock])
+                    if replies:
+                        sock.sendall(replies)
+
+        for sock in conns:
+            sock.close()
+
+    def __pubacks(self, buf):
+        """Consumes whole packets from `buf` and returns pubacks for the
+        QoS=1 publishes among them."""
+        replies = b''
+        while True:
+            try:
+                num_header_bytes, header = MqttFixedHeader.decode(BytesReader(bytes(buf)))
+            except UnderflowDecodeError:
+                break
+            packet_end = num_header_bytes + header.remaining_len
+            if len(buf) < packet_end:
+                break
+
+            if header.packet_type is MqttControlPacketType.publish:
+                body = bytes(buf[num_header_bytes:packet_end])
+                num_bytes, publish = MqttPublish.decode_body(header, BytesReader(body))
+                if publish.qos == 1:
+                    replies += buffer_packet(MqttPuback(publish.packet_id))
+            del buf[0:packet_end]
+
+        return replies
+
+
+class _RecordingFleetRunner(FleetRunner):
+    def __init__(self, num_workers, flush_period=0.05):
+        FleetRunner.__init__(self, num_workers, flush_period=flush_period, stop_timeout=1.)
+        self.events = []
+
+    def on_event(self, config, event, value):
+        self.events.append((config.client_id, event))
+
+
+class TestFleetRunner(unittest.TestCase):
+    def poll_until(self, runner, condition):
+        end = time() + 10.
+        while not condition() and time() < end:
+            runner.poll(0.05)
+        self.assertTrue(condition())
+
+    def test_run(self):
+        server = _LoopbackServer()
+        self.addCleanup(server.close)
+
+        num_clients = 6
+        runner = _RecordingFleetRunner(2)
+        for i in range(0, num_clients):
+            config = FleetClientConfig('fleet-{}'.format(i), server.endpoint())
+            config.publish_period = 0.05
+            self.assertEqual(i % 2, runner.add(config))
+        self.assertEqual(num_clients, len(runner))
+
+        # Fork workers before starting the server thread.
+        runner.start()
+        self.addCleanup(runner.stop)
+        server.start()
+        self.assertTrue(runner.is_running())
+
+        self.poll_until(runner, lambda: len([e for c, e in runner.events if e is FleetEvent.connack]) == num_clients)
+        self.assertEqual(set('fleet-{}'.format(i) for i in range(0, num_clients)),
+                         set(c for c, e in runner.events))
+        self.poll_until(runner, lambda: runner.metrics().num_connected == num_clients
+                        and runner.metrics().num_published > 0)
+
+        metrics = runner.worker_metrics()
+        self.assertEqual([3, 3], [m.num_clients for m in metrics])
+
+        runner.stop()
+        self.assertFalse(runner.is_running())
+        self.assertEqual(0, runner.metrics().num_connected)
+
+    def test_flood_while_adding(self):
+        server = _LoopbackServer(puback=True)
+        self.addCleanup(server.close)
+
+        def config(i):
+            rv = FleetClientConfig('fleet-{}'.format(i), server.endpoint())
+            rv.publish_period = 0.01
+            rv.qos = 1
+            return rv
+
+        num_flooders = 20
+        # Frequent flushes fill the report pipe quickly.
+        runner = _RecordingFleetRunner(1, flush_period=0.001)
+        for i in range(0, num_flooders):
+            runner.add(config(i))
+        runner.start()
+        self.addCleanup(runner.stop)
+        server.start()
+        self.poll_until(runner, lambda: runner.metrics().num_connected == num_flooders)
+
+        # Acks fill the report pipe while the parent is not reading;
+        # adding clients must not block on the worker.
+        sleep(1.)
+        num_clients = 2000
+
+        def add():
+            for i in range(num_flooders, num_clients):
+                c = config(i)
+                c.endpoint = ('127.0.0.1', 1)
+                c.publish_period = None
+                c.payload = b'x' * 1024
+                runner.add(c)
+
+        thread = threading.Thread(target=add)
+        thread.daemon = True
+        thread.start()
+        thread.join(10.)
+        self.assertFalse(thread.is_alive())
+
+        self.poll_until(runner, lambda: runner.metrics().num_clients == num_clients)
+        self.assertTrue(len([e for c, e in runner.events if e is FleetEvent.ack]) > 0)
+        runner.stop()
+        self.assertFalse(runner.is_running())
+
+
+class TestFleetMetrics(unittest.TestCase):
+    def test_add(self):
+        self.assertEqual(FleetMetrics(2, 2, 4, 6, 8, 10),
+                         FleetMetrics(1, 1, 2, 3, 4, 5) + FleetMetrics(1, 1, 2, 3, 4, 5))
@@ -0,0 +1,88 @@
+import doctest
+import socket
+import unittest
+
+from mqtt_codec.packet import MqttConnack, ConnackResult, MqttDisconnect
+
+import haka_mqtt.frontends.hub
+from haka_mqtt.frontends.hub import ReactorHub
+from haka_mqtt.reactor import Reactor, ReactorState
+from tests.reactor_harness import buffer_packet
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(haka_mqtt.frontends.hub))
+    return tests
+
+
+class TestReactorHub(unittest.TestCase):
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(8)
+        self.addCleanup(self.listener.close)
+
+        self.hub = ReactorHub()
+        self.addCleanup(self.hub.close)
+
+    def poll_until(self, condition):
+        for i in range(0, 100):
+            if condition():
+                break
+            self.hub.poll(0.05)
+        self.assertTrue(condition())
+
+    def test_run(self):
+        num_reactors = 3
+        reactors = []
+        for i in range(0, num_reactors):
+            p = self.hub.reactor_properties()
+            p.endpoint = self.listener.getsockname()
+            p.client_id = 'client-{}'.format(i)
+            reactors.append(self.hub.add(Reactor(p, log=None)))
+        self.assertEqual(num_reactors, len(self.hub))
+        self.assertEqual(set(reactors), set(self.hub.reactors()))
+        self.assertFalse(self.hub.is_active())
+
+        for reactor in reactors:
+            reactor.start()
+        self.assertTrue(self.hub.is_active())
+
+        servers = []
+        for i in range(0, num_reactors):
+            self.poll_until(lambda: any(r.want_read() for r in reactors))
+            server, addr = self.listener.accept()
+            self.addCleanup(server.close)
+            servers.append(server)
+
+        self.poll_until(lambda: all(not r.want_write() for r in reactors))
+        for server in servers:
+            self.assertTrue(server.recv(4096))
+            server.send(buffer_packet(MqttConnack(False, ConnackResult.accepted)))
+        self.poll_until(lambda: all(r.state is ReactorState.started for r in reactors))
+
+        for reactor in reactors:
+            reactor.stop()
+        self.poll_until(lambda: all(not r.want_write() for r in reactors))
+        for server in servers:
+            self.assertEqual(buffer_packet(MqttDisconnect()), server.recv(4096))
+            server.close()
+
+        self.hub.run(period=5.)
+        self.assertFalse(self.hub.is_active())
+        for reactor in reactors:
+            self.assertEqual(ReactorState.stopped, reactor.state)
+            self.hub.remove(reactor)
+        self.assertEqual(0, len(self.hub))
+
+    def test_poll_period(self):
+        self.hub.poll(0.)
+        self.hub.poll(0.01)
+        self.assertEqual(0, len(self.hub.scheduler))
+        self.assertRaises(KeyError, self.hub.remove, Reactor(self.reactor_properties(), log=None))
+
+    def reactor_properties(self):
+        p = self.hub.reactor_properties()
+        p.endpoint = self.listener.getsockname()
+        p.client_id = 'client'
+        return p
@@ -1,3 +1,4 @@
+import random
 import unittest
 
 from haka_mqtt.exception import PacketIdReactorException
@@ -43,3 +44,58 @@ class TestPacketIdGenerator(unittest.TestCase):
             gen.release(i)
             self.assertEqual(i-1, len(gen))
 
+    def test_cyclic_reuse(self):
+        gen = PacketIdGenerator()
+        self.assertEqual(1, gen.acquire())
+        gen.release(1)
+        self.assertEqual(2, gen.acquire())
+
+        # Consume the remainder of the id space except for 1.
+        for i in range(3, PacketIdGenerator.id_stop()):
+            self.assertEqual(i, gen.acquire())
+
+        # Wraps to the only free id.
+        self.assertEqual(1, gen.acquire())
+        self.assertRaises(PacketIdReactorException, gen.acquire)
+
+        gen.release(200)
+        gen.release(100)
+        self.assertEqual(100, gen.acquire())
+        self.assertEqual(200, gen.acquire())
+
+    def test_initial_ids(self):
+        gen = PacketIdGenerator([1, 2, 5])
+        self.assertEqual(3, len(gen))
+        self.assertEqual([1, 2, 5], list(gen))
+        self.assertEqual(3, gen.acquire())
+        self.assertEqual(4, gen.acquire())
+        self.assertEqual(6, gen.acquire())
+
+    def test_release_unacquired(self):
+        gen = PacketIdGenerator()
+        self.assertRaises(KeyError, gen.release, 1)
+        self.assertRaises(KeyError, gen.release, 0)
+        gen.acquire()
+        gen.release(1)
+        self.assertRaises(KeyError, gen.release, 1)
+
+    def test_matches_linear_scan(self):
+        rng = random.Random(0)
+        gen = PacketIdGenerator()
+        consumed = set()
+        next_id = 1
+        id_stop = PacketIdGenerator.id_stop()
+
+        for i in range(0, 50000):
+            if consumed and (len(consumed) == id_stop - 1 or rng.random() < 0.45):
+                gen.release(consumed.pop())
+            else:
+                while next_id in consumed:
+                    next_id = next_id % (id_stop - 1) + 1
+                expected = next_id
+                next_id = next_id % (id_stop - 1) + 1
+                consumed.add(expected)
+                self.assertEqual(expected, gen.acquire())
+            self.assertEqual(len(consumed), len(gen))
+
+        self.assertEqual(sorted(consumed), list(gen))
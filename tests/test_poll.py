@@ -0,0 +1,168 @@
+import socket
+import ssl
+import unittest
+
+from mqtt_codec.packet import (
+    MqttConnack,
+    ConnackResult,
+    MqttPuback,
+    MqttPubrec,
+    MqttPubrel,
+    MqttPubcomp,
+)
+
+from haka_mqtt.endpoints import EndpointList
+from haka_mqtt.frontends.poll import MqttPollClient, MqttPollClientProperties, BlockingMqttClient
+from haka_mqtt.reactor import ReactorState, ConnectTimeoutReactorError, SocketState
+from tests.reactor_harness import buffer_packet
+
+
+class TestMqttPollClientWaitAll(unittest.TestCase):
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.listener.settimeout(5.)
+        self.addCleanup(self.listener.close)
+
+        properties = MqttPollClientProperties()
+        properties.host, properties.port = self.listener.getsockname()
+        properties.client_id = 'poll-client'
+        properties.ssl = False
+        self.client = MqttPollClient(properties, log=None)
+        self.addCleanup(self.client.close)
+
+    def recv_until(self, server, expected):
+        buf = b''
+        while not buf.endswith(expected):
+            chunk = server.recv(4096)
+            self.assertTrue(chunk)
+            buf += chunk
+
+    def start_to_connected(self, expected=None):
+        """Starts the client and accepts its connection.  When
+        `expected` is not None the bytes received up to connack must end
+        with it."""
+        self.client.start()
+        # Name resolution happens on a worker thread so the client is
+        # polled until it connects.
+        self.listener.settimeout(0.05)
+        for i in range(0, 100):
+            self.client.poll(0.05)
+            try:
+                server, addr = self.listener.accept()
+                break
+            except socket.timeout:
+                pass
+        else:
+            self.fail('Client did not connect.')
+        self.addCleanup(server.close)
+        server.settimeout(5.)
+        self.client.poll(0.1)
+        if expected is None:
+            self.assertTrue(server.recv(4096))
+        else:
+            self.recv_until(server, expected)
+        server.sendall(buffer_packet(MqttConnack(False, ConnackResult.accepted)))
+        return server
+
+    def test_wait_all(self):
+        server = self.start_to_connected()
+        tickets = [self.client.publish('topic', b'payload', 0),
+                   self.client.publish('topic', b'payload', 1)]
+        self.assertFalse(self.client.wait_all(tickets, timeout=0.2))
+        self.assertTrue(tickets[0].done())
+        self.assertFalse(tickets[1].done())
+
+        server.sendall(buffer_packet(MqttPuback(tickets[1].packet_id)))
+        self.assertTrue(self.client.wait_all(tickets, timeout=5.))
+        self.assertTrue(tickets[1].done())
+
+        # Done tickets return immediately.
+        self.assertTrue(self.client.wait_all(tickets))
+
+    def test_wait_all_qos2_reconnect(self):
+        server = self.start_to_connected()
+        ticket = self.client.publish('topic', b'payload', 2)
+        done = []
+        ticket.add_done_callback(done.append)
+        self.assertFalse(self.client.wait_all([ticket], timeout=0.2))
+
+        # Connection lost while the pubrel is in flight.
+        pubrel = buffer_packet(MqttPubrel(ticket.packet_id))
+        server.sendall(buffer_packet(MqttPubrec(ticket.packet_id)))
+        self.assertFalse(self.client.wait_all([ticket], timeout=0.2))
+        self.recv_until(server, pubrel)
+        server.close()
+        self.assertFalse(self.client.wait_all([ticket], timeout=5.))
+        self.assertFalse(self.client.is_active())
+
+        # The pubrel is sent again after connect and its pubcomp
+        # completes the ticket.
+        server = self.start_to_connected(pubrel)
+        server.sendall(buffer_packet(MqttPubcomp(ticket.packet_id)))
+        self.assertTrue(self.client.wait_all([ticket], timeout=5.))
+        self.assertEqual([ticket], done)
+
+    def test_close(self):
+        self.start_to_connected()
+        self.client.close()
+        self.assertFalse(self.client.is_active())
+        self.assertTrue(self.client._threadsafe_publisher.closed())
+        self.client.close()
+
+
+class TestBlockingMqttClient(unittest.TestCase):
+    def setUp(self):
+        # Connections complete in the listen backlog but are never
+        # accepted so an SSL handshake never progresses.
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.addCleanup(self.listener.close)
+
+        self.properties = MqttPollClientProperties()
+        self.properties.host, self.properties.port = self.listener.getsockname()
+        self.properties.client_id = 'blocking-client'
+        self.properties.ssl = ssl.create_default_context()
+
+    def test_connect_timeout(self):
+        self.properties.connect_timeout = 0.1
+        client = BlockingMqttClient(self.properties, log=None)
+        client.start()
+        self.assertEqual(ReactorState.error, client.state)
+        self.assertEqual(ConnectTimeoutReactorError(), client.error)
+
+    def test_name_resolution_timeout_unsupported(self):
+        self.properties.name_resolution_timeout = 1.
+        self.assertRaises(AssertionError, BlockingMqttClient, self.properties)
+
+    def test_endpoints(self):
+        self.properties.endpoints = EndpointList([self.listener.getsockname()])
+        self.properties.host = self.properties.port = None
+        self.properties.ssl = False
+        client = BlockingMqttClient(self.properties, log=None)
+        client.start()
+        self.assertEqual(self.listener.getsockname(), client.endpoint)
+        self.assertEqual(SocketState.connected, client.sock_state)
+        client.terminate()
+
+    def test_cache_time(self):
+        self.properties.cache_time = True
+        self.properties.ssl = False
+        client = BlockingMqttClient(self.properties, log=None)
+        client.start()
+
+        # Every read of the clock in an iteration returns the instant
+        # sampled at its top.
+        instants = []
+        write = client.write
+        def sampled_write():
+            instants.append(client._clock.time())
+            write()
+            instants.append(client._clock.time())
+        client.write = sampled_write
+        client.poll(0.)
+        self.assertEqual(2, len(instants))
+        self.assertEqual(instants[0], instants[1])
+        client.terminate()
@@ -1,11 +1,13 @@
 from __future__ import print_function
 
 import errno
+import logging
 import os
 import ssl
 import unittest
 import socket
 
+from mock import Mock, patch, ANY
 from mqtt_codec.packet import (
     MqttConnect,
     ConnackResult,
@@ -24,9 +26,14 @@ from mqtt_codec.packet import (
 from haka_mqtt.mqtt_request import MqttPublishTicket, MqttPublishStatus, MqttSubscribeTicket, \
     MqttUnsubscribeTicket
 from haka_mqtt.reactor import (
+    Reactor,
     ReactorState,
     ConnectReactorError, INACTIVE_STATES, SocketReactorError, AddressReactorError, DecodeReactorError,
-    ProtocolReactorError, SocketState, MqttState, SslReactorError)
+    ProtocolReactorError, SocketState, MqttState, SslReactorError, _interleave_families,
+    NameResolutionTimeoutReactorError, ConnectTimeoutReactorError)
+from haka_mqtt.endpoints import EndpointList
+from haka_mqtt.exception import PacketIdReactorException
+from haka_mqtt.packet_ids import PacketIdGenerator
 from tests.reactor_harness import TestReactor, buffer_packet, socket_error
 
 
@@ -610,6 +617,26 @@ class TestSendPathQos1(TestReactor, unittest.TestCase):
 
         return publish_ticket
 
+    def test_publish_batch(self):
+        self.start_to_connected()
+
+        tickets = self.reactor.publish_batch([('topic', b'a', 1, False),
+                                              ('topic', b'b', 0, False),
+                                              ('topic', b'c', 1, True)])
+        self.assertEqual([1, 0, 2], [t.packet_id for t in tickets])
+        self.assertEqual(tickets, self.reactor.preflight_packets())
+        self.assertEqual({1, 2}, self.reactor.send_packet_ids())
+        self.assertTrue(self.reactor.want_write())
+
+        publishes = [t.packet() for t in tickets]
+        self.set_send_packet_side_effect(publishes)
+        self.reactor.write()
+        self.socket.send.assert_called_once_with(b''.join(buffer_packet(p) for p in publishes))
+        self.assertEqual([MqttPublishStatus.puback, MqttPublishStatus.done, MqttPublishStatus.puback],
+                         [t.status for t in tickets])
+
+        self.reactor.terminate()
+
     def test_publish_qos1(self):
         # CHECKED-KC0 (2018-09-17)
         publish_ticket = self.start_and_publish_qos1()
@@ -805,6 +832,7 @@ class TestSendPathQos2(TestReactor, unittest.TestCase):
         self.recv_packet_then_ewouldblock(pubcomp)
         self.on_pubcomp.assert_called_once()
         self.socket.send.assert_not_called()
+        self.assertEqual(set(), self.reactor.send_packet_ids())
 
         self.reactor.terminate()
 
@@ -938,6 +966,34 @@ class TestSendPathQos2(TestReactor, unittest.TestCase):
 
         self.reactor.terminate()
 
+    def test_inflight_pubrel_restart_qos2(self):
+        self.start_to_connected()
+
+        publish = MqttPublish(1, 'topic', b'outgoing', False, 2, False)
+        self.set_send_packet_side_effect(publish)
+        ticket = self.reactor.publish(publish.topic, publish.payload, publish.qos, publish.retain)
+        self.reactor.write()
+        self.socket.send.reset_mock()
+
+        pubrel = MqttPubrel(publish.packet_id)
+        self.recv_packet_then_ewouldblock(MqttPubrec(publish.packet_id))
+        self.send_packet(pubrel)
+        self.assertEqual([pubrel], [p.packet() for p in self.reactor.in_flight_packets()])
+        self.reactor.terminate()
+
+        # The in-flight pubrel is re-sent after connect [MQTT-4.4.0-1].
+        self.start_to_connack(preflight_queue=[pubrel])
+        self.assertEqual({publish.packet_id}, self.reactor.send_packet_ids())
+        self.recv_packet_then_ewouldblock(MqttConnack(False, ConnackResult.accepted))
+        self.assertEqual(MqttPublishStatus.pubcomp, ticket.status)
+
+        self.recv_packet_then_ewouldblock(MqttPubcomp(publish.packet_id))
+        self.on_pubcomp.assert_called_once()
+        self.assertTrue(ticket.done())
+        self.assertEqual(set(), self.reactor.send_packet_ids())
+
+        self.reactor.terminate()
+
 
 class TestReceivePathQos0(TestReactor, unittest.TestCase):
     def test_recv_publish(self):
@@ -1418,3 +1474,678 @@ class TestReactorStop(TestReactor, unittest.TestCase):
         self.assertEqual(ReactorState.error, self.reactor.state)
 
 
+class _SmallPacketIdGenerator(PacketIdGenerator):
+    """Packet id generator with only 63 packet ids so that tests can
+    exhaust them quickly."""
+    @staticmethod
+    def id_stop():
+        return 64
+
+
+class TestPacketIdBackpressure(TestReactor, unittest.TestCase):
+    def reactor_properties(self):
+        p = super(type(self), self).reactor_properties()
+        p.packet_id_backpressure = True
+        return p
+
+    def setUp(self):
+        patcher = patch('haka_mqtt.reactor.PacketIdGenerator', _SmallPacketIdGenerator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        TestReactor.setUp(self)
+        self.on_packet_ids_available = Mock()
+        self.reactor.on_packet_ids_available = self.on_packet_ids_available
+
+    def publish_all_ids(self):
+        """Publishes one more QoS=1 message than there are packet ids
+        and writes them to the socket.
+
+        Returns
+        -------
+        list of MqttPublishTicket
+        """
+        num_ids = _SmallPacketIdGenerator.id_stop() - 1
+        tickets = [self.reactor.publish('topic', b'outgoing', 1) for i in range(0, num_ids + 1)]
+        for ticket in tickets:
+            self.assertIsNone(ticket.packet_id)
+        self.assertTrue(self.reactor.want_write())
+
+        publishes = [MqttPublish(i, 'topic', b'outgoing', False, 1, False) for i in range(1, num_ids + 1)]
+        self.send_packets(publishes)
+        self.assertEqual(list(range(1, num_ids + 1)), [t.packet_id for t in tickets[:-1]])
+        self.assertEqual(MqttPublishStatus.puback, tickets[-2].status)
+        self.assertIsNone(tickets[-1].packet_id)
+        self.assertEqual(MqttPublishStatus.preflight, tickets[-1].status)
+        self.assertEqual([tickets[-1]], self.reactor.preflight_packets())
+        self.assertFalse(self.reactor.want_write())
+
+        return tickets
+
+    def test_publish_qos1(self):
+        self.start_to_connected()
+        self.assertTrue(self.reactor.packet_id_backpressure)
+
+        ticket = self.reactor.publish('topic', b'outgoing', 1)
+        self.assertIsNone(ticket.packet_id)
+        self.assertEqual(set(), self.reactor.send_packet_ids())
+
+        self.send_packet(MqttPublish(1, 'topic', b'outgoing', False, 1, False))
+        self.assertEqual(1, ticket.packet_id)
+        self.assertEqual({1}, self.reactor.send_packet_ids())
+
+        self.recv_packet_then_ewouldblock(MqttPuback(1))
+        self.assertEqual(MqttPublishStatus.done, ticket.status)
+        self.assertEqual(set(), self.reactor.send_packet_ids())
+        self.on_packet_ids_available.assert_not_called()
+
+        self.reactor.terminate()
+
+    def test_exhausted_puback(self):
+        self.start_to_connected()
+        tickets = self.publish_all_ids()
+
+        self.recv_packet_then_ewouldblock(MqttPuback(1))
+        self.on_packet_ids_available.assert_called_once_with(self.reactor)
+        self.assertTrue(self.reactor.want_write())
+
+        self.send_packet(MqttPublish(1, 'topic', b'outgoing', False, 1, False))
+        self.assertEqual(1, tickets[-1].packet_id)
+        self.assertEqual(MqttPublishStatus.puback, tickets[-1].status)
+        self.assertEqual([], self.reactor.preflight_packets())
+        self.assertFalse(self.reactor.want_write())
+
+        self.reactor.terminate()
+
+    def test_exhausted_qos0_waits(self):
+        self.start_to_connected()
+        self.publish_all_ids()
+
+        # Messages are launched in order; the QoS=0 message waits
+        # behind the QoS=1 message that has no packet id.
+        ticket = self.reactor.publish('topic', b'outgoing', 0)
+        self.assertFalse(self.reactor.want_write())
+        self.assertEqual(MqttPublishStatus.preflight, ticket.status)
+
+        self.recv_packet_then_ewouldblock(MqttPuback(1))
+        self.send_packets([MqttPublish(1, 'topic', b'outgoing', False, 1, False),
+                           MqttPublish(0, 'topic', b'outgoing', False, 0, False)])
+        self.assertEqual(MqttPublishStatus.done, ticket.status)
+
+        self.reactor.terminate()
+
+    def test_exhausted_qos2_pubrel(self):
+        self.start_to_connected()
+
+        num_ids = _SmallPacketIdGenerator.id_stop() - 1
+        tickets = [self.reactor.publish('topic', b'outgoing', 2) for i in range(0, num_ids + 1)]
+        self.send_packets([MqttPublish(i, 'topic', b'outgoing', False, 2, False) for i in range(1, num_ids + 1)])
+        self.assertIsNone(tickets[-1].packet_id)
+        self.assertFalse(self.reactor.want_write())
+
+        # The pubrel is launched even though the publish ahead of it in
+        # the preflight queue is waiting for a packet id.
+        self.recv_packet_then_ewouldblock(MqttPubrec(1))
+        self.assertTrue(self.reactor.want_write())
+        self.send_packet(MqttPubrel(1))
+        self.assertEqual([tickets[-1]], self.reactor.preflight_packets())
+        self.assertFalse(self.reactor.want_write())
+
+        # Acks for inbound publishes are not held either.
+        self.recv_packet_then_ewouldblock(MqttPublish(7, 'topic', b'incoming', False, 1, False))
+        self.send_packet(MqttPuback(7))
+
+        self.recv_packet_then_ewouldblock(MqttPubcomp(1))
+        self.on_packet_ids_available.assert_called_once_with(self.reactor)
+        self.send_packet(MqttPublish(1, 'topic', b'outgoing', False, 2, False))
+        self.assertEqual(1, tickets[-1].packet_id)
+        self.assertEqual([], self.reactor.preflight_packets())
+
+        self.reactor.terminate()
+
+    def test_exhausted_backlog(self):
+        self.start_to_connected()
+        tickets = self.publish_all_ids()
+        backlog = [self.reactor.publish('topic', b'outgoing', qos) for qos in (0, 1, 0)]
+        self.assertEqual(tickets[-1:] + backlog, self.reactor.preflight_packets())
+        self.assertFalse(self.reactor.want_write())
+
+        # Each freed packet id releases held publishes in order up to
+        # the next one that needs an id.
+        self.recv_packet_then_ewouldblock(MqttPuback(1))
+        self.send_packets([MqttPublish(1, 'topic', b'outgoing', False, 1, False),
+                           MqttPublish(0, 'topic', b'outgoing', False, 0, False)])
+        self.assertEqual(backlog[1:], self.reactor.preflight_packets())
+        self.assertFalse(self.reactor.want_write())
+
+        self.recv_packet_then_ewouldblock(MqttPuback(2))
+        self.send_packets([MqttPublish(2, 'topic', b'outgoing', False, 1, False),
+                           MqttPublish(0, 'topic', b'outgoing', False, 0, False)])
+        self.assertEqual([], self.reactor.preflight_packets())
+        self.assertEqual([MqttPublishStatus.done, MqttPublishStatus.puback, MqttPublishStatus.done],
+                         [t.status for t in backlog])
+
+        self.reactor.terminate()
+
+    def test_exhausted_restart(self):
+        self.start_to_connected()
+        tickets = self.publish_all_ids()
+
+        self.reactor.terminate()
+        self.assertIsNone(tickets[-1].packet_id)
+        self.assertEqual(tickets[-1], self.reactor.preflight_packets()[-1])
+        self.on_packet_ids_available.assert_not_called()
+
+
+class TestPacketIdExhaustion(TestReactor, unittest.TestCase):
+    def setUp(self):
+        patcher = patch('haka_mqtt.reactor.PacketIdGenerator', _SmallPacketIdGenerator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        TestReactor.setUp(self)
+        self.on_packet_ids_available = Mock()
+        self.reactor.on_packet_ids_available = self.on_packet_ids_available
+
+    def test_publish_raises(self):
+        self.start_to_connected()
+        self.assertFalse(self.reactor.packet_id_backpressure)
+
+        num_ids = _SmallPacketIdGenerator.id_stop() - 1
+        for i in range(0, num_ids):
+            self.reactor.publish('topic', b'outgoing', 1)
+        self.assertRaises(PacketIdReactorException, self.reactor.publish, 'topic', b'outgoing', 1)
+        self.assertRaises(PacketIdReactorException, self.reactor.subscribe, [MqttTopic('topic', 0)])
+
+        publishes = [MqttPublish(i, 'topic', b'outgoing', False, 1, False) for i in range(1, num_ids + 1)]
+        self.send_packets(publishes)
+        self.on_packet_ids_available.assert_not_called()
+
+        self.recv_packet_then_ewouldblock(MqttPuback(1))
+        self.on_packet_ids_available.assert_called_once_with(self.reactor)
+
+        self.recv_packet_then_ewouldblock(MqttPuback(2))
+        self.on_packet_ids_available.assert_called_once_with(self.reactor)
+
+        self.reactor.terminate()
+
+    def test_publish_batch_raises(self):
+        self.start_to_connected()
+
+        num_ids = _SmallPacketIdGenerator.id_stop() - 1
+        batch = [('topic', b'outgoing', 1, False)] * (num_ids + 1)
+        with self.assertRaises(PacketIdReactorException) as cm:
+            self.reactor.publish_batch(batch)
+        self.assertEqual(num_ids, len(self.reactor.preflight_packets()))
+        self.assertEqual(self.reactor.preflight_packets(), cm.exception.tickets)
+        self.assertTrue(self.reactor.want_write())
+
+        self.reactor.terminate()
+
+    def test_dropped_subscribe_signals_ids_available(self):
+        self.start_to_connected()
+
+        num_ids = _SmallPacketIdGenerator.id_stop() - 1
+        for i in range(0, num_ids - 1):
+            self.reactor.publish('topic', b'outgoing', 1)
+        self.reactor.subscribe([MqttTopic('topic', 0)])
+        self.assertRaises(PacketIdReactorException, self.reactor.publish, 'topic', b'outgoing', 1)
+        self.reactor.terminate()
+        self.on_packet_ids_available.assert_not_called()
+
+        # The subscribe is dropped on restart and its packet id returned.
+        self.reactor.start()
+        self.on_packet_ids_available.assert_called_once_with(self.reactor)
+
+        self.reactor.terminate()
+
+    def test_preflight_subscribe_released_on_restart(self):
+        self.start_to_connected()
+        self.reactor.subscribe([MqttTopic('topic', 0)])
+        self.assertEqual({1}, self.reactor.send_packet_ids())
+        self.reactor.terminate()
+
+        self.start_to_connected()
+        self.assertEqual(set(), self.reactor.send_packet_ids())
+        self.assertEqual([], self.reactor.preflight_packets())
+
+        self.reactor.terminate()
+
+
+class TestDoneCallbacks(TestReactor, unittest.TestCase):
+    def test_publish_qos0(self):
+        self.start_to_connected()
+        ticket = self.reactor.publish('topic', b'outgoing', 0)
+        cb = Mock()
+        ticket.add_done_callback(cb)
+        self.assertFalse(ticket.done())
+
+        self.send_packet(ticket.packet())
+        cb.assert_called_once_with(ticket)
+        self.assertTrue(ticket.done())
+
+        # Callbacks added after completion are called immediately.
+        late_cb = Mock()
+        ticket.add_done_callback(late_cb)
+        late_cb.assert_called_once_with(ticket)
+
+        self.reactor.terminate()
+
+    def test_publish_qos0_callback_publishes(self):
+        self.start_to_connected()
+        ticket = self.reactor.publish('topic', b'first', 0)
+        tickets = []
+        ticket.add_done_callback(lambda t: tickets.append(self.reactor.publish('topic', b'second', 0)))
+
+        self.send_packet(ticket.packet())
+        self.assertEqual(tickets, self.reactor.preflight_packets())
+        self.assertTrue(self.reactor.want_write())
+
+        self.reactor.terminate()
+
+    def test_publish_qos1(self):
+        self.start_to_connected()
+        ticket = self.reactor.publish('topic', b'outgoing', 1)
+        cb = Mock()
+        ticket.add_done_callback(cb)
+        self.send_packet(ticket.packet())
+        cb.assert_not_called()
+
+        self.recv_packet_then_ewouldblock(MqttPuback(ticket.packet_id))
+        cb.assert_called_once_with(ticket)
+
+        self.reactor.terminate()
+
+    def test_publish_qos2(self):
+        self.start_to_connected()
+        ticket = self.reactor.publish('topic', b'outgoing', 2)
+        cb = Mock()
+        ticket.add_done_callback(cb)
+        self.send_packet(ticket.packet())
+
+        self.set_send_packet_side_effect(MqttPubrel(ticket.packet_id))
+        self.recv_packet_then_ewouldblock(MqttPubrec(ticket.packet_id))
+        self.assertEqual(MqttPublishStatus.pubcomp, ticket.status)
+        self.reactor.write()
+        cb.assert_not_called()
+
+        self.recv_packet_then_ewouldblock(MqttPubcomp(ticket.packet_id))
+        self.assertEqual(MqttPublishStatus.done, ticket.status)
+        cb.assert_called_once_with(ticket)
+
+        self.reactor.terminate()
+
+    def test_subscribe_unsubscribe(self):
+        self.start_to_connected()
+        subscribe_ticket = self.reactor.subscribe([MqttTopic('topic', 1)])
+        subscribe_cb = Mock()
+        subscribe_ticket.add_done_callback(subscribe_cb)
+        self.send_packet(subscribe_ticket.packet())
+        self.recv_packet_then_ewouldblock(MqttSuback(subscribe_ticket.packet_id, [SubscribeResult.qos1]))
+        subscribe_cb.assert_called_once_with(subscribe_ticket)
+
+        unsubscribe_ticket = self.reactor.unsubscribe(['topic'])
+        unsubscribe_cb = Mock()
+        unsubscribe_ticket.add_done_callback(unsubscribe_cb)
+        self.send_packet(unsubscribe_ticket.packet())
+        unsubscribe_cb.assert_not_called()
+        self.recv_packet_then_ewouldblock(MqttUnsuback(unsubscribe_ticket.packet_id))
+        unsubscribe_cb.assert_called_once_with(unsubscribe_ticket)
+
+        self.reactor.terminate()
+
+
+class TestHappyEyeballs(TestReactor, unittest.TestCase):
+    def reactor_properties(self):
+        self.selector = Mock()
+        self.sockets = {}
+        self.inet_a = (socket.AF_INET, 1, 6, '', ('192.0.2.1', 1883))
+        self.inet_b = (socket.AF_INET, 1, 6, '', ('192.0.2.2', 1883))
+        self.inet6_c = (socket.AF_INET6, 1, 6, '', ('2001:db8::1', 1883, 0, 0))
+        for family, socktype, proto, canonname, sockaddr in (self.inet_a, self.inet_b, self.inet6_c):
+            sock = Mock()
+            sock.connect.side_effect = socket_error(errno.EINPROGRESS)
+            sock.getsockopt.return_value = 0
+            sock.getpeername.side_effect = socket_error(errno.ENOTCONN)
+            sock.pending.return_value = 0
+            self.sockets[sockaddr] = sock
+
+        p = super(type(self), self).reactor_properties()
+        p.socket_factory = lambda getaddrinfo_params, sockaddr: self.sockets[sockaddr]
+        p.selector = self.selector
+        p.happy_eyeballs_delay = 0.25
+        return p
+
+    def setUp(self):
+        TestReactor.setUp(self)
+        self.name_resolver_future.set_result([self.inet_a, self.inet_b, self.inet6_c])
+        self.a = self.sockets[self.inet_a[4]]
+        self.b = self.sockets[self.inet_b[4]]
+        self.c = self.sockets[self.inet6_c[4]]
+
+    def test_interleave_families(self):
+        self.assertEqual([self.inet_a, self.inet6_c, self.inet_b],
+                         _interleave_families([self.inet_a, self.inet_b, self.inet6_c]))
+        self.assertEqual([self.inet6_c, self.inet_a, self.inet_b],
+                         _interleave_families([self.inet6_c, self.inet_a, self.inet_b]))
+
+    def test_second_attempt_wins(self):
+        self.reactor.start()
+        self.assertEqual(SocketState.connecting, self.reactor.sock_state)
+        self.assertIsNone(self.reactor.socket)
+        self.assertFalse(self.reactor.want_write())
+        self.a.connect.assert_called_once_with(self.inet_a[4])
+        self.selector.add_write.assert_called_once_with(self.a, self.reactor)
+        self.c.connect.assert_not_called()
+
+        # Writable notification while nothing has connected.
+        self.reactor.write()
+        self.assertEqual(SocketState.connecting, self.reactor.sock_state)
+
+        # The next family is tried after the delay.
+        self.scheduler.poll(0.25)
+        self.c.connect.assert_called_once_with(self.inet6_c[4])
+        self.selector.add_write.assert_called_with(self.c, self.reactor)
+
+        self.c.getpeername.side_effect = None
+        self.c.send.return_value = 0
+        self.reactor.write()
+        self.assertIs(self.c, self.reactor.socket)
+        self.assertEqual(SocketState.connected, self.reactor.sock_state)
+        self.c.send.assert_called_once()
+        self.a.close.assert_called_once()
+        self.c.close.assert_not_called()
+        self.b.connect.assert_not_called()
+        self.selector.del_write.assert_any_call(self.a, self.reactor)
+        self.selector.del_write.assert_any_call(self.c, self.reactor)
+        self.assertEqual(1, len(self.scheduler))
+
+        self.reactor.terminate()
+        self.c.close.assert_called_once()
+
+    def test_immediate_failure_starts_next_attempt(self):
+        self.a.connect.side_effect = socket_error(errno.ECONNREFUSED)
+        self.reactor.start()
+        self.a.close.assert_called_once()
+        self.c.connect.assert_called_once_with(self.inet6_c[4])
+
+        self.c.getsockopt.return_value = errno.ENETUNREACH
+        self.reactor.write()
+        self.c.close.assert_called_once()
+        self.b.connect.assert_called_once_with(self.inet_b[4])
+        self.assertEqual(SocketState.connecting, self.reactor.sock_state)
+
+        self.b.getsockopt.return_value = errno.ECONNREFUSED
+        self.reactor.write()
+        self.b.close.assert_called_once()
+        self.assertEqual(ReactorState.error, self.reactor.state)
+        self.assertEqual(SocketReactorError(errno.ECONNREFUSED), self.reactor.error)
+        self.on_connect_fail.assert_called_once_with(self.reactor)
+
+    def test_stop_while_racing(self):
+        self.reactor.start()
+        self.scheduler.poll(0.25)
+        self.assertEqual(1, len(self.scheduler))
+
+        self.reactor.stop()
+        self.assertEqual(ReactorState.stopped, self.reactor.state)
+        for sock in (self.a, self.c):
+            sock.close.assert_called_once()
+            self.selector.del_write.assert_any_call(sock, self.reactor)
+        self.b.connect.assert_not_called()
+
+
+class TestConnectTimeouts(TestReactor, unittest.TestCase):
+    def reactor_properties(self):
+        p = super(type(self), self).reactor_properties()
+        p.name_resolution_timeout = 5
+        p.connect_timeout = 10
+        return p
+
+    def test_name_resolution_timeout(self):
+        self.start_to_name_resolution()
+        self.scheduler.poll(4)
+        self.assertEqual(SocketState.name_resolution, self.reactor.sock_state)
+
+        self.scheduler.poll(1)
+        self.assertTrue(self.name_resolver_future.cancelled())
+        self.assertEqual(ReactorState.error, self.reactor.state)
+        self.assertEqual(NameResolutionTimeoutReactorError(), self.reactor.error)
+        self.on_connect_fail.assert_called_once_with(self.reactor)
+
+    def test_connect_timeout(self):
+        self.start_to_connecting()
+        self.scheduler.poll(9)
+        self.assertEqual(SocketState.connecting, self.reactor.sock_state)
+
+        self.scheduler.poll(1)
+        self.socket.close.assert_called_once()
+        self.assertEqual(ReactorState.error, self.reactor.state)
+        self.assertEqual(ConnectTimeoutReactorError(), self.reactor.error)
+        self.on_connect_fail.assert_called_once_with(self.reactor)
+
+    def test_handshake_timeout(self):
+        self.start_to_handshake()
+        self.scheduler.poll(10)
+        self.assertEqual(ReactorState.error, self.reactor.state)
+        self.assertEqual(ConnectTimeoutReactorError(), self.reactor.error)
+
+    def test_connect_within_timeout(self):
+        self.start_to_connack()
+        self.scheduler.poll(10)
+        self.assertEqual(ReactorState.starting, self.reactor.state)
+        self.assertIsNone(self.reactor.error)
+
+        self.reactor.terminate()
+
+
+class TestEndpointList(TestReactor, unittest.TestCase):
+    def reactor_properties(self):
+        self.endpoints = EndpointList([('primary.example.com', 1883), ('secondary.example.com', 1883)],
+                                      cool_down=60.)
+        p = super(type(self), self).reactor_properties()
+        p.endpoint = None
+        p.endpoints = self.endpoints
+        return p
+
+    def test_failover(self):
+        hosts = []
+
+        def name_resolver(host, *args):
+            hosts.append(host)
+            return self.name_resolver_future
+        self.name_resolver.side_effect = name_resolver
+
+        self.socket.connect.side_effect = socket_error(errno.ECONNREFUSED)
+        self.reactor.start()
+        self.assertEqual(['primary.example.com'], hosts)
+        self.assertEqual(ReactorState.error, self.reactor.state)
+        self.assertEqual(1, self.endpoints.stats(('primary.example.com', 1883)).num_failures)
+
+        self.name_resolver.reset_mock()
+        self.socket.connect.reset_mock()
+        self.start_to_connack()
+        self.assertEqual(['primary.example.com', 'secondary.example.com'], hosts)
+        self.assertEqual(('secondary.example.com', 1883), self.reactor.endpoint)
+
+        self.scheduler.poll(2)
+        self.recv_packet_then_ewouldblock(MqttConnack(False, ConnackResult.accepted))
+        stats = self.endpoints.stats(('secondary.example.com', 1883))
+        self.assertEqual(1, stats.num_successes)
+        self.assertEqual(2, stats.latency)
+
+        # Stopping is not a failure.
+        self.reactor.terminate()
+        self.assertEqual(0, stats.num_failures)
+
+
+class TestSocketFactoryOnConnected(TestReactor, unittest.TestCase):
+    def reactor_properties(self):
+        self.socket_factory = Mock(side_effect=lambda getaddrinfo_params, sockaddr: self.socket)
+        p = super(type(self), self).reactor_properties()
+        p.socket_factory = self.socket_factory
+        return p
+
+    def test_on_connected(self):
+        self.start_to_connack()
+        self.socket_factory.on_connected.assert_not_called()
+
+        self.recv_packet_then_ewouldblock(MqttConnack(False, ConnackResult.accepted))
+        self.socket_factory.on_connected.assert_called_once_with(
+            (self.endpoint[0], self.endpoint[1], socket.AF_UNSPEC, socket.SOCK_STREAM, socket.IPPROTO_TCP, 0),
+            self.socket)
+        self.reactor.terminate()
+
+    def test_not_called_on_connack_fail(self):
+        self.start_to_connack()
+        self.recv_packet_then_ewouldblock(MqttConnack(False, ConnackResult.fail_bad_client_id))
+        self.socket_factory.on_connected.assert_not_called()
+
+
+class _FakeSslRecords(object):
+    """Stands in for the receive side of an SSL socket.  Like OpenSSL,
+    each recv returns bytes from at most one record and bytes of a
+    record not yet returned are reported by `pending` while the file
+    descriptor is only readable when whole records remain unread."""
+    def __init__(self, records):
+        self.records = list(records)
+        self.buf = b''
+
+    def readable(self):
+        return bool(self.records)
+
+    def recv(self, bufsize):
+        if not self.buf:
+            if not self.records:
+                raise ssl.SSLWantReadError()
+            self.buf = self.records.pop(0)
+
+        rv = self.buf[0:bufsize]
+        self.buf = self.buf[bufsize:]
+        return rv
+
+    def pending(self):
+        return len(self.buf)
+
+
+class TestSslPendingRead(TestReactor, unittest.TestCase):
+    def reactor_properties(self):
+        p = super(type(self), self).reactor_properties()
+        p.read_budget = 2**14
+        return p
+
+    def set_records(self, records):
+        fake = _FakeSslRecords(records)
+        self.socket.recv.side_effect = fake.recv
+        self.socket.pending.side_effect = fake.pending
+        return fake
+
+    def test_many_small_publishes(self):
+        self.start_to_connected()
+
+        # Three 16 KiB records of small publishes; far more than one
+        # recv(4096) returns.
+        publish = buffer_packet(MqttPublish(0, 'topic', b'payload', False, 0, False))
+        num_per_record = 2**14 // len(publish)
+        fake = self.set_records([publish * num_per_record] * 3)
+        num_deadlines = len(self.scheduler)
+
+        # Reads while the file descriptor is readable as a select loop
+        # would.
+        num_reads = 0
+        while fake.readable():
+            self.reactor.read()
+            num_reads += 1
+
+        self.assertEqual(3, num_reads)
+        self.assertEqual(0, fake.pending())
+        self.assertEqual(3 * num_per_record, self.on_publish.call_count)
+        self.assertEqual(num_deadlines, len(self.scheduler))
+
+        self.reactor.terminate()
+
+    def test_budget_spent(self):
+        self.start_to_connected()
+
+        publish = buffer_packet(MqttPublish(0, 'topic', b'payload', False, 0, False))
+        num_publishes = 2**15 // len(publish)
+        fake = self.set_records([publish * num_publishes])
+        num_deadlines = len(self.scheduler)
+
+        self.reactor.read()
+        self.assertFalse(fake.readable())
+        self.assertTrue(fake.pending())
+        self.assertTrue(self.on_publish.call_count < num_publishes)
+
+        # The remainder is read by a deadline that expires immediately.
+        self.assertEqual(num_deadlines + 1, len(self.scheduler))
+        self.scheduler.poll(0)
+        self.assertEqual(num_deadlines, len(self.scheduler))
+        self.assertEqual(0, fake.pending())
+        self.assertEqual(num_publishes, self.on_publish.call_count)
+
+        self.reactor.terminate()
+
+    def test_drained_before_pending_read(self):
+        self.start_to_connected()
+
+        publish = buffer_packet(MqttPublish(0, 'topic', b'payload', False, 0, False))
+        num_publishes = 2**15 // len(publish)
+        fake = self.set_records([publish * num_publishes])
+        num_deadlines = len(self.scheduler)
+        self.reactor.read()
+        self.assertEqual(num_deadlines + 1, len(self.scheduler))
+
+        # A read made before the deadline expires drains the socket and
+        # cancels the deadline.
+        self.reactor.read()
+        self.assertEqual(0, fake.pending())
+        self.assertEqual(num_publishes, self.on_publish.call_count)
+        self.assertEqual(num_deadlines, len(self.scheduler))
+
+        self.reactor.terminate()
+
+    def test_terminate_cancels_pending_read(self):
+        self.start_to_connected()
+
+        publish = buffer_packet(MqttPublish(0, 'topic', b'payload', False, 0, False))
+        self.set_records([publish * (2**15 // len(publish))])
+        num_deadlines = len(self.scheduler)
+        self.reactor.read()
+        self.assertEqual(num_deadlines + 1, len(self.scheduler))
+
+        self.reactor.terminate()
+
+
+class TestLogLevelCache(TestReactor, unittest.TestCase):
+    def test_recv_publish_info_disabled(self):
+        self.start_to_connected()
+
+        haka_log = logging.getLogger('haka')
+        self.addCleanup(haka_log.setLevel, haka_log.level)
+        haka_log.setLevel(logging.WARNING)
+        self.reactor.refresh_log_levels()
+
+        publish = MqttPublish(0, 'topic', b'payload', False, 0, False)
+        with patch.object(haka_log, 'info') as info, patch.object(haka_log, 'debug') as debug:
+            self.recv_packet_then_ewouldblock(publish)
+            info.assert_not_called()
+            debug.assert_not_called()
+
+            haka_log.setLevel(logging.DEBUG)
+            self.reactor.refresh_log_levels()
+            self.recv_packet_then_ewouldblock(publish)
+            info.assert_called_once_with('Received %s.', ANY)
+            debug.assert_called_once()
+
+        self.assertEqual(2, self.on_publish.call_count)
+        self.reactor.terminate()
+
+    def test_null_logger(self):
+        self.reactor = Reactor(self.properties, log=None)
+        self.reactor.on_connect_fail = self.on_connect_fail
+        self.reactor.on_disconnect = self.on_disconnect
+        self.reactor.on_publish = self.on_publish
+
+        self.start_to_connected()
+        self.recv_packet_then_ewouldblock(MqttPublish(0, 'topic', b'payload', False, 0, False))
+        self.on_publish.assert_called_once()
+        self.reactor.terminate()
@@ -3,7 +3,8 @@ import ssl
 import unittest
 
 from haka_mqtt.reactor import ReactorError, MutePeerReactorError, ConnectReactorError, SocketReactorError, \
-    RecvTimeoutReactorError, AddressReactorError, DecodeReactorError, ProtocolReactorError, SslReactorError
+    RecvTimeoutReactorError, AddressReactorError, DecodeReactorError, ProtocolReactorError, SslReactorError, \
+    NameResolutionTimeoutReactorError, ConnectTimeoutReactorError
 from mqtt_codec.packet import ConnackResult
 
 
@@ -39,6 +40,12 @@ class TestReactorErrorEq(unittest.TestCase):
         rtre1 = RecvTimeoutReactorError()
         self.assertEqual(rtre0, rtre1)
 
+    def test_timeout_reactor_errors(self):
+        self.assertEqual(NameResolutionTimeoutReactorError(), NameResolutionTimeoutReactorError())
+        self.assertEqual(ConnectTimeoutReactorError(), ConnectTimeoutReactorError())
+        self.assertNotEqual(NameResolutionTimeoutReactorError(), ConnectTimeoutReactorError())
+        self.assertNotEqual(ConnectTimeoutReactorError(), RecvTimeoutReactorError())
+
     @unittest.skip("SSLError.__eq__ doesn't work.")
     def test_ssl_reactor_error(self):
         sre0 = SslReactorError(ssl.SSLError('args', 'args'))
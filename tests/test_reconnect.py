@@ -0,0 +1,102 @@
+import random
+import unittest
+
+from mock import Mock
+
+from haka_mqtt.reconnect import ReconnectPolicy, Jitter
+from haka_mqtt.scheduler import DurationScheduler
+
+
+class TestReconnectPolicy(unittest.TestCase):
+    def setUp(self):
+        self.reactor = Mock()
+        self.scheduler = DurationScheduler()
+
+    def tearDown(self):
+        self.assertEqual(0, len(self.scheduler))
+
+    def test_exponential(self):
+        policy = ReconnectPolicy(self.reactor, self.scheduler, base_delay=1., max_delay=10., jitter=Jitter.none)
+        self.assertEqual(0, policy.attempts)
+        self.assertIsNone(policy.next_instant)
+        self.assertFalse(policy.scheduled())
+
+        delays = []
+        for i in range(0, 6):
+            delays.append(policy.schedule())
+            self.assertEqual(i + 1, policy.attempts)
+            self.assertTrue(policy.scheduled())
+            self.assertEqual(self.scheduler.instant() + delays[-1], policy.next_instant)
+
+            self.scheduler.poll(delays[-1])
+            self.assertEqual(i + 1, self.reactor.start.call_count)
+            self.assertFalse(policy.scheduled())
+            self.assertIsNone(policy.next_instant)
+
+        self.assertEqual([1., 2., 4., 8., 10., 10.], delays)
+
+    def test_schedule_replaces(self):
+        policy = ReconnectPolicy(self.reactor, self.scheduler, jitter=Jitter.none)
+        policy.schedule()
+        self.assertEqual(2., policy.schedule())
+        self.assertEqual(1, len(self.scheduler))
+
+        self.scheduler.poll(2.)
+        self.reactor.start.assert_called_once_with()
+
+    def test_full_jitter(self):
+        policy = ReconnectPolicy(self.reactor,
+                                 self.scheduler,
+                                 base_delay=1.,
+                                 max_delay=30.,
+                                 jitter=Jitter.full,
+                                 rand=random.Random(0))
+        for i in range(0, 20):
+            delay = policy.schedule()
+            self.assertTrue(0 <= delay <= min(30., 2.**i), (i, delay))
+        policy.cancel()
+
+    def test_decorrelated_jitter(self):
+        policy = ReconnectPolicy(self.reactor,
+                                 self.scheduler,
+                                 base_delay=1.,
+                                 max_delay=30.,
+                                 jitter=Jitter.decorrelated,
+                                 rand=random.Random(0))
+        prev = 1.
+        for i in range(0, 20):
+            delay = policy.schedule()
+            self.assertTrue(1. <= delay <= min(30., 3 * prev), (i, delay))
+            prev = delay
+        policy.cancel()
+
+    def test_reset_on_stable_connection(self):
+        policy = ReconnectPolicy(self.reactor, self.scheduler, jitter=Jitter.none, stable_period=60.)
+        for i in range(0, 3):
+            self.scheduler.poll(policy.schedule())
+        self.assertEqual(3, policy.attempts)
+
+        # Connection lost before the stable period ends.
+        policy.on_connack()
+        self.scheduler.poll(59.)
+        self.assertEqual(8., policy.schedule())
+        self.assertEqual(4, policy.attempts)
+        self.scheduler.poll(8.)
+
+        policy.on_connack()
+        self.scheduler.poll(60.)
+        self.assertEqual(0, policy.attempts)
+        self.assertEqual(1., policy.schedule())
+        policy.cancel()
+
+    def test_cancel(self):
+        policy = ReconnectPolicy(self.reactor, self.scheduler)
+        policy.on_connack()
+        policy.schedule()
+        policy.cancel()
+        self.assertFalse(policy.scheduled())
+        self.assertIsNone(policy.next_instant)
+
+        self.scheduler.poll(120.)
+        self.reactor.start.assert_not_called()
+        self.assertEqual(1, policy.attempts)
@@ -77,3 +77,118 @@ class TestScheduler(unittest.TestCase):
         s.poll(s.remaining())
         self.assertTrue(d0.expired())
 
+
+    def test_equal_instants_fifo(self):
+        s = DurationScheduler()
+        calls = []
+        for i in range(0, 10):
+            s.add(5, lambda i=i: calls.append(i))
+
+        s.poll(5)
+        self.assertEqual(list(range(0, 10)), calls)
+        self.assertEqual(0, len(s))
+
+    def test_cancel_compaction(self):
+        s = DurationScheduler()
+        targets = [Target() for i in range(0, 1000)]
+        deadlines = [s.add(i, t) for i, t in enumerate(targets)]
+        self.assertEqual(1000, len(s))
+
+        for d in deadlines[0:900]:
+            d.cancel()
+            self.assertTrue(d.expired())
+        self.assertEqual(100, len(s))
+        self.assertEqual(900, s.remaining())
+
+        # Cancelling an already cancelled deadline has no effect.
+        deadlines[0].cancel()
+        self.assertEqual(100, len(s))
+
+        s.poll(999)
+        self.assertFalse(any(t.set for t in targets[0:900]))
+        self.assertTrue(all(t.set for t in targets[900:]))
+        self.assertEqual(0, len(s))
+        self.assertIsNone(s.remaining())
+
+    def test_cancel_during_poll(self):
+        s = DurationScheduler()
+        t1 = Target()
+        d1 = s.add(1, t1)
+        s.add(1, d1.cancel)
+        s.add(0, lambda: [s.add(1, Target()).cancel() for i in range(0, 200)])
+
+        s.poll(1)
+        self.assertTrue(d1.expired())
+        self.assertTrue(t1.set)
+        self.assertEqual(0, len(s))
+        self.assertIsNone(s.remaining())
+
+    def test_reset_later(self):
+        s = DurationScheduler()
+        t = Target()
+        d = s.add(10, t)
+        s.poll(5)
+        d.reset(10)
+        self.assertEqual(1, len(s))
+        self.assertEqual(10, s.remaining())
+
+        s.poll(5)
+        self.assertFalse(t.set)
+        self.assertFalse(d.expired())
+        self.assertEqual(1, len(s))
+
+        s.poll(5)
+        self.assertTrue(t.set)
+        self.assertTrue(d.expired())
+        self.assertEqual(0, len(s))
+        self.assertIsNone(s.remaining())
+
+    def test_reset_earlier(self):
+        s = DurationScheduler()
+        t = Target()
+        d = s.add(10, t)
+        d.reset(2)
+        self.assertEqual(1, len(s))
+        self.assertEqual(2, s.remaining())
+
+        s.poll(2)
+        self.assertTrue(t.set)
+        self.assertEqual(0, len(s))
+
+        # The tombstone at instant 10 does not call back again.
+        t.set = False
+        s.poll(10)
+        self.assertFalse(t.set)
+        self.assertIsNone(s.remaining())
+
+    def test_reset_rearms(self):
+        s = DurationScheduler()
+        t0 = Target()
+        t1 = Target()
+        d0 = s.add(1, t0)
+        d1 = s.add(1, t1)
+        s.poll(1)
+        d1.cancel()
+        self.assertTrue(d0.expired())
+
+        t0.set = False
+        d0.reset(3)
+        d1.reset(3)
+        self.assertFalse(d0.expired())
+        self.assertFalse(d1.expired())
+        self.assertEqual(2, len(s))
+
+        s.poll(3)
+        self.assertTrue(t0.set)
+        self.assertTrue(t1.set)
+        self.assertEqual(0, len(s))
+
+    def test_reset_fifo(self):
+        s = DurationScheduler()
+        calls = []
+        d0 = s.add(1, lambda: calls.append(0))
+        d1 = s.add(1, lambda: calls.append(1))
+        d0.reset(5)
+        d1.reset(5)
+        s.poll(5)
+        self.assertEqual([0, 1], calls)
@@ -0,0 +1,180 @@
+import doctest
+import socket
+import threading
+import unittest
+
+from mock import Mock
+from mqtt_codec.packet import MqttConnack, ConnackResult, MqttPublish
+
+import haka_mqtt.frontends.sharded
+from haka_mqtt.frontends.sharded import (
+    ShardedHub,
+    ShardStats,
+    RoundRobinPlacement,
+    LeastLoadedPlacement,
+    ClientIdHashPlacement,
+)
+from haka_mqtt.reactor import Reactor, ReactorState
+from tests.reactor_harness import buffer_packet
+
+
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(haka_mqtt.frontends.sharded))
+    return tests
+
+
+def shard_stats(*num_reactors):
+    return [ShardStats(i, n, 0, 0, 0.) for i, n in enumerate(num_reactors)]
+
+
+class TestPlacement(unittest.TestCase):
+    def test_round_robin(self):
+        placement = RoundRobinPlacement()
+        stats = shard_stats(0, 0, 0)
+        self.assertEqual([0, 1, 2, 0, 1], [placement('c', stats) for i in range(0, 5)])
+
+    def test_least_loaded(self):
+        placement = LeastLoadedPlacement()
+        self.assertEqual(1, placement('c', shard_stats(2, 1, 1)))
+        self.assertEqual(0, placement('c', shard_stats(0, 0, 0)))
+        self.assertEqual(2, placement('c', shard_stats(5, 3, 0)))
+
+    def test_client_id_hash(self):
+        placement = ClientIdHashPlacement()
+        stats = shard_stats(0, 0, 0, 0)
+        indexes = [placement('client-{}'.format(i), stats) for i in range(0, 100)]
+        self.assertEqual(set(range(0, 4)), set(indexes))
+        self.assertEqual(indexes, [placement('client-{}'.format(i), stats) for i in range(0, 100)])
+        self.assertEqual(placement('client-0', stats), placement(u'client-0', stats))
+
+
+class TestShardShutdown(unittest.TestCase):
+    def test_terminate_raises(self):
+        log = Mock()
+        reactors = []
+
+        def create_reactor(properties):
+            reactor = Mock()
+            reactor.terminate.side_effect = RuntimeError('terminate')
+            reactors.append(reactor)
+            return reactor
+
+        hub = ShardedHub(1, log=log)
+        hub.start()
+        hub.add('client-0', create_reactor, start=False)
+        hub.add('client-1', create_reactor, start=False)
+        hub.close()
+
+        # Every reactor is terminated even though each one raises.
+        self.assertEqual(2, len(reactors))
+        for reactor in reactors:
+            reactor.terminate.assert_called_once_with()
+        self.assertEqual(2, log.exception.call_count)
+
+    def test_logger_raises(self):
+        log = Mock()
+        log.exception.side_effect = RuntimeError('log')
+
+        def create_reactor(properties):
+            reactor = Mock()
+            reactor.terminate.side_effect = RuntimeError('terminate')
+            return reactor
+
+        hub = ShardedHub(1, log=log)
+        hub.start()
+        hub.add('client-0', create_reactor, start=False)
+        hub.add('client-1', create_reactor, start=False)
+        hub.close()
+        self.assertEqual(2, log.exception.call_count)
+
+    def test_factory_raises(self):
+        def create_reactor(properties):
+            raise RuntimeError('factory')
+
+        hub = ShardedHub(1, log=None)
+        self.addCleanup(hub.close)
+        hub.start()
+        self.assertEqual(0, hub.add('client-0', create_reactor))
+
+        event = threading.Event()
+        hub.add('client-1', lambda properties: Mock(), start=False)
+        hub.submit('client-1', lambda reactor: event.set())
+        self.assertTrue(event.wait(5.))
+
+        self.assertRaises(KeyError, hub.shard_of, 'client-0')
+        self.assertEqual([1], [s.num_reactors for s in hub.shard_stats()])
+        hub.add('client-0', lambda properties: Mock(), start=False)
+
+
+class TestShardedHub(unittest.TestCase):
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(8)
+        self.listener.settimeout(5.)
+        self.addCleanup(self.listener.close)
+
+        self.hub = ShardedHub(2, placement=ClientIdHashPlacement(), period=0.1)
+        self.addCleanup(self.hub.close)
+        self.hub.start()
+
+    def create_reactor(self, properties):
+        properties.endpoint = self.listener.getsockname()
+        return Reactor(properties, log=None)
+
+    def recv(self, sock, num_bytes):
+        buf = b''
+        while len(buf) < num_bytes:
+            buf += sock.recv(num_bytes - len(buf))
+        return buf
+
+    def test_publish(self):
+        client_ids = ['client-{}'.format(i) for i in range(0, 4)]
+        placement = ClientIdHashPlacement()
+        for client_id in client_ids:
+            index = self.hub.add(client_id, self.create_reactor)
+            self.assertEqual(placement(client_id, self.hub.shard_stats()), index)
+            self.assertEqual(index, self.hub.shard_of(client_id))
+        self.assertRaises(ValueError, self.hub.add, client_ids[0], self.create_reactor)
+        self.assertEqual(len(client_ids), sum(s.num_reactors for s in self.hub.shard_stats()))
+
+        servers = []
+        for client_id in client_ids:
+            server, addr = self.listener.accept()
+            server.settimeout(5.)
+            self.addCleanup(server.close)
+            self.assertTrue(server.recv(4096))
+            server.send(buffer_packet(MqttConnack(False, ConnackResult.accepted)))
+            servers.append(server)
+
+        # Publish from several threads at once.
+        publish = MqttPublish(0, 'topic', b'payload', False, 0, False)
+        threads = [threading.Thread(target=self.hub.publish, args=(client_id, publish.topic, publish.payload, 0))
+                   for client_id in client_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for server in servers:
+            expected = buffer_packet(publish)
+            self.assertEqual(expected, self.recv(server, len(expected)))
+
+        states = []
+        event = threading.Event()
+
+        def get_state(reactor):
+            states.append(reactor.state)
+            event.set()
+
+        self.hub.submit(client_ids[0], get_state)
+        self.assertTrue(event.wait(5.))
+        self.assertEqual([ReactorState.started], states)
+
+        stats = self.hub.shard_stats()
+        self.assertTrue(sum(s.num_commands for s in stats) >= 2 * len(client_ids))
+        self.assertTrue(all(s.num_iterations > 0 for s in stats if s.num_reactors > 0))
+
+        self.hub.remove(client_ids[0])
+        self.assertRaises(KeyError, self.hub.shard_of, client_ids[0])
+        self.assertEqual(len(client_ids) - 1, sum(s.num_reactors for s in self.hub.shard_stats()))
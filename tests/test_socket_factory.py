@@ -0,0 +1,150 @@
+import socket
+import unittest
+
+from mock import Mock, patch
+
+from haka_mqtt.socket_factory import (
+    SocketFactory,
+    BlockingSocketFactory,
+    SslSocketFactory,
+    BlockingSslSocketFactory,
+    SslSessionCache,
+    SocketOptions,
+    socket_options_profile,
+    socket_options_profiles,
+)
+
+
+_PARAMS = ('localhost', 1883, socket.AF_UNSPEC, socket.SOCK_STREAM, socket.IPPROTO_TCP, 0)
+
+
+class TestSocketOptions(unittest.TestCase):
+    def test_unset(self):
+        sock = Mock()
+        SocketOptions().setsockopts(sock, socket.AF_INET)
+        sock.setsockopt.assert_not_called()
+
+    def test_setsockopts(self):
+        sock = Mock()
+        options = SocketOptions(nodelay=True, sndbuf=4096, rcvbuf=8192, keepalive=False, tos=0x10)
+        options.setsockopts(sock, socket.AF_INET)
+        self.assertEqual([
+            ((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),),
+            ((socket.SOL_SOCKET, socket.SO_SNDBUF, 4096),),
+            ((socket.SOL_SOCKET, socket.SO_RCVBUF, 8192),),
+            ((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 0),),
+            ((socket.IPPROTO_IP, socket.IP_TOS, 0x10),),
+        ], sock.setsockopt.call_args_list)
+
+    def test_profiles(self):
+        self.assertEqual(['bulk-throughput', 'low-latency'], socket_options_profiles())
+        self.assertTrue(socket_options_profile('low-latency').nodelay)
+        self.assertFalse(socket_options_profile('bulk-throughput').nodelay)
+
+        # Each call returns a new object.
+        options = socket_options_profile('low-latency')
+        options.nodelay = False
+        self.assertTrue(socket_options_profile('low-latency').nodelay)
+
+        self.assertRaises(KeyError, socket_options_profile, 'no-such-profile')
+
+
+class TestSocketFactory(unittest.TestCase):
+    def test_no_options(self):
+        sock = SocketFactory()(_PARAMS, ('127.0.0.1', 1883))
+        self.addCleanup(sock.close)
+        self.assertEqual(0, sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+
+    def test_profile(self):
+        for name in socket_options_profiles():
+            sock = SocketFactory(name)(_PARAMS, ('127.0.0.1', 1883))
+            self.addCleanup(sock.close)
+            expected = socket_options_profile(name).nodelay
+            self.assertEqual(expected, bool(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)))
+            self.assertTrue(sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+
+    def test_ssl_options_before_wrap(self):
+        context = Mock()
+        context.wrap_socket.side_effect = lambda sock, **kwargs: sock
+        sock = SslSocketFactory(context, SocketOptions(nodelay=True))(_PARAMS, ('127.0.0.1', 1883))
+        self.addCleanup(sock.close)
+        self.assertEqual(1, sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        self.assertEqual('localhost', context.wrap_socket.call_args[1]['server_hostname'])
+
+    def test_blocking_connect_timeout(self):
+        sock = BlockingSocketFactory()(_PARAMS, ('127.0.0.1', 1883))
+        self.addCleanup(sock.close)
+        self.assertIsNone(sock.gettimeout())
+
+        sock = BlockingSocketFactory(connect_timeout=2.)(_PARAMS, ('127.0.0.1', 1883))
+        self.addCleanup(sock.close)
+        self.assertEqual(2., sock.gettimeout())
+
+    def test_setsockopt_error_closes_socket(self):
+        sock = Mock()
+        sock.setsockopt.side_effect = socket.error(22, 'Invalid argument')
+        with patch('socket.socket', return_value=sock):
+            factory = SocketFactory(SocketOptions(nodelay=True))
+            self.assertRaises(socket.error, factory, _PARAMS, ('127.0.0.1', 1883))
+        sock.close.assert_called_once_with()
+
+
+class TestSslSessionResumption(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('haka_mqtt.socket_factory._HAS_SSL_SESSION', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.context = Mock()
+        self.context.wrap_socket.side_effect = lambda sock, **kwargs: Mock(session_reused=False)
+        self.factory = SslSocketFactory(self.context)
+
+    def connect(self, endpoint, session, session_reused=False):
+        params = (endpoint[0], endpoint[1], socket.AF_UNSPEC, socket.SOCK_STREAM, socket.IPPROTO_TCP, 0)
+        sock = self.factory(params, ('127.0.0.1', endpoint[1]))
+        self.addCleanup(self.context.wrap_socket.call_args[0][0].close)
+        sock.session = session
+        sock.session_reused = session_reused
+        self.factory.on_connected(params, sock)
+        return self.context.wrap_socket.call_args[1].get('session')
+
+    def test_resume(self):
+        cache = self.factory.session_cache
+        self.assertIsNone(self.connect(('broker', 8883), 'session-0'))
+        self.assertEqual(0, cache.num_offered)
+        self.assertEqual(0., cache.hit_rate)
+
+        self.assertEqual('session-0', self.connect(('broker', 8883), 'session-1', session_reused=True))
+        # The session of the latest connection replaces the previous one.
+        self.assertEqual('session-1', self.connect(('broker', 8883), 'session-2'))
+        # Sessions are kept per endpoint.
+        self.assertIsNone(self.connect(('broker', 1883), 'session-3'))
+
+        self.assertEqual(2, cache.num_offered)
+        self.assertEqual(1, cache.num_resumed)
+        self.assertEqual(4, cache.num_connections)
+        self.assertEqual(0.5, cache.hit_rate)
+        self.assertEqual(2, len(cache))
+
+        cache.invalidate(('broker', 8883))
+        self.assertIsNone(cache.get(('broker', 8883)))
+        self.assertEqual('session-3', cache.get(('broker', 1883)))
+
+    def test_shared_cache(self):
+        cache = SslSessionCache(max_entries=1)
+        self.factory = SslSocketFactory(self.context, session_cache=cache)
+        self.connect(('a', 8883), 'session-a')
+        blocking = BlockingSslSocketFactory(self.context, session_cache=cache)
+        self.assertIs(cache, blocking.session_cache)
+        self.connect(('b', 8883), 'session-b')
+
+        # Least recently used session evicted.
+        self.assertEqual(1, len(cache))
+        self.assertIsNone(cache.get(('a', 8883)))
+        self.assertEqual('session-b', cache.get(('b', 8883)))
+
+    def test_unsupported(self):
+        with patch('haka_mqtt.socket_factory._HAS_SSL_SESSION', False):
+            self.connect(('broker', 8883), 'session-0')
+            self.assertIsNone(self.connect(('broker', 8883), 'session-1'))
+        self.assertEqual(0, self.factory.session_cache.num_offered)
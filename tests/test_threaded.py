@@ -0,0 +1,113 @@
+import socket
+import threading
+import unittest
+from time import time
+
+from mqtt_codec.packet import MqttConnack, ConnackResult, MqttPuback, MqttDisconnect
+
+from haka_mqtt.frontends.poll import MqttPollClientProperties
+from haka_mqtt.frontends.threaded import ThreadedMqttClient, _NotifySelector, _wait_ready
+from haka_mqtt.wakeup import Wakeup
+from tests.reactor_harness import buffer_packet
+
+
+class _EventClient(ThreadedMqttClient):
+    def __init__(self, properties, period):
+        ThreadedMqttClient.__init__(self, properties, log=None, period=period)
+        self.connack = threading.Event()
+        self.puback = threading.Event()
+
+    def on_connack(self, reactor, connack):
+        self.connack.set()
+
+    def on_puback(self, reactor, puback):
+        self.puback.set()
+
+
+class TestWaitReady(unittest.TestCase):
+    def test_add_read_wakes_reader(self):
+        rsock, wsock = socket.socketpair()
+        self.addCleanup(rsock.close)
+        self.addCleanup(wsock.close)
+        wakeup = Wakeup()
+        self.addCleanup(wakeup.close)
+        cond = threading.Condition()
+        selector = _NotifySelector(cond, wakeup)
+
+        results = []
+        reader = threading.Thread(target=lambda: results.append(_wait_ready(rsock, 10., False, wakeup)))
+        start = time()
+        reader.start()
+
+        # Interest in a new socket wakes a reader blocked on the old
+        # one long before the timeout.
+        with cond:
+            selector.add_read(wsock, None)
+        reader.join(5.)
+        self.assertFalse(reader.is_alive())
+        self.assertEqual([False], results)
+        self.assertLess(time() - start, 1.)
+
+        # The wakeup was drained.
+        self.assertFalse(_wait_ready(rsock, 0, False, wakeup))
+        wsock.sendall(b'x')
+        self.assertTrue(_wait_ready(rsock, 5., False, wakeup))
+
+
+class TestThreadedMqttClient(unittest.TestCase):
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.listener.settimeout(5.)
+        self.addCleanup(self.listener.close)
+
+        properties = MqttPollClientProperties()
+        properties.host, properties.port = self.listener.getsockname()
+        properties.client_id = 'threaded-client'
+        properties.ssl = False
+        # A long period shows that writes are not delayed by it.
+        self.client = _EventClient(properties, period=10.)
+        self.addCleanup(self.client.close)
+
+    def test_lifecycle(self):
+        self.client.start()
+        server, addr = self.listener.accept()
+        self.addCleanup(server.close)
+        server.settimeout(5.)
+        self.assertTrue(server.recv(4096))
+        server.sendall(buffer_packet(MqttConnack(False, ConnackResult.accepted)))
+        self.assertTrue(self.client.connack.wait(5.))
+
+        # The reader thread is blocked on the socket; the writer is
+        # woken by the publish.
+        start = time()
+        ticket = self.client.publish('topic', b'payload', 1)
+        self.assertEqual(buffer_packet(ticket.packet()), server.recv(4096))
+        self.assertLess(time() - start, 1.)
+
+        server.sendall(buffer_packet(MqttPuback(ticket.packet_id)))
+        self.assertTrue(self.client.puback.wait(5.))
+
+        self.client.stop()
+        self.assertEqual(buffer_packet(MqttDisconnect()), server.recv(4096))
+        server.close()
+        self.assertTrue(self.client.wait(5.))
+        self.assertFalse(self.client.is_active())
+
+    def test_add_deadline_from_thread(self):
+        # The main thread does not hold the client lock.
+        event = threading.Event()
+        self.client._scheduler.add(0.01, event.set)
+        self.assertTrue(event.wait(5.))
+
+    def test_happy_eyeballs_unsupported(self):
+        properties = MqttPollClientProperties()
+        properties.happy_eyeballs_delay = 0.25
+        self.assertRaises(AssertionError, ThreadedMqttClient, properties)
+
+    def test_wait_timeout(self):
+        self.client.start()
+        self.assertFalse(self.client.wait(0.05))
+        self.client.close()
+        self.assertTrue(self.client.wait(0))
@@ -0,0 +1,148 @@
+import os
+import select
+import threading
+import unittest
+
+from mock import Mock
+
+from haka_mqtt.exception import PacketIdReactorException
+from haka_mqtt.threadsafe import ThreadSafePublisher
+from haka_mqtt.wakeup import Wakeup
+
+
+def _readable(fd):
+    rlist, wlist, xlist = select.select([fd], [], [], 0)
+    return bool(rlist)
+
+
+class _WakeupTests(object):
+    eventfd = None
+
+    def setUp(self):
+        self.wakeup = Wakeup(eventfd=self.eventfd)
+        self.addCleanup(self.wakeup.close)
+
+    def test_wake_drain(self):
+        self.assertEqual(self.eventfd, self.wakeup.eventfd)
+        self.assertFalse(_readable(self.wakeup.fileno()))
+        for i in range(0, 10):
+            self.wakeup.wake()
+        self.assertTrue(_readable(self.wakeup.fileno()))
+        self.wakeup.drain()
+        self.assertFalse(_readable(self.wakeup.fileno()))
+
+        # Draining without a pending wakeup has no effect.
+        self.wakeup.drain()
+        self.assertFalse(_readable(self.wakeup.fileno()))
+
+    def test_close(self):
+        self.assertFalse(self.wakeup.closed())
+        self.wakeup.close()
+        self.assertTrue(self.wakeup.closed())
+        self.wakeup.close()
+
+
+class TestPipeWakeup(_WakeupTests, unittest.TestCase):
+    eventfd = False
+
+
+@unittest.skipUnless(hasattr(os, 'eventfd'), 'os.eventfd is not available.')
+class TestEventfdWakeup(_WakeupTests, unittest.TestCase):
+    eventfd = True
+
+
+class _Selector(object):
+    def __init__(self):
+        self.callbacks = {}
+
+    def add_callback_read(self, fd, cb):
+        self.callbacks[fd] = cb
+
+    def del_callback_read(self, fd):
+        del self.callbacks[fd]
+
+    def select(self):
+        for fd, cb in list(self.callbacks.items()):
+            if _readable(fd):
+                cb()
+
+
+class TestThreadSafePublisher(unittest.TestCase):
+    def setUp(self):
+        self.reactor = Mock()
+        self.selector = _Selector()
+        self.publisher = ThreadSafePublisher(self.reactor, self.selector)
+        self.addCleanup(self.publisher.close)
+
+    def test_batch_from_threads(self):
+        num_threads = 4
+        num_publishes = 100
+
+        def produce(i):
+            for j in range(0, num_publishes):
+                self.publisher.publish('topic/{}'.format(i), b'payload', 1)
+
+        threads = [threading.Thread(target=produce, args=(i,)) for i in range(0, num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.selector.select()
+        self.assertEqual(1, self.publisher.num_batches)
+        self.reactor.publish_batch.assert_called_once()
+        batch = self.reactor.publish_batch.call_args[0][0]
+        self.assertEqual(num_threads * num_publishes, len(batch))
+        for i in range(0, num_threads):
+            topic = 'topic/{}'.format(i)
+            self.assertEqual([(topic, b'payload', 1, False)] * num_publishes,
+                             [p for p in batch if p[0] == topic])
+
+        # Nothing pending so nothing is woken.
+        self.selector.select()
+        self.assertEqual(1, self.publisher.num_batches)
+
+    def test_publish_after_wakeup(self):
+        self.publisher.publish('topic', b'0', 0)
+        self.selector.select()
+        self.publisher.publish('topic', b'1', 0, True)
+        self.selector.select()
+        self.assertEqual(2, self.publisher.num_batches)
+        self.assertEqual([[('topic', b'0', 0, False)], [('topic', b'1', 0, True)]],
+                         [c[0][0] for c in self.reactor.publish_batch.call_args_list])
+
+    def test_packet_ids_exhausted(self):
+        def publish_batch(batch):
+            e = PacketIdReactorException()
+            e.tickets = [Mock()]
+            raise e
+
+        self.reactor.publish_batch.side_effect = publish_batch
+        self.publisher.publish('topic', b'0', 1)
+        self.publisher.publish('topic', b'1', 1)
+        self.publisher.publish('topic', b'2', 0)
+        self.selector.select()
+
+        # Held publishes keep their place ahead of later ones and wait
+        # for packet ids rather than a wakeup from publish.
+        self.reactor.publish_batch.side_effect = None
+        self.publisher.publish('topic', b'3', 0)
+        self.selector.select()
+        self.assertEqual(1, self.reactor.publish_batch.call_count)
+
+        self.publisher.on_packet_ids_available()
+        self.selector.select()
+        self.assertEqual([('topic', b'1', 1, False), ('topic', b'2', 0, False), ('topic', b'3', 0, False)],
+                         self.reactor.publish_batch.call_args[0][0])
+
+        # Nothing held so nothing is woken.
+        self.publisher.on_packet_ids_available()
+        self.selector.select()
+        self.assertEqual(2, self.reactor.publish_batch.call_count)
+
+    def test_close(self):
+        self.assertEqual(1, len(self.selector.callbacks))
+        self.publisher.close()
+        self.assertTrue(self.publisher.closed())
+        self.assertEqual(0, len(self.selector.callbacks))
+        self.publisher.close()
@@ -0,0 +1,169 @@
+import random
+import unittest
+
+from haka_mqtt.clock import SettableClock
+from haka_mqtt.scheduler import ClockScheduler
+from haka_mqtt.timing_wheel import TimingWheelScheduler
+
+
+class Target():
+    def __init__(self):
+        self.set = False
+
+    def __call__(self, *args, **kwargs):
+        self.set = True
+
+
+class TestTimingWheelScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = SettableClock()
+        self.clock.set_time(1000.)
+        self.s = TimingWheelScheduler(self.clock, resolution=1., wheel_sizes=(4, 4, 4))
+
+    def test_add_poll(self):
+        s = self.s
+        self.assertIsNone(s.remaining())
+        self.assertEqual(0, len(s))
+
+        t0 = Target()
+        t1 = Target()
+        d0 = s.add(3, t0)
+        d1 = s.add(10, t1)
+        self.assertEqual(2, len(s))
+        self.assertEqual(3, s.remaining())
+
+        self.clock.add_time(2)
+        s.poll()
+        self.assertFalse(t0.set)
+
+        self.clock.add_time(1)
+        s.poll()
+        self.assertTrue(t0.set)
+        self.assertTrue(d0.expired())
+        self.assertFalse(t1.set)
+        self.assertEqual(1, len(s))
+
+        d1.cancel()
+        self.assertTrue(d1.expired())
+        self.assertEqual(0, len(s))
+        self.assertIsNone(s.remaining())
+
+        self.clock.add_time(100)
+        s.poll()
+        self.assertFalse(t1.set)
+
+    def test_zero_duration(self):
+        t = Target()
+        d = self.s.add(0, t)
+        self.assertEqual(0, self.s.remaining())
+        self.assertFalse(d.expired())
+        self.s.poll()
+        self.assertTrue(t.set)
+        self.assertEqual(0, len(self.s))
+
+    def test_rounds_up_to_tick(self):
+        t = Target()
+        self.s.add(0.5, t)
+        self.clock.add_time(0.5)
+        self.s.poll()
+        self.assertFalse(t.set)
+        self.assertEqual(0.5, self.s.remaining())
+
+        self.clock.add_time(0.5)
+        self.s.poll()
+        self.assertTrue(t.set)
+
+    def test_beyond_outermost_wheel(self):
+        # Wheels span 4 * 4 * 4 = 64 ticks.
+        t = Target()
+        self.s.add(200, t)
+        while not t.set:
+            remaining = self.s.remaining()
+            self.assertTrue(0 < remaining <= 200, remaining)
+            self.clock.add_time(remaining)
+            self.s.poll()
+        self.assertEqual(1200., self.clock.time())
+
+    def test_equal_instants_fifo(self):
+        calls = []
+        for i in range(0, 10):
+            self.s.add(20, lambda i=i: calls.append(i))
+        self.clock.add_time(20)
+        self.s.poll()
+        self.assertEqual(list(range(0, 10)), calls)
+
+    def test_reset(self):
+        t = Target()
+        d = self.s.add(5, t)
+        self.clock.add_time(4)
+        self.s.poll()
+        d.reset(30)
+        self.assertEqual(1, len(self.s))
+
+        self.clock.add_time(29)
+        self.s.poll()
+        self.assertFalse(t.set)
+
+        self.clock.add_time(1)
+        self.s.poll()
+        self.assertTrue(t.set)
+        self.assertEqual(0, len(self.s))
+
+        # Re-arm an expired deadline.
+        t.set = False
+        d.reset(2)
+        self.assertFalse(d.expired())
+        self.clock.add_time(2)
+        self.s.poll()
+        self.assertTrue(t.set)
+
+    def test_cancel_in_callback(self):
+        t = Target()
+        d = self.s.add(1, t)
+        self.s.add(1, lambda: None)
+        self.s.add(0, d.cancel)
+        self.clock.add_time(1)
+        self.s.poll()
+        self.assertFalse(t.set)
+        self.assertEqual(0, len(self.s))
+
+    def test_matches_clock_scheduler(self):
+        rng = random.Random(0)
+        wheel_clock = SettableClock()
+        heap_clock = SettableClock()
+        wheel = TimingWheelScheduler(wheel_clock, resolution=1., wheel_sizes=(8, 4, 4))
+        heap = ClockScheduler(heap_clock)
+
+        calls = {wheel: [], heap: []}
+        deadlines = {wheel: [], heap: []}
+        for step in range(0, 2000):
+            op = rng.random()
+            if op < 0.4:
+                duration = rng.randint(0, 300)
+                for s in (wheel, heap):
+                    deadlines[s].append(s.add(duration, lambda s=s, step=step: calls[s].append(step)))
+            elif op < 0.55 and deadlines[wheel]:
+                idx = rng.randrange(0, len(deadlines[wheel]))
+                for s in (wheel, heap):
+                    deadlines[s][idx].cancel()
+            elif op < 0.7 and deadlines[wheel]:
+                idx = rng.randrange(0, len(deadlines[wheel]))
+                duration = rng.randint(0, 300)
+                for s in (wheel, heap):
+                    deadlines[s][idx].reset(duration)
+            else:
+                duration = rng.randint(0, 20)
+                wheel_clock.add_time(duration)
+                heap_clock.add_time(duration)
+                wheel.poll()
+                heap.poll()
+
+                # Order of deadlines with equal instants after a reset
+                # is not specified.
+                self.assertEqual(sorted(calls[heap]), sorted(calls[wheel]))
+                calls[heap][:] = []
+                calls[wheel][:] = []
+
+            self.assertEqual(len(heap), len(wheel))
+            if len(heap):
+                self.assertLessEqual(wheel.remaining(), heap.remaining())